@@ -1,71 +1,2815 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 import bcrypt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import jwt
-from functools import wraps
+from functools import lru_cache, wraps
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import atexit
+import base64
+import bisect
+import contextvars
+import random
+import hashlib
+import json
+import logging
 import os
+import re
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Last-Write'])
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['DB_HOST'] = os.environ.get('DB_HOST', 'localhost')
+app.config['DB_PORT'] = int(os.environ.get('DB_PORT', 3306))
 app.config['DB_USER'] = os.environ.get('DB_USER', 'root')
 app.config['DB_PASSWORD'] = os.environ.get('DB_PASSWORD', 'your-password')
 app.config['DB_NAME'] = os.environ.get('DB_NAME', 'video_game_player_database')
+# Comma separated host:port list; GET requests read from these when set
+app.config['DB_REPLICAS'] = os.environ.get('DB_REPLICAS', '')
+# Seconds a player's reads stay on the primary after one of their own writes
+app.config['READ_YOUR_WRITES_WINDOW'] = float(os.environ.get('READ_YOUR_WRITES_WINDOW', 5))
+
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+app.config['DB_POOL_MAX_LIFETIME'] = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+app.config['DB_POOL_PING_AFTER'] = float(os.environ.get('DB_POOL_PING_AFTER', 10))
+app.config['PREPARED_STATEMENTS'] = os.environ.get('PREPARED_STATEMENTS', '1') == '1'
+app.config['PREPARED_CACHE_SIZE'] = int(os.environ.get('PREPARED_CACHE_SIZE', 64))
+# Threads /api/dashboard fans its sections out over. Defaults to the pool size so
+# connections, not threads, bound the fan-out; 1 runs the sections back to back
+app.config['DASHBOARD_WORKERS'] = int(os.environ.get('DASHBOARD_WORKERS', app.config['DB_POOL_SIZE']))
+# Worker threads the async entry point runs the Flask routes it delegates on
+app.config['ASYNC_WSGI_THREADS'] = int(os.environ.get('ASYNC_WSGI_THREADS', 32))
+app.config['BULK_MATCH_MAX_ROWS'] = int(os.environ.get('BULK_MATCH_MAX_ROWS', 10000))
+app.config['BULK_INSERT_CHUNK'] = int(os.environ.get('BULK_INSERT_CHUNK', 500))
+app.config['INVENTORY_BULK_MAX_ROWS'] = int(os.environ.get('INVENTORY_BULK_MAX_ROWS', 10000))
+# 'trigger' updates Games inside every match transaction; 'buffered' accumulates
+# the deltas in process and flushes them every GAME_STATS_FLUSH_INTERVAL seconds
+app.config['GAME_STATS_MODE'] = os.environ.get('GAME_STATS_MODE', 'trigger')
+app.config['GAME_STATS_FLUSH_INTERVAL'] = float(os.environ.get('GAME_STATS_FLUSH_INTERVAL', 5))
+app.config['GAMES_CATALOG_TTL'] = float(os.environ.get('GAMES_CATALOG_TTL', 300))
+app.config['GAMES_COUNTERS_TTL'] = float(os.environ.get('GAMES_COUNTERS_TTL', 5))
+app.config['ACHIEVEMENT_RULES_TTL'] = float(os.environ.get('ACHIEVEMENT_RULES_TTL', 60))
+# Leaderboards are per process and only see this process's matches in between,
+# so Player_Games rows changed since the last sync are re-read this often (0 never syncs)
+app.config['LEADERBOARD_RESYNC_INTERVAL'] = float(os.environ.get('LEADERBOARD_RESYNC_INTERVAL', 60))
+# Match_History keeps this many whole months; older partitions are archived
+# into Match_History_Archive_YYYYMM tables (or dropped when archiving is off)
+app.config['MATCH_HISTORY_RETENTION_MONTHS'] = int(os.environ.get('MATCH_HISTORY_RETENTION_MONTHS', 24))
+app.config['MATCH_HISTORY_MONTHS_AHEAD'] = int(os.environ.get('MATCH_HISTORY_MONTHS_AHEAD', 3))
+app.config['MATCH_HISTORY_ARCHIVE'] = os.environ.get('MATCH_HISTORY_ARCHIVE', '1') == '1'
+# Seconds between popularity_score recomputations; one process runs each one.
+# 0 leaves it to `flask compute-popularity` on a schedule
+app.config['POPULARITY_INTERVAL'] = float(os.environ.get('POPULARITY_INTERVAL', 600))
+# How often each process checks whether a run is due and whether scores changed
+app.config['POPULARITY_POLL_INTERVAL'] = float(os.environ.get('POPULARITY_POLL_INTERVAL', 30))
+app.config['SEARCH_MIN_LENGTH'] = int(os.environ.get('SEARCH_MIN_LENGTH', 3))
+app.config['PAGE_SIZE_DEFAULT'] = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+app.config['PAGE_SIZE_MAX'] = int(os.environ.get('PAGE_SIZE_MAX', 500))
+app.config['STREAM_BATCH_SIZE'] = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+app.config['WINRATE_MAX_IDS'] = int(os.environ.get('WINRATE_MAX_IDS', 500))
+app.config['FRIENDS_CACHE_TTL'] = float(os.environ.get('FRIENDS_CACHE_TTL', 60))
+app.config['FRIENDS_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRIENDS_CACHE_MAX_ENTRIES', 100000))
+app.config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', 12))
+app.config['BCRYPT_WORKERS'] = int(os.environ.get('BCRYPT_WORKERS', 4))
+app.config['BCRYPT_MAX_PENDING'] = int(os.environ.get('BCRYPT_MAX_PENDING', 32))
+app.config['TOKEN_CACHE_SIZE'] = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+app.config['ACCOUNT_STATUS_REFRESH'] = float(os.environ.get('ACCOUNT_STATUS_REFRESH', 60))
+# Statements slower than this are logged; 0 disables the slow query log
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+# ==================== METRICS ====================
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    # Cumulative-bucket latency histogram keyed by label values, rendered in
+    # the Prometheus text format
+    def __init__(self, name, description, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, seconds, *label_values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for label_values, counts, total, count in sorted(snapshot):
+            labels = ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+request_seconds = Histogram('api_request_duration_seconds', 'Request latency by route.', ('route', 'method', 'status'))
+phase_seconds = Histogram('api_request_phase_seconds', 'Time spent per request in each phase.', ('route', 'phase'))
+statement_seconds = Histogram('api_sql_statement_seconds', 'SQL latency per statement and phase.', ('statement', 'phase'))
+
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+_ROW_LIST = re.compile(r'\(%s(?:, \.\.\.)?\)(?:\s*,\s*\(%s(?:, \.\.\.)?\))+')
+
+@lru_cache(maxsize=1024)
+def statement_label(sql):
+    # Collapse whitespace and variable-length placeholder lists so IN (...) and
+    # multi-row VALUES statements share one series
+    text = ' '.join(sql.split())
+    text = _PLACEHOLDER_LIST.sub('%s, ...', text)
+    text = _ROW_LIST.sub('(%s, ...), ...', text)
+    return text[:160]
+
+_timings_lock = threading.Lock()
+
+def record_phase(phase, seconds):
+    # Adds to the current request's per-phase totals; a no-op in background threads.
+    # Dashboard sections share the request's g from several threads, hence the lock
+    if has_request_context():
+        with _timings_lock:
+            timings = g.setdefault('timings', {})
+            timings[phase] = timings.get(phase, 0.0) + seconds
+
+# Its own logger so the slow query log can be filtered and shipped separately
+slow_query_log = logging.getLogger(f'{app.logger.name}.slow_query')
+
+def record_statement(sql, phase, seconds, route=None):
+    # route labels statements run outside a Flask request, like the async app's
+    label = statement_label(sql) if sql else 'unknown'
+    statement_seconds.observe(seconds, label, phase)
+    record_phase(f'db_{phase}', seconds)
+    slow_ms = app.config['SLOW_QUERY_MS']
+    if slow_ms > 0 and seconds * 1000 >= slow_ms:
+        if route is None:
+            route = request.endpoint if has_request_context() else 'background'
+        slow_query_log.warning('Slow query (%s, %.1f ms, %s): %s', phase, seconds * 1000, route, label,
+                               extra={'phase': phase, 'duration_ms': seconds * 1000, 'route': route, 'statement': label})
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # jsonify goes through dumps, so this captures response serialization time
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_phase('serialize', time.perf_counter() - started)
+
+app.json = TimedJSONProvider(app)
+
+# ==================== CONNECTION POOL ====================
+
+class PoolTimeout(Error):
+    pass
+
+class _PoolEntry:
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+        # SQL text -> (prepared cursor, key); lives as long as the physical connection
+        self.statements = OrderedDict()
+
+class PooledCursor:
+    # Remembers which pooled connection it came from so helpers can reach
+    # that connection's prepared statements
+    def __init__(self, connection, raw):
+        self.pooled_connection = connection
+        self._raw = raw
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    # Execute and fetch are timed separately; unbuffered cursors do most of
+    # their network reads while fetching
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._statement = operation
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, *args, **kwargs)
+        finally:
+            record_statement(operation, 'execute', time.perf_counter() - started)
+
+    def callproc(self, procname, args=()):
+        self._statement = f'CALL {procname}'
+        started = time.perf_counter()
+        try:
+            return self._raw.callproc(procname, args)
+        finally:
+            record_statement(self._statement, 'execute', time.perf_counter() - started)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            record_statement(self._statement, 'fetch', time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(self._raw.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._raw.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._raw.fetchall)
+
+class PooledConnection:
+    # Thin proxy around a pooled connection; close() hands it back to the pool
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        return getattr(self._entry.raw, name)
+
+    @property
+    def replica(self):
+        return self._pool.replica
+
+    def cursor(self, *args, **kwargs):
+        return PooledCursor(self, self._entry.raw.cursor(*args, **kwargs))
+
+    def prepared(self, sql):
+        # Server-side statement for sql, prepared once per physical connection.
+        # Returns (cursor, key). The connector only skips re-preparing when
+        # execute() is passed the same string object it last prepared, so
+        # callers execute key, the string cached with the cursor, rather than
+        # an equal string built for this call.
+        statements = self._entry.statements
+        entry = statements.get(sql)
+        if entry is not None:
+            statements.move_to_end(sql)
+            self._pool.count_prepared(hit=True)
+            return entry
+        self._pool.count_prepared(hit=False)
+        entry = statements[sql] = (self._entry.raw.cursor(prepared=True), sql)
+        if len(statements) > self._pool.prepared_cache_size:
+            # Closing the cursor deallocates the statement on the server
+            _, (evicted, _) = statements.popitem(last=False)
+            evicted.close()
+        return entry
+
+    def discard_prepared(self, key):
+        # Drops a statement whose execute failed, so the next call prepares afresh
+        entry = self._entry.statements.pop(key, None)
+        if entry is not None:
+            try:
+                entry[0].close()
+            except Error:
+                pass
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+class ConnectionPool:
+    def __init__(self, size, timeout, max_lifetime, ping_after, prepared_cache_size=64, replica=False, **connect_args):
+        self.size = size
+        self.replica = replica
+        self.prepared_cache_size = prepared_cache_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.connect_args = connect_args
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._prepared_hits = 0
+        self._prepared_misses = 0
+        self._last_error = None
+
+    def count_prepared(self, hit):
+        with self._cond:
+            if hit:
+                self._prepared_hits += 1
+            else:
+                self._prepared_misses += 1
+
+    def _expired(self, entry):
+        return self.max_lifetime > 0 and time.monotonic() - entry.created_at > self.max_lifetime
+
+    def _usable(self, entry):
+        if self._expired(entry):
+            return False
+        # Only ping connections that have been sitting idle for a while
+        if time.monotonic() - entry.returned_at < self.ping_after:
+            return True
+        return entry.raw.is_connected()
+
+    def _discard(self, entry):
+        with self._cond:
+            self._recycled += 1
+        try:
+            entry.raw.close()
+        except Error:
+            pass
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(msg=f'Timed out after {self.timeout}s waiting for a database connection')
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+
+        # Validate or open outside the lock so a slow handshake does not block other borrowers
+        try:
+            if entry is not None and not self._usable(entry):
+                self._discard(entry)
+                entry = None
+            if entry is None:
+                entry = _PoolEntry(mysql.connector.connect(**self.connect_args))
+                self._last_error = None
+        except Error as e:
+            self._last_error = str(e)
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, entry)
+
+    def release(self, entry):
+        keep = not self._expired(entry)
+        if keep:
+            try:
+                # Never hand the next borrower a half-finished transaction
+                if entry.raw.in_transaction:
+                    entry.raw.rollback()
+            except Error:
+                keep = False
+        if not keep:
+            self._discard(entry)
+        entry.returned_at = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(entry)
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'avg_wait_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'prepared_hits': self._prepared_hits,
+                'prepared_misses': self._prepared_misses,
+                'last_error': self._last_error
+            }
+
+_pool = None
+_replica_pools = None
+_pool_lock = threading.Lock()
+
+def _create_pool(host, port, replica=False):
+    return ConnectionPool(
+        size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+        ping_after=app.config['DB_POOL_PING_AFTER'],
+        prepared_cache_size=app.config['PREPARED_CACHE_SIZE'],
+        replica=replica,
+        host=host,
+        port=port,
+        user=app.config['DB_USER'],
+        password=app.config['DB_PASSWORD'],
+        database=app.config['DB_NAME']
+    )
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _create_pool(app.config['DB_HOST'], app.config['DB_PORT'])
+    return _pool
+
+def get_replica_pools():
+    global _replica_pools
+    if _replica_pools is None:
+        with _pool_lock:
+            if _replica_pools is None:
+                _replica_pools = [_create_pool(host, port, replica=True) for host, port in replica_addresses()]
+    return _replica_pools
+
+def replica_addresses():
+    # (host, port) per DB_REPLICAS entry; the async app builds its pools from these too
+    addresses = []
+    for address in app.config['DB_REPLICAS'].split(','):
+        if address.strip():
+            host, _, port = address.strip().partition(':')
+            addresses.append((host, int(port or 3306)))
+    return addresses
+
+# Successful writes return the time they were made in this header and the
+# client sends the latest one back, so any worker can tell a recent writer
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+def wrote_within_window(last_write):
+    # last_write is the client's X-Last-Write value, in epoch seconds
+    try:
+        age = time.time() - float(last_write)
+    except (TypeError, ValueError):
+        return False
+    window = app.config['READ_YOUR_WRITES_WINDOW']
+    return -window < age < window
+
+class RecentWriters:
+    # Players who wrote within the last READ_YOUR_WRITES_WINDOW seconds; their
+    # reads go to the primary so they never see replica lag on their own changes.
+    # The map only knows this process's writes; the writer's X-Last-Write header
+    # covers writes handled by other workers
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = {}
+
+    def mark(self, player_id):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) > 10000:
+                self._until = {p: t for p, t in self._until.items() if t > now}
+            self._until[player_id] = now + app.config['READ_YOUR_WRITES_WINDOW']
+
+    def is_recent(self, player_id, last_write=None):
+        until = self._until.get(player_id)
+        if until is not None and until > time.monotonic():
+            return True
+        return wrote_within_window(last_write)
+
+recent_writers = RecentWriters()
+_replica_turn = 0
+
+def _use_replica():
+    # Only reads made while serving a GET are routed; background jobs and
+    # anything in a write request stay on the primary
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return False
+    player_id = g.get('current_user_id')
+    return player_id is None or not recent_writers.is_recent(player_id, request.headers.get(LAST_WRITE_HEADER))
+
+def fetch_prepared(cursor, sql, params, one=False):
+    # Runs sql as a reusable server-side prepared statement on cursor's pooled
+    # connection and returns dict rows, like a dictionary cursor would
+    connection = getattr(cursor, 'pooled_connection', None)
+    if connection is None or not app.config['PREPARED_STATEMENTS']:
+        cursor.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+    prepared, key = connection.prepared(sql)
+    started = time.perf_counter()
+    try:
+        prepared.execute(key, params)
+    except Error:
+        connection.discard_prepared(key)
+        raise
+    executed = time.perf_counter()
+    record_statement(sql, 'execute', executed - started)
+    rows = [dict(zip(prepared.column_names, row)) for row in prepared.fetchall()]
+    record_statement(sql, 'fetch', time.perf_counter() - executed)
+    if one:
+        return rows[0] if rows else None
+    return rows
 
 # Database connection helper
-def get_db_connection():
+def get_db_connection(primary=False):
+    started = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host=app.config['DB_HOST'],
-            user=app.config['DB_USER'],
-            password=app.config['DB_PASSWORD'],
-            database=app.config['DB_NAME']
-        )
-        return connection
+        return _get_db_connection(primary)
+    finally:
+        record_phase('db_connect', time.perf_counter() - started)
+
+def _get_db_connection(primary=False):
+    replicas = get_replica_pools()
+    if replicas and not primary and _use_replica():
+        global _replica_turn
+        _replica_turn = (_replica_turn + 1) % len(replicas)
+        try:
+            return replicas[_replica_turn].acquire()
+        except Error as e:
+            # Fall back to the primary rather than failing the read
+            print(f"Error connecting to MySQL replica: {e}")
+    try:
+        return get_pool().acquire()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+# Verified claims by token digest, so a token's signature is checked once
+token_cache = LRUCache(app.config['TOKEN_CACHE_SIZE'])
+
+class AccountStatusSet:
+    # Non-active accounts and revoked tokens, checked on every request without a
+    # DB query. login, logout and the admin status endpoint update it directly; a
+    # periodic reload picks up changes made by other processes, including the
+    # revocations they wrote to Revoked_Tokens.
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._statuses = {}
+        self._revoked = {}
+        self._loaded_at = None
+
+    def set_status(self, player_id, status):
+        with self._lock:
+            if status == 'active':
+                self._statuses.pop(player_id, None)
+            else:
+                self._statuses[player_id] = status
+
+    def status(self, player_id, refresh=True):
+        if refresh:
+            self.refresh_if_stale()
+        return self._statuses.get(player_id)
+
+    def revoke(self, digest, exp):
+        now = time.time()
+        with self._lock:
+            self._revoked = {d: e for d, e in self._revoked.items() if e > now}
+            self._revoked[digest] = exp
+
+    def is_revoked(self, digest):
+        return digest in self._revoked
+
+    def stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def refresh_if_stale(self):
+        # Blocks on a database round trip when stale; the async app calls this
+        # on a worker thread and then authenticates with refresh_statuses=False
+        if not self.stale():
+            return
+        # One request reloads; everyone else keeps using the current set
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            # From the primary: a lagging replica could miss a fresh logout or ban
+            connection = get_db_connection(primary=True)
+            if not connection:
+                return
+            try:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute("SELECT player_id, account_status FROM Players WHERE account_status != 'active'")
+                statuses = {row['player_id']: row['account_status'] for row in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT token_digest, UNIX_TIMESTAMP(expires_at) AS expires_at
+                    FROM Revoked_Tokens
+                    WHERE expires_at > NOW()
+                """)
+                revoked = {bytes(row['token_digest']): float(row['expires_at']) for row in cursor.fetchall()}
+                cursor.close()
+            except Error as e:
+                print(f"Error loading account statuses: {e}")
+                return
+            finally:
+                connection.close()
+            now = time.time()
+            with self._lock:
+                self._statuses = statuses
+                # Keep this process's own revocations; one made while the
+                # reload ran may not be in what it read
+                revoked.update((d, e) for d, e in self._revoked.items() if e > now)
+                self._revoked = revoked
+            self._loaded_at = time.monotonic()
+        finally:
+            self._refreshing.release()
+
+account_statuses = AccountStatusSet(app.config['ACCOUNT_STATUS_REFRESH'])
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+def bearer_token():
+    token = request.headers.get('Authorization')
+    if token and token.startswith('Bearer '):
+        token = token.split(' ')[1]
+    return token
+
+def authenticate_token(token, refresh_statuses=True):
+    # Returns (player_id, None) or (None, (error message, status code))
+    if not token:
+        return None, ('Token is missing', 401)
+    
+    digest = token_digest(token)
+    claims = token_cache.get(digest)
+    if claims is None:
+        try:
+            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            claims = (data['player_id'], data.get('exp'))
+        except jwt.ExpiredSignatureError:
+            return None, ('Token has expired', 401)
+        except (jwt.InvalidTokenError, KeyError):
+            return None, ('Invalid token', 401)
+        token_cache.put(digest, claims)
+    
+    player_id, exp = claims
+    if exp is not None and exp <= time.time():
+        token_cache.pop(digest)
+        return None, ('Token has expired', 401)
+    if account_statuses.is_revoked(digest):
+        return None, ('Token has been revoked', 401)
+    status = account_statuses.status(player_id, refresh=refresh_statuses)
+    if status is not None:
+        return None, (f'Account is {status}', 403)
+    return player_id, None
+
 # Authentication decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token.split(' ')[1]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['player_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+        current_user_id, failure = authenticate_token(bearer_token())
+        if failure:
+            return jsonify({'error': failure[0]}), failure[1]
         
+        g.current_user_id = current_user_id
         return f(current_user_id, *args, **kwargs)
     
     return decorated
 
-# ==================== AUTHENTICATION ENDPOINTS ====================
+def has_role(cursor, player_id, role_name):
+    return fetch_prepared(cursor, """
+        SELECT 1 AS has_role
+        FROM Player_Roles pr
+        JOIN Roles r ON pr.role_id = r.role_id
+        WHERE pr.player_id = %s AND r.role_name = %s
+    """, (player_id, role_name), one=True) is not None
+
+# Opaque keyset cursors: the sort key of the last row on a page
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+def page_args(cursor_length):
+    # limit/after query parameters for keyset-paginated list endpoints
+    limit = request.args.get('limit')
+    limit = min(max(int(limit), 1), app.config['PAGE_SIZE_MAX']) if limit else app.config['PAGE_SIZE_DEFAULT']
+    after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    if after is not None and len(after) != cursor_length:
+        raise ValueError('Invalid cursor')
+    return limit, after
+
+# Streaming responses, opted into with one of these Accept types
+STREAM_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/stream+json': 'json'
+}
+
+def requested_stream_format():
+    # Exact matches only, so a browser's */* keeps getting the regular response
+    for mimetype, quality in request.accept_mimetypes:
+        if mimetype in STREAM_FORMATS and quality > 0:
+            return STREAM_FORMATS[mimetype]
+    return None
+
+def stream_query(sql, params, fmt):
+    # Rows go out in STREAM_BATCH_SIZE batches from an unbuffered cursor, so
+    # memory stays flat no matter how large the result set is
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, params)
+    except Error as e:
+        cursor.close()
+        connection.close()
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        try:
+            if fmt == 'json':
+                yield '['
+            first = True
+            while True:
+                rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+                if not rows:
+                    break
+                if fmt == 'ndjson':
+                    yield ''.join(app.json.dumps(row) + '\n' for row in rows)
+                else:
+                    chunk = ','.join(app.json.dumps(row) for row in rows)
+                    yield chunk if first else ',' + chunk
+                first = False
+            if fmt == 'json':
+                yield ']'
+        except Error as e:
+            # Headers are already sent; all we can do is cut the stream short
+            print(f"Error streaming results: {e}")
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                # Client went away mid-stream; the pool discards the connection
+                pass
+            connection.close()
+    
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+def split_page(rows, limit, cursor_values):
+    # rows holds up to limit + 1 entries; the extra one only signals another page
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(cursor_values(rows[limit - 1]))
+    return rows, None
+
+def paged_response(rows, limit, cursor_values):
+    rows, next_cursor = split_page(rows, limit, cursor_values)
+    response = jsonify(rows)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# ==================== CACHING ====================
+
+class TTLCache:
+    def __init__(self, ttl, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Bumped on every invalidation so a load that raced one is not cached
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def epoch(self):
+        return self._epoch
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None, epoch=None):
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._entries.pop(key, None)
+            if self.max_entries is not None and len(self._entries) >= self.max_entries:
+                # Oldest insertion goes first
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._epoch += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+# ==================== GAME STATS BUFFER ====================
+
+def game_stats_buffered():
+    return app.config['GAME_STATS_MODE'] == 'buffered'
+
+def game_stats_generation(cursor):
+    # Read at the start of a buffered match transaction. The shared lock is held
+    # until commit, so a reconcile's generation bump waits for the match and the
+    # rebuild sees its Player_Games rows.
+    cursor.execute("SELECT generation FROM Game_Stats_Generation WHERE id = 1 LOCK IN SHARE MODE")
+    return cursor.fetchone()['generation']
+
+class GameStatsBuffer:
+    # Accumulates Games and team counter deltas in process so match transactions
+    # never take the per-game or per-team row locks; flush() applies them in a
+    # few statements. Deltas are keyed by generation; those from before the
+    # last reconcile are already counted in the rebuilt totals and are dropped.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = {}
+        self._team_deltas = {}
+        self._flusher = None
+
+    def add(self, generation, game_id, hours, matches, high_score):
+        with self._lock:
+            delta = self._deltas.setdefault((generation, game_id), [0.0, 0, 0])
+            delta[0] += hours
+            delta[1] += matches
+            delta[2] = max(delta[2], high_score)
+        self._ensure_flusher()
+
+    def add_team(self, generation, team_id, game_id, wins, losses, matches, playtime):
+        with self._lock:
+            delta = self._team_deltas.setdefault((generation, team_id, game_id), [0, 0, 0, 0.0])
+            delta[0] += wins
+            delta[1] += losses
+            delta[2] += matches
+            delta[3] += playtime
+        self._ensure_flusher()
+
+    def drain(self):
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            team_deltas, self._team_deltas = self._team_deltas, {}
+        return deltas, team_deltas
+
+    def restore(self, deltas, team_deltas):
+        for (generation, game_id), (hours, matches, high_score) in deltas.items():
+            self.add(generation, game_id, hours, matches, high_score)
+        for (generation, team_id, game_id), values in team_deltas.items():
+            self.add_team(generation, team_id, game_id, *values)
+
+    def pending(self):
+        with self._lock:
+            return len(self._deltas) + len(self._team_deltas)
+
+    def flush(self):
+        deltas, team_deltas = self.drain()
+        if not deltas and not team_deltas:
+            return 0
+        connection = get_db_connection()
+        if not connection:
+            self.restore(deltas, team_deltas)
+            return 0
+        try:
+            cursor = connection.cursor(dictionary=True)
+            # Holding the shared lock keeps a reconcile from committing between
+            # this check and the UPDATE below
+            current = game_stats_generation(cursor)
+            per_game = {}
+            for (generation, game_id), (hours, matches, high_score) in deltas.items():
+                if generation < current:
+                    continue
+                totals = per_game.setdefault(game_id, [0.0, 0, 0])
+                totals[0] += hours
+                totals[1] += matches
+                totals[2] = max(totals[2], high_score)
+            per_team = {}
+            for (generation, team_id, game_id), values in team_deltas.items():
+                if generation < current:
+                    continue
+                totals = per_team.setdefault((team_id, game_id), [0, 0, 0, 0.0])
+                for i, value in enumerate(values):
+                    totals[i] += value
+            update_game_totals(cursor, per_game)
+            update_team_totals(cursor, per_team)
+            connection.commit()
+            return len(per_game) + len(per_team)
+        except Error as e:
+            connection.rollback()
+            print(f"Error flushing game stats: {e}")
+            self.restore(deltas, team_deltas)
+            return 0
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='game-stats-flusher', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(app.config['GAME_STATS_FLUSH_INTERVAL'])
+            self.flush()
+
+game_stats_buffer = GameStatsBuffer()
+atexit.register(game_stats_buffer.flush)
+
+def reconcile_game_stats(cursor):
+    # Rebuild the Games counters from Player_Games, discarding any drift. Bumping
+    # the generation first waits out in-flight buffered matches and makes every
+    # process drop the deltas it still holds for them; run this at the start of
+    # a transaction so the rebuild's snapshot is taken after the bump.
+    cursor.execute("UPDATE Game_Stats_Generation SET generation = generation + 1 WHERE id = 1")
+    cursor.execute("""
+        UPDATE Games g
+        LEFT JOIN (
+            SELECT
+                game_id,
+                SUM(playtime_hours) AS hours,
+                SUM(matches_played) AS matches,
+                MAX(high_score) AS high_score
+            FROM Player_Games
+            GROUP BY game_id
+        ) t ON g.game_id = t.game_id
+        SET
+            g.total_hours_played = COALESCE(t.hours, 0),
+            g.total_matches_played = COALESCE(t.matches, 0),
+            g.global_high_score = COALESCE(t.high_score, 0)
+    """)
+    updated = cursor.rowcount
+    # Buffered team deltas carry the same generation and are dropped with the
+    # Games ones, so the team totals are rebuilt as well
+    cursor.callproc('sp_RebuildTeamStats')
+    return updated
+
+@app.cli.command('rebuild-player-stats')
+def rebuild_player_stats_command():
+    # Backfill Player_Stats_Summary, then check it against the live aggregates
+    connection = get_db_connection()
+    if not connection:
+        print('Database connection failed')
+        return
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.callproc('sp_RebuildPlayerStatsSummary')
+        connection.commit()
+        cursor.execute("""
+            SELECT p.player_id
+            FROM Players p
+            LEFT JOIN Player_Stats_Summary s ON s.player_id = p.player_id
+            LEFT JOIN (
+                SELECT
+                    player_id,
+                    SUM(playtime_hours) AS total_playtime,
+                    SUM(wins) AS total_wins,
+                    SUM(losses) AS total_losses,
+                    SUM(matches_played) AS total_matches
+                FROM Player_Games
+                GROUP BY player_id
+            ) t ON t.player_id = p.player_id
+            WHERE NOT (COALESCE(s.total_playtime, 0) <=> COALESCE(t.total_playtime, 0)
+                   AND COALESCE(s.total_wins, 0) <=> COALESCE(t.total_wins, 0)
+                   AND COALESCE(s.total_losses, 0) <=> COALESCE(t.total_losses, 0)
+                   AND COALESCE(s.total_matches, 0) <=> COALESCE(t.total_matches, 0))
+        """)
+        mismatches = cursor.fetchall()
+        if mismatches:
+            print(f'{len(mismatches)} players differ: {[row["player_id"] for row in mismatches][:20]}')
+        else:
+            print('Player_Stats_Summary matches Player_Games')
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.cli.command('reconcile-game-stats')
+def reconcile_game_stats_command():
+    connection = get_db_connection()
+    if not connection:
+        print('Database connection failed')
+        return
+    try:
+        cursor = connection.cursor()
+        updated = reconcile_game_stats(cursor)
+        connection.commit()
+        print(f'Reconciled {updated} games')
+    finally:
+        cursor.close()
+        connection.close()
+
+# ==================== MATCH HISTORY ====================
+
+def record_match_history(cursor, matches):
+    # matches: [(player_id, game_id, playtime, is_win, score)], appended in multi-row chunks
+    for chunk in chunked(matches, app.config['BULK_INSERT_CHUNK']):
+        placeholders = ', '.join(['(%s, %s, NOW(), %s, %s, %s)'] * len(chunk))
+        cursor.execute(f"""
+            INSERT INTO Match_History (player_id, game_id, played_at, playtime_hours, is_win, score)
+            VALUES {placeholders}
+        """, [value for match in chunk for value in match])
+
+def _add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+def match_history_months(cursor):
+    # First day of each monthly partition (pYYYYMM holds that month), oldest first
+    cursor.execute("""
+        SELECT PARTITION_NAME AS name
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Match_History' AND PARTITION_NAME IS NOT NULL
+    """)
+    names = [row['name'] for row in cursor.fetchall()]
+    return sorted(datetime.strptime(name[1:], '%Y%m').date() for name in names if name != 'p_future')
+
+def _partitioned(cursor, table):
+    cursor.execute("""
+        SELECT COUNT(*) AS partitions
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+    """, (table,))
+    return cursor.fetchone()['partitions'] > 0
+
+def _has_rows(cursor, source):
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {source}) AS has_rows")
+    return bool(cursor.fetchone()['has_rows'])
+
+def maintain_match_history(cursor, retention_months, months_ahead, archive):
+    # Partition DDL, safe to rerun after a failure part way through. Matches are
+    # stamped NOW() and partitions exist months_ahead into the future, so
+    # p_future is normally empty and splitting it copies no rows. The first run
+    # is the exception: the schema starts with p_future alone, so every match
+    # recorded until then is copied into the new monthly partitions. Run it
+    # once right after loading the schema to keep that copy small.
+    this_month = date.today().replace(day=1)
+    months = match_history_months(cursor)
+    
+    added = []
+    month = _add_months(months[-1], 1) if months else this_month
+    while month <= _add_months(this_month, months_ahead):
+        added.append(month)
+        month = _add_months(month, 1)
+    if added:
+        partitions = ', '.join(f"PARTITION p{m:%Y%m} VALUES LESS THAN ('{_add_months(m, 1):%Y-%m-%d}')" for m in added)
+        cursor.execute(f"""
+            ALTER TABLE Match_History REORGANIZE PARTITION p_future INTO (
+                {partitions}, PARTITION p_future VALUES LESS THAN (MAXVALUE)
+            )
+        """)
+    
+    cutoff = _add_months(this_month, -retention_months)
+    expired = [m for m in months if _add_months(m, 1) <= cutoff]
+    for month in expired:
+        name = f'p{month:%Y%m}'
+        if archive:
+            # EXCHANGE swaps the partition's tablespace with an empty table, so
+            # the archive can be dumped or moved without copying rows here
+            table = f'Match_History_Archive_{month:%Y%m}'
+            # An earlier run may have stopped after creating the table (still
+            # partitioned) or after the exchange (archive full, partition empty)
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} LIKE Match_History")
+            if _partitioned(cursor, table):
+                cursor.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+            if _has_rows(cursor, table):
+                if _has_rows(cursor, f'Match_History PARTITION ({name})'):
+                    raise Error(msg=f'{table} already holds rows and {name} is not empty')
+            else:
+                cursor.execute(f"ALTER TABLE Match_History EXCHANGE PARTITION {name} WITH TABLE {table}")
+        cursor.execute(f"ALTER TABLE Match_History DROP PARTITION {name}")
+    
+    return {
+        'added': [f'p{m:%Y%m}' for m in added],
+        'archived' if archive else 'dropped': [f'p{m:%Y%m}' for m in expired]
+    }
+
+@app.cli.command('maintain-match-history')
+def maintain_match_history_command():
+    # Meant for a daily cron; safe to run repeatedly
+    connection = get_db_connection()
+    if not connection:
+        print('Database connection failed')
+        return
+    try:
+        cursor = connection.cursor(dictionary=True)
+        result = maintain_match_history(cursor, app.config['MATCH_HISTORY_RETENTION_MONTHS'],
+                                        app.config['MATCH_HISTORY_MONTHS_AHEAD'], app.config['MATCH_HISTORY_ARCHIVE'])
+        for action, names in result.items():
+            print(f'{action}: {", ".join(names) or "none"}')
+    finally:
+        cursor.close()
+        connection.close()
+
+# ==================== POPULARITY ====================
+
+# (window in days, weight): recent activity counts for more
+POPULARITY_WINDOWS = ((1, 0.5), (7, 0.3), (30, 0.2))
+# Share of each window's score per signal; each signal is scaled against the
+# busiest game in that window, so scores land between 0 and 100
+POPULARITY_SIGNALS = (('matches', 0.4), ('players', 0.4), ('hours', 0.2))
+
+def popularity_sql():
+    columns = []
+    terms = []
+    for days, weight in POPULARITY_WINDOWS:
+        since = f'played_at >= NOW() - INTERVAL {days} DAY'
+        columns.append(f'SUM({since}) AS matches_{days}')
+        columns.append(f'COUNT(DISTINCT IF({since}, player_id, NULL)) AS players_{days}')
+        columns.append(f'SUM(IF({since}, playtime_hours, 0)) AS hours_{days}')
+        for signal, share in POPULARITY_SIGNALS:
+            column = f'{signal}_{days}'
+            terms.append(f'{round(weight * share, 4)} * COALESCE({column} / NULLIF(MAX({column}) OVER (), 0), 0)')
+    longest = max(days for days, _ in POPULARITY_WINDOWS)
+    # One grouped pass over the recent Match_History partitions, one UPDATE
+    return f"""
+        UPDATE Games g
+        LEFT JOIN (
+            SELECT game_id, ROUND(100 * ({' + '.join(terms)}), 2) AS score
+            FROM (
+                SELECT game_id, {', '.join(columns)}
+                FROM Match_History
+                WHERE played_at >= NOW() - INTERVAL {longest} DAY
+                GROUP BY game_id
+            ) activity
+        ) s ON s.game_id = g.game_id
+        SET g.popularity_score = COALESCE(s.score, 0)
+        WHERE g.popularity_score <> COALESCE(s.score, 0)
+    """
+
+def compute_popularity(cursor):
+    cursor.execute(popularity_sql())
+    return cursor.rowcount
+
+class PopularityJob:
+    # Every process polls the 'popularity' row in Scheduled_Jobs on a daemon
+    # thread started by the first request. The process that claims a due run
+    # recomputes the scores while the others skip the locked row; a run that
+    # changed scores bumps the version, and each process drops its games cache
+    # when it sees a new version, whichever process ran the update.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_run = None
+        self.last_error = None
+        self.version = None
+
+    def ensure_started(self):
+        if self._thread is not None or app.config['POPULARITY_POLL_INTERVAL'] <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='popularity', daemon=True)
+                self._thread.start()
+
+    def run_once(self, force=False):
+        # Returns the number of games this call updated, or None when it did not run
+        connection = get_db_connection()
+        if not connection:
+            return None
+        updated = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            claimed = False
+            if force:
+                cursor.execute("SELECT job_name FROM Scheduled_Jobs WHERE job_name = 'popularity' FOR UPDATE")
+                claimed = cursor.fetchone() is not None
+            elif app.config['POPULARITY_INTERVAL'] > 0:
+                cursor.execute("""
+                    SELECT job_name FROM Scheduled_Jobs
+                    WHERE job_name = 'popularity'
+                      AND (last_run_at IS NULL OR last_run_at <= NOW(6) - INTERVAL %s SECOND)
+                    FOR UPDATE SKIP LOCKED
+                """, (app.config['POPULARITY_INTERVAL'],))
+                claimed = cursor.fetchone() is not None
+            if claimed:
+                updated = compute_popularity(cursor)
+                cursor.execute("""
+                    UPDATE Scheduled_Jobs
+                    SET last_run_at = NOW(6), version = version + %s
+                    WHERE job_name = 'popularity'
+                """, (1 if updated else 0,))
+            connection.commit()
+            if claimed:
+                self.last_run = time.time()
+            cursor.execute("SELECT version FROM Scheduled_Jobs WHERE job_name = 'popularity'")
+            row = cursor.fetchone()
+            connection.commit()
+            self.last_error = None
+        except Error as e:
+            connection.rollback()
+            self.last_error = str(e)
+            print(f"Error computing popularity: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+        if row is not None and row['version'] != self.version:
+            self.version = row['version']
+            invalidate_games_cache()
+        return updated
+
+    def _run(self):
+        while True:
+            self.run_once()
+            time.sleep(app.config['POPULARITY_POLL_INTERVAL'])
+
+popularity_job = PopularityJob()
+
+@app.cli.command('compute-popularity')
+def compute_popularity_command():
+    # Runs now, whether or not a scheduled run is due
+    print(f'Updated popularity for {popularity_job.run_once(force=True) or 0} games')
+
+# ==================== LEADERBOARDS ====================
+
+class _SkipNode:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, level):
+        self.key = key
+        self.value = value
+        self.next = [None] * level
+        self.width = [1] * level
+
+class IndexableSkipList:
+    # Sorted by key, with link widths so rank and positional lookups are O(log n)
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self.head = _SkipNode(None, None, self.MAX_LEVEL)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key, value):
+        update = [None] * self.MAX_LEVEL
+        positions = [0] * self.MAX_LEVEL
+        node, pos = self.head, 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                pos += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = pos
+        level = self._random_level()
+        new = _SkipNode(key, value, level)
+        new_pos = pos + 1
+        for i in range(level):
+            prev = update[i]
+            new.next[i] = prev.next[i]
+            new.width[i] = positions[i] + prev.width[i] + 1 - new_pos
+            prev.next[i] = new
+            prev.width[i] = new_pos - positions[i]
+        for i in range(level, self.MAX_LEVEL):
+            update[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        update = [None] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for i in range(self.MAX_LEVEL):
+            prev = update[i]
+            if prev.next[i] is target:
+                prev.width[i] += target.width[i] - 1
+                prev.next[i] = target.next[i]
+            else:
+                prev.width[i] -= 1
+        self.size -= 1
+
+    def rank(self, key):
+        # 0-based position of key
+        node, pos = self.head, 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                pos += node.width[i]
+                node = node.next[i]
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return pos
+
+    def slice(self, start, count):
+        # Values at 0-based positions [start, start + count)
+        if start >= self.size or count <= 0:
+            return []
+        node, pos = self.head, 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and pos + node.width[i] <= start:
+                pos += node.width[i]
+                node = node.next[i]
+        values = []
+        node = node.next[0]
+        while node is not None and len(values) < count:
+            values.append(node.value)
+            node = node.next[0]
+        return values
+
+# Sort keys per metric; player_id breaks ties so every key is unique
+LEADERBOARD_METRICS = {
+    'wins': lambda e: (-e['wins'], -e['high_score'], e['player_id']),
+    'high_score': lambda e: (-e['high_score'], -e['wins'], e['player_id']),
+    'playtime': lambda e: (-e['playtime_hours'], e['player_id'])
+}
+
+class Leaderboard:
+    def __init__(self, metric):
+        self.key_fn = LEADERBOARD_METRICS[metric]
+        self.entries = IndexableSkipList()
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def upsert(self, entry, replace=True):
+        # replace=False keeps an existing entry: snapshot rows loaded while the
+        # board is built must not overwrite newer rows from refresh()
+        with self.lock:
+            old_key = self.keys.get(entry['player_id'])
+            if old_key is not None:
+                if not replace:
+                    return
+                self.entries.remove(old_key)
+            key = self.key_fn(entry)
+            self.entries.insert(key, entry)
+            self.keys[entry['player_id']] = key
+
+    def page(self, offset, limit):
+        with self.lock:
+            entries = self.entries.slice(offset, limit)
+            return len(self.entries), [{'rank': offset + i + 1, **e} for i, e in enumerate(entries)]
+
+    def around(self, player_id, radius):
+        with self.lock:
+            key = self.keys.get(player_id)
+            if key is None:
+                return len(self.entries), None, []
+            rank = self.entries.rank(key)
+            start = max(rank - radius, 0)
+            entries = self.entries.slice(start, rank - start + radius + 1)
+            return len(self.entries), rank + 1, [{'rank': start + i + 1, **e} for i, e in enumerate(entries)]
+
+def _leaderboard_entry(row):
+    return {
+        'player_id': row['player_id'],
+        'username': row['username'],
+        'wins': int(row['wins']),
+        'high_score': int(row['high_score']),
+        'playtime_hours': float(row['playtime_hours'])
+    }
+
+LEADERBOARD_ROW_SQL = """
+    SELECT pg.player_id, pg.game_id, p.username, pg.wins, pg.high_score, pg.playtime_hours
+    FROM Player_Games pg
+    JOIN Players p ON pg.player_id = p.player_id
+    WHERE {where}
+"""
+
+class LeaderboardRegistry:
+    # A game's boards, one per metric, are built together from a single scan of
+    # its Player_Games rows the first time the game is viewed, and kept current
+    # by this process's match-recording path. Every LEADERBOARD_RESYNC_INTERVAL
+    # seconds one request also re-reads the rows changed since the last sync,
+    # by the indexed last_played_date, for every loaded game at once, to pick
+    # up other processes' matches. Boards are caches, so both read the primary.
+    # Each sync re-reads SYNC_OVERLAP extra seconds, so a transaction that
+    # stamped last_played_date just before a sync but committed after it is
+    # still picked up.
+    SYNC_OVERLAP = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+        self._building = {}
+        self._build_locks = {}
+        self._sync_lock = threading.Lock()
+        self._sync_from = None
+        self._synced_at = None
+
+    def get(self, cursor, game_id, metric):
+        self._sync_if_due(cursor)
+        boards = self._boards.get(game_id)
+        if boards is None:
+            with self._lock:
+                build_lock = self._build_locks.setdefault(game_id, threading.Lock())
+            with build_lock:
+                boards = self._boards.get(game_id)
+                if boards is None:
+                    boards = on_primary(cursor, self._build, game_id)
+        return boards[metric] if boards is not None else None
+
+    def _build(self, cursor, game_id):
+        cursor.execute("SELECT 1 FROM Games WHERE game_id = %s", (game_id,))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND AS sync_from", (self.SYNC_OVERLAP,))
+        sync_from = cursor.fetchone()['sync_from']
+        boards = {metric: Leaderboard(metric) for metric in LEADERBOARD_METRICS}
+        # refresh() feeds boards mid-build too, so matches committed during the scan are kept
+        with self._lock:
+            self._building[game_id] = boards
+        try:
+            cursor.execute(LEADERBOARD_ROW_SQL.format(where='pg.game_id = %s'), (game_id,))
+            for row in cursor.fetchall():
+                entry = _leaderboard_entry(row)
+                for board in boards.values():
+                    board.upsert(entry, replace=False)
+        except Exception:
+            with self._lock:
+                self._building.pop(game_id, None)
+            raise
+        with self._lock:
+            self._building.pop(game_id, None)
+            self._boards[game_id] = boards
+            if self._sync_from is None:
+                self._sync_from = sync_from
+                self._synced_at = time.monotonic()
+        return boards
+
+    def _sync_if_due(self, cursor):
+        interval = app.config['LEADERBOARD_RESYNC_INTERVAL']
+        if interval <= 0 or self._synced_at is None or time.monotonic() - self._synced_at < interval:
+            return
+        # One request syncs; everyone else keeps reading the current boards
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            on_primary(cursor, self._sync)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, cursor):
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND AS sync_from", (self.SYNC_OVERLAP,))
+        sync_from = cursor.fetchone()['sync_from']
+        # Boards built after this point already saw the rows read below
+        loaded = self._loaded()
+        cursor.execute(LEADERBOARD_ROW_SQL.format(where='pg.last_played_date >= %s'), (self._sync_from,))
+        self._upsert_rows(cursor.fetchall(), loaded)
+        self._sync_from = sync_from
+        self._synced_at = time.monotonic()
+
+    def _loaded(self):
+        with self._lock:
+            loaded = {}
+            for registry in (self._boards, self._building):
+                for game_id, boards in registry.items():
+                    loaded.setdefault(game_id, []).extend(boards.values())
+            return loaded
+
+    def _upsert_rows(self, rows, loaded):
+        for row in rows:
+            boards = loaded.get(row['game_id'])
+            if boards:
+                entry = _leaderboard_entry(row)
+                for board in boards:
+                    board.upsert(entry)
+
+    def refresh(self, cursor, pairs):
+        # Re-read the (player_id, game_id) rows that changed, for games with loaded boards
+        loaded = self._loaded()
+        pairs = [(int(player_id), int(game_id)) for player_id, game_id in pairs]
+        pairs = [pair for pair in pairs if pair[1] in loaded]
+        for chunk in chunked(pairs, app.config['BULK_INSERT_CHUNK']):
+            params = [value for pair in chunk for value in pair]
+            where = f"(pg.player_id, pg.game_id) IN ({', '.join(['(%s, %s)'] * len(chunk))})"
+            cursor.execute(LEADERBOARD_ROW_SQL.format(where=where), params)
+            self._upsert_rows(cursor.fetchall(), loaded)
+
+leaderboards = LeaderboardRegistry()
+
+def after_matches_recorded(cursor, pairs):
+    # Called once match results for these (player_id, game_id) pairs have committed
+    leaderboards.refresh(cursor, pairs)
+
+# ==================== ACHIEVEMENT RULES ====================
+
+ACHIEVEMENT_STATS = ('wins', 'matches_played', 'playtime_hours', 'high_score')
+
+achievement_rules_cache = TTLCache(app.config['ACHIEVEMENT_RULES_TTL'])
+
+# {achievement_id: (game_id, stat, threshold)} as of this process's last reload
+_loaded_rules = None
+_loaded_rules_lock = threading.Lock()
+
+def achievement_rule_index(cursor):
+    # {(game_id, stat): (sorted thresholds, achievement ids in the same order)}
+    index = achievement_rules_cache.get('index')
+    if index is not None:
+        return index
+    epoch = achievement_rules_cache.epoch()
+    cursor.execute("""
+        SELECT a.game_id, r.stat, r.threshold, r.achievement_id
+        FROM Achievement_Rules r
+        JOIN Achievements a ON a.achievement_id = r.achievement_id
+        ORDER BY a.game_id, r.stat, r.threshold
+    """)
+    index = {}
+    rules = {}
+    for row in cursor.fetchall():
+        thresholds, ids = index.setdefault((row['game_id'], row['stat']), ([], []))
+        thresholds.append(float(row['threshold']))
+        ids.append(row['achievement_id'])
+        rules[row['achievement_id']] = (row['game_id'], row['stat'], float(row['threshold']))
+    achievement_rules_cache.set('index', index, epoch=epoch)
+    rules_reloaded(rules)
+    return index
+
+def rules_reloaded(rules):
+    # A rule added or changed in another process was invisible here until this
+    # reload, so thresholds crossed by this process's matches in the meantime
+    # were never awarded. Backfill the changed rules on a separate connection;
+    # the reload usually happens inside a match transaction.
+    global _loaded_rules
+    with _loaded_rules_lock:
+        previous, _loaded_rules = _loaded_rules, rules
+    if previous is None:
+        return
+    changed = [achievement_id for achievement_id, rule in rules.items() if previous.get(achievement_id) != rule]
+    if changed:
+        threading.Thread(target=evaluate_achievement_rules, args=(changed,),
+                         name='achievement-backfill', daemon=True).start()
+
+def evaluate_achievement_rules(achievement_ids):
+    connection = get_db_connection()
+    if not connection:
+        return
+    try:
+        cursor = connection.cursor()
+        for achievement_id in achievement_ids:
+            cursor.callproc('sp_EvaluateAchievementRules', [achievement_id])
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        print(f"Error evaluating achievement rules: {e}")
+    finally:
+        cursor.close()
+        connection.close()
+
+def crossed_rules(index, game_id, stat, old, new):
+    # Achievements whose threshold lies in (old, new]
+    entry = index.get((game_id, stat))
+    if entry is None or new <= old:
+        return []
+    thresholds, ids = entry
+    return ids[bisect.bisect_right(thresholds, old):bisect.bisect_right(thresholds, new)]
+
+def award_achievements(cursor, aggregates):
+    # aggregates: {(player_id, game_id): [playtime, wins, losses, matches, high_score]}
+    # Runs inside the match transaction, after Player_Games has been updated.
+    # Only rules on stats the matches moved, with thresholds between the old and
+    # new totals, are checked; returns the newly earned (player_id, achievement_id) pairs.
+    index = achievement_rule_index(cursor)
+    games_with_rules = {game_id for game_id, _ in index}
+    pairs = [pair for pair in aggregates if pair[1] in games_with_rules]
+    if not pairs:
+        return []
+    
+    totals = {}
+    for chunk in chunked(pairs, app.config['BULK_INSERT_CHUNK']):
+        cursor.execute(f"""
+            SELECT player_id, game_id, wins, matches_played, playtime_hours, high_score
+            FROM Player_Games
+            WHERE (player_id, game_id) IN ({', '.join(['(%s, %s)'] * len(chunk))})
+        """, [value for pair in chunk for value in pair])
+        totals.update(((r['player_id'], r['game_id']), r) for r in cursor.fetchall())
+    
+    candidates = set()
+    for pair in pairs:
+        row = totals.get(pair)
+        if row is None:
+            continue
+        player_id, game_id = pair
+        playtime, wins, _, matches, high_score = aggregates[pair]
+        for stat, delta in (('wins', wins), ('matches_played', matches), ('playtime_hours', playtime)):
+            if delta > 0:
+                new = float(row[stat])
+                candidates.update((player_id, a) for a in crossed_rules(index, game_id, stat, new - delta, new))
+        # A score only crosses thresholds when it set the new high score
+        if high_score >= row['high_score']:
+            candidates.update((player_id, a) for a in crossed_rules(index, game_id, 'high_score', -1, high_score))
+    if not candidates:
+        return []
+    
+    candidates = sorted(candidates)
+    earned = set()
+    for chunk in chunked(candidates, app.config['BULK_INSERT_CHUNK']):
+        cursor.execute(f"""
+            SELECT player_id, achievement_id FROM Player_Achievements
+            WHERE (player_id, achievement_id) IN ({', '.join(['(%s, %s)'] * len(chunk))})
+        """, [value for pair in chunk for value in pair])
+        earned.update((r['player_id'], r['achievement_id']) for r in cursor.fetchall())
+    awards = [pair for pair in candidates if pair not in earned]
+    for chunk in chunked(awards, app.config['BULK_INSERT_CHUNK']):
+        cursor.execute(f"""
+            INSERT IGNORE INTO Player_Achievements (player_id, achievement_id)
+            VALUES {', '.join(['(%s, %s)'] * len(chunk))}
+        """, [value for pair in chunk for value in pair])
+    return awards
+
+# ==================== PASSWORD HASHING ====================
+
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    # bcrypt releases the GIL, so a small dedicated pool keeps logins from tying
+    # up request threads; past max_pending we shed load instead of queueing.
+    def __init__(self, workers, max_pending, rounds):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def _timed(self, submitted, fn, *args):
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._wait_total += started - submitted
+                self._run_total += finished - started
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy('Too many authentication requests, try again shortly')
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        try:
+            return self._executor.submit(self._timed, time.monotonic(), fn, *args).result()
+        finally:
+            record_phase('bcrypt', time.perf_counter() - started)
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+            self._slots.release()
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def check(self, password, password_hash):
+        try:
+            return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        except ValueError:
+            # Malformed stored hash
+            return False
+
+    def needs_rehash(self, password_hash):
+        # $2b$<cost>$<salt+hash>
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'pending': self._pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_queue_ms': round(self._wait_total / self._completed * 1000, 3) if self._completed else 0.0,
+                'avg_hash_ms': round(self._run_total / self._completed * 1000, 3) if self._completed else 0.0
+            }
+
+password_hasher = PasswordHasher(
+    workers=app.config['BCRYPT_WORKERS'],
+    max_pending=app.config['BCRYPT_MAX_PENDING'],
+    rounds=app.config['BCRYPT_ROUNDS']
+)
+
+# ==================== AUTHENTICATION ENDPOINTS ====================
+
+@app.route('/api/auth/signup', methods=['POST'])
+def signup():
+    data = request.get_json()
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+    
+    if not username or not email or not password:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Check if username or email already exists, before paying for a bcrypt hash
+        cursor.execute("SELECT 1 FROM Players WHERE username = %s OR email = %s LIMIT 1", (username, email))
+        exists = cursor.fetchone() is not None
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+    
+    if exists:
+        return jsonify({'error': 'Username or email already exists'}), 409
+    
+    # Hash with no connection checked out so none is held for the bcrypt work
+    try:
+        password_hash = password_hasher.hash(password)
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Insert new player
+        cursor.execute(
+            "INSERT INTO Players (username, email, password_hash, account_status) VALUES (%s, %s, %s, 'active')",
+            (username, email, password_hash)
+        )
+        connection.commit()
+        
+        # Assign default role (Player)
+        player_id = cursor.lastrowid
+        cursor.execute("INSERT INTO Player_Roles (player_id, role_id) VALUES (%s, 3)", (player_id,))
+        connection.commit()
+        
+        return jsonify({'message': 'Account created successfully', 'player_id': player_id}), 201
+    
+    except Error as e:
+        connection.rollback()
+        # A concurrent signup can take the name or email after the check above
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return jsonify({'error': 'Username or email already exists'}), 409
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/auth/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'Missing credentials'}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Get player
+        cursor.execute("SELECT * FROM Players WHERE username = %s", (username,))
+        player = cursor.fetchone()
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+    
+    if not player:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    
+    # Check if account is active
+    account_statuses.set_status(player['player_id'], player['account_status'])
+    if player['account_status'] != 'active':
+        return jsonify({'error': f'Account is {player["account_status"]}'}), 403
+    
+    # Verify password on the hashing pool; the connection is back in the pool meanwhile
+    try:
+        if not password_hasher.check(password, player['password_hash']):
+            return jsonify({'error': 'Invalid credentials'}), 401
+        new_hash = password_hasher.hash(password) if password_hasher.needs_rehash(player['password_hash']) else None
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Update last login, upgrading the hash if it was made with an old work factor
+        if new_hash:
+            cursor.execute("UPDATE Players SET last_login = NOW(), password_hash = %s WHERE player_id = %s",
+                           (new_hash, player['player_id']))
+        else:
+            cursor.execute("UPDATE Players SET last_login = NOW() WHERE player_id = %s", (player['player_id'],))
+        connection.commit()
+        
+        # Generate JWT token
+        token = jwt.encode({
+            'player_id': player['player_id'],
+            'username': player['username'],
+            'exp': datetime.utcnow() + timedelta(hours=24)
+        }, app.config['SECRET_KEY'], algorithm='HS256')
+        
+        return jsonify({
+            'token': token,
+            'player': {
+                'player_id': player['player_id'],
+                'username': player['username'],
+                'email': player['email']
+            }
+        }), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user_id):
+    token = bearer_token()
+    digest = token_digest(token)
+    claims = token_cache.get(digest)
+    exp = claims[1] if claims and claims[1] is not None else time.time() + 24 * 3600
+
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        cursor = connection.cursor()
+        # Expired tokens are rejected on their own, so their rows can go
+        cursor.execute("DELETE FROM Revoked_Tokens WHERE expires_at <= NOW()")
+        cursor.execute("""
+            INSERT INTO Revoked_Tokens (token_digest, expires_at)
+            VALUES (%s, FROM_UNIXTIME(%s))
+            ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)
+        """, (digest, exp))
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+    account_statuses.revoke(digest, exp)
+    token_cache.pop(digest)
+    return jsonify({'message': 'Logged out successfully'}), 200
+
+# ==================== PLAYER PROFILE ENDPOINTS ====================
+
+PROFILE_SECTIONS = ('player_info', 'characters', 'games', 'friends')
+
+@app.route('/api/player/profile', methods=['GET'])
+@token_required
+def get_player_profile(current_user_id):
+    fields = request.args.get('fields')
+    if fields:
+        requested = {f.strip() for f in fields.split(',') if f.strip()}
+        unknown = requested - set(PROFILE_SECTIONS)
+        if unknown:
+            return jsonify({'error': f'Unknown profile fields: {", ".join(sorted(unknown))}'}), 400
+    else:
+        requested = set(PROFILE_SECTIONS)
+    # The procedure emits result sets in PROFILE_SECTIONS order
+    sections = [s for s in PROFILE_SECTIONS if s in requested]
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Single round trip keyed on player_id
+        cursor.callproc('sp_GetPlayerProfileById', [current_user_id, ','.join(sections)])
+        results = [result.fetchall() for result in cursor.stored_results()]
+        
+        if not results:
+            return jsonify({'error': 'Player not found'}), 404
+        
+        profile_data = dict(zip(sections, results))
+        if 'player_info' in profile_data:
+            profile_data['player_info'] = profile_data['player_info'][0] if profile_data['player_info'] else {}
+        
+        return jsonify(profile_data), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+# Query text is shared with the async entry point in asgi.py.
+# Player_Stats_Summary is kept current by triggers on Player_Games, so this is
+# a single primary-key lookup instead of two SUMs over the player's games.
+PLAYER_STATS_SQL = """
+    SELECT total_playtime, total_wins, total_losses, total_matches, win_rate
+    FROM Player_Stats_Summary
+    WHERE player_id = %s
+"""
+
+def summarize_player_stats(row):
+    # Players who have never recorded a match have no summary row yet
+    if row is None:
+        return {'total_playtime': 0.0, 'total_wins': 0, 'total_losses': 0, 'total_matches': 0, 'win_rate': 0}
+    return {
+        'total_playtime': float(row['total_playtime']),
+        'total_wins': row['total_wins'],
+        'total_losses': row['total_losses'],
+        'total_matches': row['total_matches'],
+        'win_rate': float(row['win_rate'])
+    }
+
+def fetch_player_stats(cursor, player_id):
+    return summarize_player_stats(fetch_prepared(cursor, PLAYER_STATS_SQL, (player_id,), one=True))
+
+@app.route('/api/player/stats', methods=['GET'])
+@token_required
+def get_player_stats(current_user_id):
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        return jsonify(fetch_player_stats(cursor, current_user_id)), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+PLAYER_MATCHES_SQL = """
+    SELECT mh.match_id, mh.game_id, g.title AS game_title, mh.played_at,
+           mh.playtime_hours, mh.is_win, mh.score
+    FROM Match_History mh
+    JOIN Games g ON g.game_id = mh.game_id
+    WHERE mh.player_id = %s
+    {keyset}
+    ORDER BY mh.played_at DESC, mh.match_id DESC
+    LIMIT %s
+"""
+
+@app.route('/api/player/matches', methods=['GET'])
+@token_required
+def get_player_matches(current_user_id):
+    try:
+        limit, after = page_args(2)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Keyset on (played_at, match_id), served by idx_match_history_player
+    params = [current_user_id]
+    keyset = ''
+    if after is not None:
+        keyset = 'AND (mh.played_at < %s OR (mh.played_at = %s AND mh.match_id < %s))'
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit + 1)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        matches = fetch_prepared(cursor, PLAYER_MATCHES_SQL.format(keyset=keyset), params)
+        return paged_response(matches, limit, lambda r: [r['played_at'], r['match_id']]), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+# ==================== GAMES ENDPOINTS ====================
+
+GAME_COUNTER_COLUMNS = ('total_matches_played', 'global_high_score', 'total_hours_played')
+
+# The catalog rarely changes and is cached for GAMES_CATALOG_TTL; the counters
+# move with every match and live in their own short-TTL entry.
+games_cache = TTLCache(app.config['GAMES_CATALOG_TTL'])
+
+GAMES_CATALOG_SQL = """
+    SELECT game_id, title, genre, developer_name, date_added, is_active, popularity_score
+    FROM Games
+    WHERE is_active = TRUE
+    ORDER BY {order}
+"""
+# sort parameter -> ORDER BY; 'popular' reads idx_games_popularity backwards
+GAMES_SORTS = {
+    'title': 'title',
+    'popular': 'popularity_score DESC, game_id DESC'
+}
+
+def fetch_active_games(cursor, sort='title'):
+    cursor.execute(GAMES_CATALOG_SQL.format(order=GAMES_SORTS[sort]))
+    return cursor.fetchall()
+
+def fetch_game_counters(cursor):
+    cursor.execute(f"SELECT game_id, {', '.join(GAME_COUNTER_COLUMNS)} FROM Games WHERE is_active = TRUE")
+    return {row['game_id']: row for row in cursor.fetchall()}
+
+def invalidate_games_cache():
+    games_cache.invalidate()
+
+def on_primary(cursor, loader, *args):
+    # Runs loader for a cache refill. Refills always read the primary: a result
+    # read from a lagging replica would stay in the cache for its whole TTL.
+    # cursor is reused when it is already on the primary.
+    pooled = getattr(cursor, 'pooled_connection', None)
+    if cursor is not None and (pooled is None or not pooled.replica):
+        return loader(cursor, *args)
+    connection = get_db_connection(primary=True)
+    if not connection:
+        raise Error(msg='Database connection failed')
+    try:
+        own_cursor = connection.cursor(dictionary=True)
+        try:
+            return loader(own_cursor, *args)
+        finally:
+            own_cursor.close()
+    finally:
+        connection.close()
+
+def _cached(key, loader, cursor, ttl=None):
+    value = games_cache.get(key)
+    if value is not None:
+        return value
+    epoch = games_cache.epoch()
+    value = on_primary(cursor, loader)
+    games_cache.set(key, value, ttl, epoch)
+    return value
+
+def cached_active_games(cursor=None, with_counters=False, sort='title'):
+    # Only touches the database on a cache miss; pass a cursor to reuse an open connection
+    if sort == 'title':
+        games = _cached('catalog', fetch_active_games, cursor)
+    else:
+        games = _cached(('catalog', sort), lambda c: fetch_active_games(c, sort), cursor)
+    if not with_counters:
+        return games
+    counters = _cached('counters', fetch_game_counters, cursor, app.config['GAMES_COUNTERS_TTL'])
+    empty = dict.fromkeys(GAME_COUNTER_COLUMNS, 0)
+    return [{**game, **{c: counters.get(game['game_id'], empty)[c] for c in GAME_COUNTER_COLUMNS}}
+            for game in games]
+
+def games_response_body(with_counters, sort='title'):
+    # Rendered body and ETag are cached next to the rows they were built from
+    key = ('body', with_counters, sort)
+    cached = games_cache.get(key)
+    if cached is None:
+        epoch = games_cache.epoch()
+        body = app.json.dumps(cached_active_games(with_counters=with_counters, sort=sort))
+        cached = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+        ttl = app.config['GAMES_COUNTERS_TTL'] if with_counters else None
+        games_cache.set(key, cached, ttl, epoch)
+    return cached
+
+@app.route('/api/games', methods=['GET'])
+@token_required
+def get_all_games(current_user_id):
+    with_counters = 'counters' in request.args.get('include', '').split(',')
+    sort = request.args.get('sort', 'title')
+    if sort not in GAMES_SORTS:
+        return jsonify({'error': f'sort must be one of {", ".join(GAMES_SORTS)}'}), 400
+    try:
+        body, etag = games_response_body(with_counters, sort)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    # Answers If-None-Match with a 304
+    return response.make_conditional(request)
+
+PLAYER_GAMES_PAGE_SQL = """
+    SELECT 
+        g.game_id,
+        g.title,
+        g.genre,
+        pg.playtime_hours,
+        pg.player_rank,
+        pg.wins,
+        pg.losses,
+        pg.matches_played,
+        pg.high_score,
+        pg.last_played_date
+    FROM Player_Games pg
+    JOIN Games g ON pg.game_id = g.game_id
+    WHERE pg.player_id = %s
+    {keyset}
+    ORDER BY pg.playtime_hours DESC, pg.game_id DESC
+    {limit}
+"""
+PLAYER_GAMES_FIRST_PAGE_SQL = PLAYER_GAMES_PAGE_SQL.format(keyset='', limit='LIMIT %s')
+
+def fetch_player_games(cursor, player_id, limit=None, after=None):
+    # Keyset on (playtime_hours, game_id), served by idx_player_games_player_playtime
+    params = [player_id]
+    keyset = ''
+    if after is not None:
+        keyset = 'AND (pg.playtime_hours < %s OR (pg.playtime_hours = %s AND pg.game_id < %s))'
+        params.extend([after[0], after[0], after[1]])
+    if limit is not None:
+        params.append(limit)
+    sql = PLAYER_GAMES_PAGE_SQL.format(keyset=keyset, limit='LIMIT %s' if limit is not None else '')
+    return fetch_prepared(cursor, sql, params)
+
+@app.route('/api/games/player', methods=['GET'])
+@token_required
+def get_player_games(current_user_id):
+    try:
+        limit, after = page_args(2)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        rows = fetch_player_games(cursor, current_user_id, limit + 1, after)
+        return paged_response(rows, limit, lambda r: [r['playtime_hours'], r['game_id']]), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/games/<int:game_id>/winrate', methods=['GET'])
+@token_required
+def get_game_winrate(current_user_id, game_id):
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Use function to get win rate
+        cursor.execute("SELECT fn_GetPlayerWinRate(%s, %s) as win_rate", (current_user_id, game_id))
+        result = cursor.fetchone()
+        
+        return jsonify({'win_rate': float(result['win_rate'])}), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+def id_list_arg(name):
+    # Comma separated integer ids, or None when the parameter is absent
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        ids = sorted({int(v) for v in raw.split(',') if v.strip()})
+    except ValueError:
+        raise ValueError(f'{name} must be a comma separated list of ids')
+    if len(ids) > app.config['WINRATE_MAX_IDS']:
+        raise ValueError(f'At most {app.config["WINRATE_MAX_IDS"]} {name}')
+    return ids
+
+@app.route('/api/games/winrates', methods=['GET'])
+@token_required
+def get_game_winrates(current_user_id):
+    try:
+        player_ids = id_list_arg('player_ids') or [current_user_id]
+        game_ids = id_list_arg('game_ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # One range read per player on the (player_id, game_id) primary key,
+    # with the same rounding as fn_GetPlayerWinRate
+    params = list(player_ids)
+    game_filter = ''
+    if game_ids:
+        game_filter = f"AND game_id IN ({', '.join(['%s'] * len(game_ids))})"
+        params.extend(game_ids)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT
+                player_id,
+                game_id,
+                wins,
+                matches_played,
+                IF(matches_played > 0, ROUND(wins / matches_played * 100, 2), 0.00) AS win_rate
+            FROM Player_Games
+            WHERE player_id IN ({', '.join(['%s'] * len(player_ids))})
+            {game_filter}
+            ORDER BY player_id, game_id
+        """, params)
+        rows = cursor.fetchall()
+        
+        win_rates = [{**row, 'win_rate': float(row['win_rate'])} for row in rows]
+        if game_ids:
+            # Explicitly requested games that were never played report 0, like the function does
+            seen = {(row['player_id'], row['game_id']) for row in rows}
+            win_rates.extend({'player_id': p, 'game_id': g, 'wins': 0, 'matches_played': 0, 'win_rate': 0.0}
+                             for p in player_ids for g in game_ids if (p, g) not in seen)
+            win_rates.sort(key=lambda r: (r['player_id'], r['game_id']))
+        
+        return jsonify({'win_rates': win_rates}), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/games/match', methods=['POST'])
+@token_required
+def record_match(current_user_id):
+    data = request.get_json()
+    game_id = data.get('game_id')
+    playtime = data.get('playtime')
+    is_win = data.get('is_win')
+    score = data.get('score')
+    
+    if not all([game_id, playtime is not None, is_win is not None, score is not None]):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    # The match form posts its field values as strings; achievement rules,
+    # leaderboards and the stats buffer are all keyed by integer game_id
+    try:
+        game_id = int(game_id)
+        playtime = float(playtime)
+        score = int(score)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'game_id and score must be integers and playtime a number'}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        match = {(current_user_id, game_id): [playtime, 1 if is_win else 0, 0 if is_win else 1, 1, score]}
+        if game_stats_buffered():
+            # Keep the hot Games and team rows out of this transaction; the flusher applies the deltas
+            cursor.execute("SET @skip_game_stats_trigger = 1, @skip_team_stats_trigger = 1")
+            try:
+                generation = game_stats_generation(cursor)
+                teams = player_teams(cursor, [current_user_id])
+                cursor.callproc('sp_RecordMatchResult', [current_user_id, game_id, playtime, is_win, score])
+                awards = award_achievements(cursor, match)
+                connection.commit()
+            finally:
+                cursor.execute("SET @skip_game_stats_trigger = NULL, @skip_team_stats_trigger = NULL")
+            buffer_match_deltas(generation, {game_id: [playtime, 1, score]}, match_team_deltas(match, teams))
+        else:
+            # Call stored procedure to record match (triggers will fire automatically)
+            cursor.callproc('sp_RecordMatchResult', [current_user_id, game_id, playtime, is_win, score])
+            awards = award_achievements(cursor, match)
+            connection.commit()
+        
+        after_matches_recorded(cursor, list(match))
+        
+        return jsonify({
+            'message': 'Match recorded successfully',
+            'achievements_awarded': [achievement_id for _, achievement_id in awards]
+        }), 200
+    
+    except Error as e:
+        connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+def leaderboard_args():
+    metric = request.args.get('metric', 'wins')
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f'metric must be one of {", ".join(LEADERBOARD_METRICS)}')
+    return metric
+
+@app.route('/api/games/<int:game_id>/leaderboard', methods=['GET'])
+@token_required
+def get_leaderboard(current_user_id, game_id):
+    try:
+        metric = leaderboard_args()
+        limit = min(max(int(request.args.get('limit', 25)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        board = leaderboards.get(cursor, game_id, metric)
+        if board is None:
+            return jsonify({'error': 'Game not found'}), 404
+        
+        total, entries = board.page(offset, limit)
+        return jsonify({
+            'game_id': game_id,
+            'metric': metric,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'entries': entries
+        }), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/games/<int:game_id>/leaderboard/me', methods=['GET'])
+@token_required
+def get_my_leaderboard_rank(current_user_id, game_id):
+    try:
+        metric = leaderboard_args()
+        radius = min(max(int(request.args.get('around', 5)), 0), 50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        board = leaderboards.get(cursor, game_id, metric)
+        if board is None:
+            return jsonify({'error': 'Game not found'}), 404
+        
+        total, rank, neighbours = board.around(current_user_id, radius)
+        if rank is None:
+            return jsonify({'error': 'No results recorded for this game'}), 404
+        
+        return jsonify({
+            'game_id': game_id,
+            'metric': metric,
+            'total': total,
+            'rank': rank,
+            'entries': neighbours
+        }), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+def parse_match_row(row):
+    # Returns (player_id, game_id, playtime, is_win, score) or raises ValueError
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    values = []
+    for field in ('player_id', 'game_id', 'playtime', 'is_win', 'score'):
+        if row.get(field) is None:
+            raise ValueError(f'Missing {field}')
+        values.append(row[field])
+    player_id, game_id, playtime, is_win, score = values
+    if not isinstance(player_id, int) or not isinstance(game_id, int) or isinstance(player_id, bool) or isinstance(game_id, bool):
+        raise ValueError('player_id and game_id must be integers')
+    if not isinstance(is_win, bool):
+        raise ValueError('is_win must be a boolean')
+    try:
+        playtime = float(playtime)
+        score = int(score)
+    except (TypeError, ValueError):
+        raise ValueError('playtime and score must be numbers')
+    if playtime < 0 or score < 0:
+        raise ValueError('playtime and score must not be negative')
+    return player_id, game_id, playtime, is_win, score
+
+def read_bulk_rows(key='matches'):
+    # Accepts a JSON array, {key: [...]}, or an NDJSON body
+    rows = []
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get(key)
+    return data if isinstance(data, list) else None
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def update_game_totals(cursor, per_game):
+    # per_game: {game_id: [hours, matches, high_score]}, one UPDATE per chunk of games
+    # Sorted so concurrent flushes lock the Games rows in the same order
+    for chunk in chunked(sorted(per_game.items()), app.config['BULK_INSERT_CHUNK']):
+        derived = ' UNION ALL '.join(['SELECT %s AS game_id, %s AS hours, %s AS matches, %s AS high_score'] * len(chunk))
+        params = []
+        for game_id, (hours, matches, high_score) in chunk:
+            params.extend([game_id, hours, matches, high_score])
+        cursor.execute(f"""
+            UPDATE Games g
+            JOIN ({derived}) d ON g.game_id = d.game_id
+            SET
+                g.total_hours_played = g.total_hours_played + d.hours,
+                g.total_matches_played = g.total_matches_played + d.matches,
+                g.global_high_score = GREATEST(g.global_high_score, d.high_score)
+        """, params)
+
+def update_team_totals(cursor, per_team):
+    # per_team: {(team_id, game_id): [wins, losses, matches, playtime]}; what the
+    # trg_UpdateTeamStats_* triggers do per row, applied once per chunk
+    for chunk in chunked(sorted(per_team.items()), app.config['BULK_INSERT_CHUNK']):
+        derived = ' UNION ALL '.join(['SELECT %s AS team_id, %s AS game_id, %s AS wins, %s AS losses, '
+                                      '%s AS matches, %s AS playtime'] * len(chunk))
+        params = []
+        for (team_id, game_id), (wins, losses, matches, playtime) in chunk:
+            params.extend([team_id, game_id, wins, losses, matches, playtime])
+        cursor.execute(f"""
+            UPDATE Team_Stats s
+            JOIN (
+                SELECT team_id, SUM(wins) AS wins, SUM(losses) AS losses,
+                       SUM(matches) AS matches, SUM(playtime) AS playtime
+                FROM ({derived}) d
+                GROUP BY team_id
+            ) t ON s.team_id = t.team_id
+            SET
+                s.total_wins = s.total_wins + t.wins,
+                s.total_losses = s.total_losses + t.losses,
+                s.total_matches = s.total_matches + t.matches,
+                s.total_playtime = s.total_playtime + t.playtime
+        """, params)
+        # Joining Teams skips teams deleted since the match was recorded
+        cursor.execute(f"""
+            INSERT INTO Team_Game_Stats (team_id, game_id, wins, losses, matches, playtime)
+            SELECT d.team_id, d.game_id, d.wins, d.losses, d.matches, d.playtime
+            FROM ({derived}) d
+            JOIN Teams t ON t.team_id = d.team_id
+            ON DUPLICATE KEY UPDATE
+                wins = Team_Game_Stats.wins + VALUES(wins),
+                losses = Team_Game_Stats.losses + VALUES(losses),
+                matches = Team_Game_Stats.matches + VALUES(matches),
+                playtime = Team_Game_Stats.playtime + VALUES(playtime)
+        """, params)
+
+def player_teams(cursor, player_ids):
+    # {player_id: team_id} for the players on a team. The shared lock holds off
+    # a team move until the match commits, so a buffered team delta always
+    # belongs to the team the player was on when the match was recorded.
+    teams = {}
+    for chunk in chunked(list(player_ids), app.config['BULK_INSERT_CHUNK']):
+        cursor.execute(f"""
+            SELECT player_id, team_id FROM Players
+            WHERE player_id IN ({', '.join(['%s'] * len(chunk))}) AND team_id IS NOT NULL
+            LOCK IN SHARE MODE
+        """, chunk)
+        teams.update((row['player_id'], row['team_id']) for row in cursor.fetchall())
+    return teams
+
+def match_team_deltas(aggregates, teams):
+    # {(team_id, game_id): [wins, losses, matches, playtime]} from match aggregates
+    per_team = {}
+    for (player_id, game_id), (playtime, wins, losses, matches, high_score) in aggregates.items():
+        team_id = teams.get(player_id)
+        if team_id is None:
+            continue
+        totals = per_team.setdefault((team_id, game_id), [0, 0, 0, 0.0])
+        totals[0] += wins
+        totals[1] += losses
+        totals[2] += matches
+        totals[3] += playtime
+    return per_team
+
+def buffer_match_deltas(generation, per_game, per_team):
+    for game_id, (hours, matches, high_score) in per_game.items():
+        game_stats_buffer.add(generation, game_id, hours, matches, high_score)
+    for (team_id, game_id), values in per_team.items():
+        game_stats_buffer.add_team(generation, team_id, game_id, *values)
+
+def apply_match_aggregates(cursor, aggregates):
+    # aggregates: {(player_id, game_id): [playtime, wins, losses, matches, high_score]}
+    # The per-row Games triggers are switched off for this session; totals are
+    # folded into Games once per game below instead. In buffered mode the team
+    # triggers are off too, and the generation with the per-game and per-team
+    # deltas is returned for the caller to hand to the buffer once the
+    # transaction has committed.
+    buffered = game_stats_buffered()
+    cursor.execute("SET @skip_game_stats_trigger = 1, @skip_team_stats_trigger = %s", (1 if buffered else None,))
+    try:
+        generation = game_stats_generation(cursor) if buffered else None
+        teams = player_teams(cursor, {player_id for player_id, _ in aggregates}) if buffered else {}
+        # Sorted so concurrent bulk requests lock the Player_Games rows in the same order
+        for chunk in chunked(sorted(aggregates.items()), app.config['BULK_INSERT_CHUNK']):
+            placeholders = ', '.join(['(%s, %s, %s, NOW(), %s, %s, %s, %s)'] * len(chunk))
+            params = []
+            for (player_id, game_id), (playtime, wins, losses, matches, high_score) in chunk:
+                params.extend([player_id, game_id, playtime, wins, losses, matches, high_score])
+            cursor.execute(f"""
+                INSERT INTO Player_Games (
+                    player_id, game_id, playtime_hours, last_played_date,
+                    wins, losses, matches_played, high_score
+                )
+                VALUES {placeholders}
+                ON DUPLICATE KEY UPDATE
+                    playtime_hours = playtime_hours + VALUES(playtime_hours),
+                    last_played_date = VALUES(last_played_date),
+                    wins = wins + VALUES(wins),
+                    losses = losses + VALUES(losses),
+                    matches_played = matches_played + VALUES(matches_played),
+                    high_score = GREATEST(high_score, VALUES(high_score))
+            """, params)
+
+        per_game = {}
+        for (player_id, game_id), (playtime, wins, losses, matches, high_score) in aggregates.items():
+            totals = per_game.setdefault(game_id, [0.0, 0, 0])
+            totals[0] += playtime
+            totals[1] += matches
+            totals[2] = max(totals[2], high_score)
+        if buffered:
+            # Applied by the flusher after the caller commits
+            return generation, per_game, match_team_deltas(aggregates, teams)
+        update_game_totals(cursor, per_game)
+        return None, {}, {}
+    finally:
+        cursor.execute("SET @skip_game_stats_trigger = NULL, @skip_team_stats_trigger = NULL")
+
+@app.route('/api/games/matches/bulk', methods=['POST'])
+@token_required
+def record_matches_bulk(current_user_id):
+    rows = read_bulk_rows()
+    if rows is None:
+        return jsonify({'error': 'Expected a JSON array of matches or an NDJSON body'}), 400
+    if len(rows) > app.config['BULK_MATCH_MAX_ROWS']:
+        return jsonify({'error': f'At most {app.config["BULK_MATCH_MAX_ROWS"]} matches per request'}), 413
+    
+    results = []
+    parsed = []
+    for index, row in enumerate(rows):
+        try:
+            parsed.append((index, parse_match_row(row)))
+        except ValueError as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Only game servers (admin accounts) may report results for other players
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        
+        known_players = set()
+        known_games = set()
+        if parsed:
+            player_ids = list({values[0] for _, values in parsed})
+            game_ids = list({values[1] for _, values in parsed})
+            for chunk in chunked(player_ids, app.config['BULK_INSERT_CHUNK']):
+                cursor.execute(f"SELECT player_id FROM Players WHERE player_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+                known_players.update(r['player_id'] for r in cursor.fetchall())
+            for chunk in chunked(game_ids, app.config['BULK_INSERT_CHUNK']):
+                cursor.execute(f"SELECT game_id FROM Games WHERE game_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+                known_games.update(r['game_id'] for r in cursor.fetchall())
+        
+        # Pre-aggregate per (player_id, game_id) so each pair is written once
+        aggregates = {}
+        history = []
+        for index, (player_id, game_id, playtime, is_win, score) in parsed:
+            if player_id not in known_players:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Player not found'})
+                continue
+            if game_id not in known_games:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Game not found'})
+                continue
+            agg = aggregates.setdefault((player_id, game_id), [0.0, 0, 0, 0, 0])
+            agg[0] += playtime
+            agg[1] += 1 if is_win else 0
+            agg[2] += 0 if is_win else 1
+            agg[3] += 1
+            agg[4] = max(agg[4], score)
+            history.append((player_id, game_id, playtime, is_win, score))
+            results.append({'index': index, 'status': 'accepted'})
+        
+        awards = []
+        if aggregates:
+            generation, per_game, per_team = apply_match_aggregates(cursor, aggregates)
+            record_match_history(cursor, history)
+            awards = award_achievements(cursor, aggregates)
+            connection.commit()
+            buffer_match_deltas(generation, per_game, per_team)
+            after_matches_recorded(cursor, list(aggregates))
+        
+        results.sort(key=lambda r: r['index'])
+        accepted = sum(1 for r in results if r['status'] == 'accepted')
+        return jsonify({
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'achievements_awarded': len(awards),
+            'results': results
+        }), 200 if accepted or not results else 400
+    
+    except Error as e:
+        connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+# ==================== CHARACTERS ENDPOINTS ====================
+
+CHARACTERS_PAGE_SQL = """
+    SELECT character_id, character_name, level, creation_date
+    FROM Characters
+    WHERE player_id = %s
+    {keyset}
+    ORDER BY level DESC, character_id DESC
+    {limit}
+"""
+CHARACTERS_FIRST_PAGE_SQL = CHARACTERS_PAGE_SQL.format(keyset='', limit='LIMIT %s')
+
+def fetch_characters(cursor, player_id, limit=None, after=None):
+    # Keyset on (level, character_id), served by idx_characters_player_level
+    params = [player_id]
+    keyset = ''
+    if after is not None:
+        keyset = 'AND (level < %s OR (level = %s AND character_id < %s))'
+        params.extend([after[0], after[0], after[1]])
+    if limit is not None:
+        params.append(limit)
+    sql = CHARACTERS_PAGE_SQL.format(keyset=keyset, limit='LIMIT %s' if limit is not None else '')
+    return fetch_prepared(cursor, sql, params)
+
+@app.route('/api/characters', methods=['GET'])
+@token_required
+def get_characters(current_user_id):
+    try:
+        limit, after = page_args(2)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        rows = fetch_characters(cursor, current_user_id, limit + 1, after)
+        return paged_response(rows, limit, lambda r: [r['level'], r['character_id']]), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/characters', methods=['POST'])
+@token_required
+def create_character(current_user_id):
+    data = request.get_json()
+    character_name = data.get('character_name')
+    level = data.get('level', 1)
+    
+    if not character_name:
+        return jsonify({'error': 'Character name is required'}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        cursor.execute("""
+            INSERT INTO Characters (player_id, character_name, level)
+            VALUES (%s, %s, %s)
+        """, (current_user_id, character_name, level))
+        connection.commit()
+        
+        character_id = cursor.lastrowid
+        
+        return jsonify({
+            'message': 'Character created successfully',
+            'character_id': character_id,
+            'character_name': character_name,
+            'level': level
+        }), 201
+    
+    except Error as e:
+        connection.rollback()
+        if 'Duplicate entry' in str(e):
+            return jsonify({'error': 'Character name already exists for this player'}), 409
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
 
-@app.route('/api/auth/signup', methods=['POST'])
-def signup():
+@app.route('/api/characters/<int:character_id>', methods=['PUT'])
+@token_required
+def update_character(current_user_id, character_id):
     data = request.get_json()
-    username = data.get('username')
-    email = data.get('email')
-    password = data.get('password')
-    
-    if not username or not email or not password:
-        return jsonify({'error': 'Missing required fields'}), 400
+    character_name = data.get('character_name')
+    level = data.get('level')
     
     connection = get_db_connection()
     if not connection:
@@ -74,27 +2818,60 @@ def signup():
     try:
         cursor = connection.cursor(dictionary=True)
         
-        # Check if username or email already exists
-        cursor.execute("SELECT * FROM Players WHERE username = %s OR email = %s", (username, email))
-        if cursor.fetchone():
-            return jsonify({'error': 'Username or email already exists'}), 409
+        # Verify character belongs to player
+        cursor.execute("SELECT * FROM Characters WHERE character_id = %s AND player_id = %s", 
+                      (character_id, current_user_id))
+        if not cursor.fetchone():
+            return jsonify({'error': 'Character not found'}), 404
         
-        # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        # Build update query dynamically
+        updates = []
+        params = []
+        if character_name:
+            updates.append("character_name = %s")
+            params.append(character_name)
+        if level is not None:
+            updates.append("level = %s")
+            params.append(level)
         
-        # Insert new player
-        cursor.execute(
-            "INSERT INTO Players (username, email, password_hash, account_status) VALUES (%s, %s, %s, 'active')",
-            (username, email, password_hash)
-        )
+        if not updates:
+            return jsonify({'error': 'No fields to update'}), 400
+        
+        params.extend([character_id, current_user_id])
+        query = f"UPDATE Characters SET {', '.join(updates)} WHERE character_id = %s AND player_id = %s"
+        
+        cursor.execute(query, params)
         connection.commit()
         
-        # Assign default role (Player)
-        player_id = cursor.lastrowid
-        cursor.execute("INSERT INTO Player_Roles (player_id, role_id) VALUES (%s, 3)", (player_id,))
+        return jsonify({'message': 'Character updated successfully'}), 200
+    
+    except Error as e:
+        connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/characters/<int:character_id>', methods=['DELETE'])
+@token_required
+def delete_character(current_user_id, character_id):
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Verify character belongs to player
+        cursor.execute("SELECT * FROM Characters WHERE character_id = %s AND player_id = %s", 
+                      (character_id, current_user_id))
+        if not cursor.fetchone():
+            return jsonify({'error': 'Character not found'}), 404
+        
+        cursor.execute("DELETE FROM Characters WHERE character_id = %s", (character_id,))
         connection.commit()
         
-        return jsonify({'message': 'Account created successfully', 'player_id': player_id}), 201
+        return jsonify({'message': 'Character deleted successfully'}), 200
     
     except Error as e:
         connection.rollback()
@@ -103,68 +2880,254 @@ def signup():
         cursor.close()
         connection.close()
 
-@app.route('/api/auth/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
+# ==================== FRIENDS ENDPOINTS ====================
+
+# Per-player adjacency lists, keyed by (player_id, status); 0 disables the cache
+friends_cache = TTLCache(app.config['FRIENDS_CACHE_TTL'], max_entries=app.config['FRIENDS_CACHE_MAX_ENTRIES'])
+
+# One branch per side of the pair so each can use its own index:
+# the primary key for player_one_id, idx_friends_player_two for player_two_id
+FRIEND_EDGES_SQL = """
+    SELECT p.player_id, p.username, p.email, f.status
+    FROM Friends f
+    JOIN Players p ON p.player_id = f.player_two_id
+    WHERE f.player_one_id = %s AND f.status = %s
+    UNION ALL
+    SELECT p.player_id, p.username, p.email, f.status
+    FROM Friends f
+    JOIN Players p ON p.player_id = f.player_one_id
+    WHERE f.player_two_id = %s AND f.status = %s
+    ORDER BY player_id
+"""
+
+# Paged variant: each side is read in index order past the cursor and cut at the limit
+FRIEND_EDGES_PAGE_SQL = """
+    SELECT player_id, username, email, status FROM (
+        (SELECT p.player_id, p.username, p.email, f.status
+         FROM Friends f
+         JOIN Players p ON p.player_id = f.player_two_id
+         WHERE f.player_one_id = %s AND f.status = %s AND f.player_two_id > %s
+         ORDER BY f.player_two_id
+         LIMIT %s)
+        UNION ALL
+        (SELECT p.player_id, p.username, p.email, f.status
+         FROM Friends f
+         JOIN Players p ON p.player_id = f.player_one_id
+         WHERE f.player_two_id = %s AND f.status = %s AND f.player_one_id > %s
+         ORDER BY f.player_one_id
+         LIMIT %s)
+    ) edges
+    ORDER BY player_id
+    LIMIT %s
+"""
+
+def fetch_friend_edges(cursor, player_id, status, limit=None, after=None):
+    if limit is None:
+        return fetch_prepared(cursor, FRIEND_EDGES_SQL, (player_id, status, player_id, status))
+    after_id = after[0] if after is not None else 0
+    return fetch_prepared(cursor, FRIEND_EDGES_PAGE_SQL, (player_id, status, after_id, limit,
+                                                          player_id, status, after_id, limit, limit))
+
+def cached_friend_edges(cursor, player_id, status, limit=None, after=None):
+    if app.config['FRIENDS_CACHE_TTL'] <= 0:
+        return fetch_friend_edges(cursor, player_id, status, limit, after)
+    edges = friends_cache.get((player_id, status))
+    if edges is None:
+        epoch = friends_cache.epoch()
+        edges = on_primary(cursor, fetch_friend_edges, player_id, status)
+        friends_cache.set((player_id, status), edges, epoch=epoch)
+    if limit is None:
+        return edges
+    # Cached lists are ordered by player_id, so a page is a slice past the cursor
+    start = bisect.bisect_right([e['player_id'] for e in edges], after[0]) if after is not None else 0
+    return edges[start:start + limit]
+
+def invalidate_friends(*player_ids):
+    # Both sides of a friendship changed; like the writer, the other player's
+    # uncached reads stay on the primary for the read-your-writes window. Only
+    # the writer gets an X-Last-Write header, so for the other player that
+    # holds on this process alone
+    for player_id in player_ids:
+        recent_writers.mark(player_id)
+        for status in ('pending', 'accepted'):
+            friends_cache.invalidate((player_id, status))
+
+@app.route('/api/friends', methods=['GET'])
+@token_required
+def get_friends(current_user_id):
+    try:
+        limit, after = page_args(1)
+        if after is not None and not isinstance(after[0], int):
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if not username or not password:
-        return jsonify({'error': 'Missing credentials'}), 400
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        rows = cached_friend_edges(cursor, current_user_id, 'accepted', limit + 1, after)
+        return paged_response(rows, limit, lambda r: [r['player_id']]), 200
     
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+def fetch_friend_requests(cursor, player_id):
+    return cached_friend_edges(cursor, player_id, 'pending')
+
+@app.route('/api/friends/requests', methods=['GET'])
+@token_required
+def get_friend_requests(current_user_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
+        return jsonify(fetch_friend_requests(cursor, current_user_id)), 200
+
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Each tier excludes the better ones so a player is only matched once;
+# 0 = exact, 1 = prefix (username/email indexes), 2 = infix (ngram FULLTEXT)
+SEARCH_TIERS = (
+    "(username = %(term)s OR email = %(term)s)",
+    "(username LIKE %(prefix)s OR email LIKE %(prefix)s) AND username <> %(term)s AND email <> %(term)s",
+    "MATCH(username, email) AGAINST (%(phrase)s IN BOOLEAN MODE) "
+    "AND username NOT LIKE %(prefix)s AND email NOT LIKE %(prefix)s"
+)
+
+@app.route('/api/friends/search', methods=['GET'])
+@token_required
+def search_players(current_user_id):
+    search_term = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 50)
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        if after is not None and (len(after) != 2 or not isinstance(after[0], int)):
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Short terms would match most of the table
+    if len(search_term) < app.config['SEARCH_MIN_LENGTH']:
+        return jsonify([]), 200
+    
+    params = {
+        'term': search_term,
+        'prefix': escape_like(search_term) + '%',
+        'phrase': '"' + search_term.replace('"', '') + '"',
+        'me': current_user_id,
+        'limit': limit + 1
+    }
+    branches = []
+    for tier, condition in enumerate(SEARCH_TIERS):
+        # Keyset on (match_rank, username), pushed into each tier
+        if after is not None and tier < after[0]:
+            continue
+        keyset = ''
+        if after is not None and tier == after[0]:
+            keyset = 'AND username > %(after_username)s'
+            params['after_username'] = after[1]
+        branches.append(f"""
+            (SELECT player_id, username, email, {tier} AS match_rank
+             FROM Players
+             WHERE {condition}
+             AND player_id != %(me)s
+             AND account_status = 'active'
+             {keyset}
+             ORDER BY username
+             LIMIT %(limit)s)
+        """)
+    if not branches:
+        return jsonify([]), 200
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT player_id, username, email, match_rank
+            FROM ({' UNION ALL '.join(branches)}) matches
+            ORDER BY match_rank, username
+            LIMIT %(limit)s
+        """, params)
+        players = cursor.fetchall()
         
-        # Get player
-        cursor.execute("SELECT * FROM Players WHERE username = %s", (username,))
-        player = cursor.fetchone()
-        
-        if not player:
-            return jsonify({'error': 'Invalid credentials'}), 401
-        
-        # Check if account is active
-        if player['account_status'] != 'active':
-            return jsonify({'error': f'Account is {player["account_status"]}'}), 403
+        response = jsonify(players[:limit])
+        if len(players) > limit:
+            last = players[limit - 1]
+            response.headers['X-Next-Cursor'] = encode_cursor([last['match_rank'], last['username']])
+        return response, 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/api/friends/request', methods=['POST'])
+@token_required
+def send_friend_request(current_user_id):
+    data = request.get_json()
+    friend_id = data.get('friend_id')
+    
+    if not friend_id:
+        return jsonify({'error': 'Friend ID is required'}), 400
+    
+    if friend_id == current_user_id:
+        return jsonify({'error': 'Cannot send friend request to yourself'}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
         
-        # Verify password
-        if not bcrypt.checkpw(password.encode('utf-8'), player['password_hash'].encode('utf-8')):
-            return jsonify({'error': 'Invalid credentials'}), 401
+        # Check if friend exists
+        cursor.execute("SELECT * FROM Players WHERE player_id = %s", (friend_id,))
+        if not cursor.fetchone():
+            return jsonify({'error': 'Player not found'}), 404
         
-        # Update last login
-        cursor.execute("UPDATE Players SET last_login = NOW() WHERE player_id = %s", (player['player_id'],))
+        # Insert friendship (trigger will handle ordering)
+        cursor.execute("""
+            INSERT INTO Friends (player_one_id, player_two_id, status)
+            VALUES (%s, %s, 'pending')
+        """, (current_user_id, friend_id))
         connection.commit()
+        invalidate_friends(current_user_id, friend_id)
         
-        # Generate JWT token
-        token = jwt.encode({
-            'player_id': player['player_id'],
-            'username': player['username'],
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
-        
-        return jsonify({
-            'token': token,
-            'player': {
-                'player_id': player['player_id'],
-                'username': player['username'],
-                'email': player['email']
-            }
-        }), 200
+        return jsonify({'message': 'Friend request sent successfully'}), 201
     
     except Error as e:
+        connection.rollback()
+        if 'Duplicate entry' in str(e):
+            return jsonify({'error': 'Friend request already exists'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-# ==================== PLAYER PROFILE ENDPOINTS ====================
-
-@app.route('/api/player/profile', methods=['GET'])
+@app.route('/api/friends/accept/<int:friend_id>', methods=['PUT'])
 @token_required
-def get_player_profile(current_user_id):
+def accept_friend_request(current_user_id, friend_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -172,32 +3135,33 @@ def get_player_profile(current_user_id):
     try:
         cursor = connection.cursor(dictionary=True)
         
-        # Call stored procedure to get complete profile
-        cursor.callproc('sp_GetPlayerProfile', [cursor.execute("SELECT username FROM Players WHERE player_id = %s", (current_user_id,)).fetchone()['username']])
+        # Update friendship status
+        cursor.execute("""
+            UPDATE Friends
+            SET status = 'accepted'
+            WHERE ((player_one_id = %s AND player_two_id = %s) 
+                OR (player_one_id = %s AND player_two_id = %s))
+            AND status = 'pending'
+        """, (friend_id, current_user_id, current_user_id, friend_id))
         
-        # Get all result sets
-        results = []
-        for result in cursor.stored_results():
-            results.append(result.fetchall())
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Friend request not found'}), 404
         
-        profile_data = {
-            'player_info': results[0][0] if results[0] else {},
-            'characters': results[1] if len(results) > 1 else [],
-            'games': results[2] if len(results) > 2 else [],
-            'friends': results[3] if len(results) > 3 else []
-        }
+        connection.commit()
+        invalidate_friends(current_user_id, friend_id)
         
-        return jsonify(profile_data), 200
+        return jsonify({'message': 'Friend request accepted'}), 200
     
     except Error as e:
+        connection.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-@app.route('/api/player/stats', methods=['GET'])
+@app.route('/api/friends/<int:friend_id>', methods=['DELETE'])
 @token_required
-def get_player_stats(current_user_id):
+def remove_friend(current_user_id, friend_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -205,54 +3169,105 @@ def get_player_stats(current_user_id):
     try:
         cursor = connection.cursor(dictionary=True)
         
-        # Get total playtime using function
-        cursor.execute("SELECT fn_GetPlayerTotalPlaytime(%s) as total_playtime", (current_user_id,))
-        total_playtime = cursor.fetchone()['total_playtime']
-        
-        # Get wins, losses, and calculate win rate
         cursor.execute("""
-            SELECT 
-                SUM(wins) as total_wins,
-                SUM(losses) as total_losses,
-                SUM(matches_played) as total_matches
-            FROM Player_Games
-            WHERE player_id = %s
-        """, (current_user_id,))
-        stats = cursor.fetchone()
+            DELETE FROM Friends
+            WHERE (player_one_id = %s AND player_two_id = %s)
+            OR (player_one_id = %s AND player_two_id = %s)
+        """, (current_user_id, friend_id, friend_id, current_user_id))
+        
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Friendship not found'}), 404
         
-        total_wins = stats['total_wins'] or 0
-        total_losses = stats['total_losses'] or 0
-        total_matches = stats['total_matches'] or 0
-        win_rate = (total_wins / total_matches * 100) if total_matches > 0 else 0
+        connection.commit()
+        invalidate_friends(current_user_id, friend_id)
         
-        return jsonify({
-            'total_playtime': float(total_playtime),
-            'total_wins': total_wins,
-            'total_losses': total_losses,
-            'total_matches': total_matches,
-            'win_rate': round(win_rate, 2)
-        }), 200
+        return jsonify({'message': 'Friend removed successfully'}), 200
     
     except Error as e:
+        connection.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-# ==================== GAMES ENDPOINTS ====================
+# ==================== ACHIEVEMENTS ENDPOINTS ====================
 
-@app.route('/api/games', methods=['GET'])
+PLAYER_ACHIEVEMENTS_SQL = """
+    SELECT 
+        a.achievement_id,
+        a.name,
+        a.description,
+        a.points_value,
+        g.title as game_title,
+        pa.date_earned
+    FROM Player_Achievements pa
+    JOIN Achievements a ON pa.achievement_id = a.achievement_id
+    JOIN Games g ON a.game_id = g.game_id
+    WHERE pa.player_id = %s
+    {keyset}
+    ORDER BY pa.date_earned DESC, pa.achievement_id DESC
+    {limit}
+"""
+
+@app.route('/api/achievements/player', methods=['GET'])
+@token_required
+def get_player_achievements(current_user_id):
+    stream_format = requested_stream_format()
+    if stream_format:
+        # Full history as a stream instead of pages
+        return stream_query(PLAYER_ACHIEVEMENTS_SQL.format(keyset='', limit=''), (current_user_id,), stream_format)
+    
+    try:
+        limit, after = page_args(2)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Keyset on (date_earned, achievement_id), served by idx_player_achievements_earned
+    params = [current_user_id]
+    keyset = ''
+    if after is not None:
+        keyset = 'AND (pa.date_earned < %s OR (pa.date_earned = %s AND pa.achievement_id < %s))'
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit + 1)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        achievements = fetch_prepared(cursor, PLAYER_ACHIEVEMENTS_SQL.format(keyset=keyset, limit='LIMIT %s'), params)
+        return paged_response(achievements, limit, lambda r: [r['date_earned'], r['achievement_id']]), 200
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+GAME_ACHIEVEMENTS_SQL = """
+    SELECT 
+        a.achievement_id,
+        a.name,
+        a.description,
+        a.points_value,
+        CASE WHEN pa.player_id IS NOT NULL THEN TRUE ELSE FALSE END as earned
+    FROM Achievements a
+    LEFT JOIN Player_Achievements pa ON a.achievement_id = pa.achievement_id AND pa.player_id = %s
+    WHERE a.game_id = %s
+"""
+
+@app.route('/api/achievements/game/<int:game_id>', methods=['GET'])
 @token_required
-def get_all_games(current_user_id):
+def get_game_achievements(current_user_id, game_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM Games WHERE is_active = TRUE ORDER BY title")
-        games = cursor.fetchall()
-        return jsonify(games), 200
+        achievements = fetch_prepared(cursor, GAME_ACHIEVEMENTS_SQL, (current_user_id, game_id))
+        return jsonify(achievements), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -260,34 +3275,67 @@ def get_all_games(current_user_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/games/player', methods=['GET'])
+# ==================== INVENTORY ENDPOINTS ====================
+
+ITEM_TYPES = ('Weapon', 'Armor', 'Cosmetic', 'Consumable')
+ITEM_RARITIES = ('Common', 'Uncommon', 'Rare', 'Epic', 'Legendary')
+
+INVENTORY_PAGE_SQL = """
+    SELECT pi.item_id, i.name, i.description, pi.item_type, pi.rarity, pi.game_id,
+           pi.quantity, pi.acquired_date
+    FROM Player_Inventories pi
+    JOIN Items i ON i.item_id = pi.item_id
+    WHERE pi.player_id = %s
+    {filters}
+    ORDER BY pi.item_id
+    LIMIT %s
+"""
+
+@app.route('/api/inventory', methods=['GET'])
 @token_required
-def get_player_games(current_user_id):
+def get_inventory(current_user_id):
+    # item_type, rarity and game_id live on the inventory row with a
+    # (player_id, column, item_id) index each, so filtered pages are read in
+    # index order rather than scanned and sorted
+    filters = []
+    params = [current_user_id]
+    try:
+        limit, after = page_args(1)
+        item_type = request.args.get('item_type')
+        if item_type:
+            if item_type not in ITEM_TYPES:
+                raise ValueError(f'item_type must be one of {", ".join(ITEM_TYPES)}')
+            filters.append('AND pi.item_type = %s')
+            params.append(item_type)
+        rarity = request.args.get('rarity')
+        if rarity:
+            if rarity not in ITEM_RARITIES:
+                raise ValueError(f'rarity must be one of {", ".join(ITEM_RARITIES)}')
+            filters.append('AND pi.rarity = %s')
+            params.append(rarity)
+        game_id = request.args.get('game_id')
+        if game_id:
+            if not game_id.isdigit():
+                raise ValueError('game_id must be an integer')
+            filters.append('AND pi.game_id = %s')
+            params.append(int(game_id))
+        if after is not None:
+            if not isinstance(after[0], int):
+                raise ValueError('Invalid cursor')
+            filters.append('AND pi.item_id > %s')
+            params.append(after[0])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    params.append(limit + 1)
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                g.game_id,
-                g.title,
-                g.genre,
-                pg.playtime_hours,
-                pg.player_rank,
-                pg.wins,
-                pg.losses,
-                pg.matches_played,
-                pg.high_score,
-                pg.last_played_date
-            FROM Player_Games pg
-            JOIN Games g ON pg.game_id = g.game_id
-            WHERE pg.player_id = %s
-            ORDER BY pg.playtime_hours DESC
-        """, (current_user_id,))
-        games = cursor.fetchall()
-        return jsonify(games), 200
+        rows = fetch_prepared(cursor, INVENTORY_PAGE_SQL.format(filters=' '.join(filters)), params)
+        return paged_response(rows, limit, lambda r: [r['item_id']]), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -295,9 +3343,73 @@ def get_player_games(current_user_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/games/<int:game_id>/winrate', methods=['GET'])
+def parse_inventory_row(row):
+    # Returns (player_id, item_id, quantity) or raises ValueError; a negative
+    # quantity consumes items
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    values = []
+    for field in ('player_id', 'item_id', 'quantity'):
+        value = row.get(field)
+        if value is None:
+            raise ValueError(f'Missing {field}')
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f'{field} must be an integer')
+        values.append(value)
+    if values[2] == 0:
+        raise ValueError('quantity must not be zero')
+    return tuple(values)
+
+def apply_inventory_deltas(cursor, deltas):
+    # deltas: {(player_id, item_id): net quantity}. Grants are one multi-row
+    # upsert per chunk against unique_item_per_player; consumes subtract through
+    # a derived table and drop rows that reach zero. The caller has already
+    # locked the consumed rows and checked there is enough to take.
+    grants = sorted((key, quantity) for key, quantity in deltas.items() if quantity > 0)
+    consumes = sorted((key, -quantity) for key, quantity in deltas.items() if quantity < 0)
+    for chunk in chunked(grants, app.config['BULK_INSERT_CHUNK']):
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(chunk))
+        params = []
+        for (player_id, item_id), quantity in chunk:
+            params.extend([player_id, item_id, quantity])
+        cursor.execute(f"""
+            INSERT INTO Player_Inventories (player_id, item_id, quantity)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """, params)
+    for chunk in chunked(consumes, app.config['BULK_INSERT_CHUNK']):
+        derived = ' UNION ALL '.join(['SELECT %s AS player_id, %s AS item_id, %s AS quantity'] * len(chunk))
+        params = []
+        for (player_id, item_id), quantity in chunk:
+            params.extend([player_id, item_id, quantity])
+        cursor.execute(f"""
+            UPDATE Player_Inventories pi
+            JOIN ({derived}) d ON pi.player_id = d.player_id AND pi.item_id = d.item_id
+            SET pi.quantity = pi.quantity - d.quantity
+        """, params)
+        pairs = ', '.join(['(%s, %s)'] * len(chunk))
+        cursor.execute(f"""
+            DELETE FROM Player_Inventories
+            WHERE quantity = 0 AND (player_id, item_id) IN ({pairs})
+        """, [value for key, _ in chunk for value in key])
+
+@app.route('/api/inventory/bulk', methods=['POST'])
 @token_required
-def get_game_winrate(current_user_id, game_id):
+def apply_inventory_bulk(current_user_id):
+    rows = read_bulk_rows('changes')
+    if rows is None:
+        return jsonify({'error': 'Expected a JSON array of inventory changes or an NDJSON body'}), 400
+    if len(rows) > app.config['INVENTORY_BULK_MAX_ROWS']:
+        return jsonify({'error': f'At most {app.config["INVENTORY_BULK_MAX_ROWS"]} changes per request'}), 413
+    
+    results = []
+    parsed = []
+    for index, row in enumerate(rows):
+        try:
+            parsed.append((index, parse_inventory_row(row)))
+        except ValueError as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -305,69 +3417,170 @@ def get_game_winrate(current_user_id, game_id):
     try:
         cursor = connection.cursor(dictionary=True)
         
-        # Use function to get win rate
-        cursor.execute("SELECT fn_GetPlayerWinRate(%s, %s) as win_rate", (current_user_id, game_id))
-        result = cursor.fetchone()
+        # Loot is granted by game servers (admin accounts), never by players themselves
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
         
-        return jsonify({'win_rate': float(result['win_rate'])}), 200
+        known_players = set()
+        known_items = set()
+        if parsed:
+            player_ids = list({values[0] for _, values in parsed})
+            item_ids = list({values[1] for _, values in parsed})
+            for chunk in chunked(player_ids, app.config['BULK_INSERT_CHUNK']):
+                cursor.execute(f"SELECT player_id FROM Players WHERE player_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+                known_players.update(r['player_id'] for r in cursor.fetchall())
+            for chunk in chunked(item_ids, app.config['BULK_INSERT_CHUNK']):
+                cursor.execute(f"SELECT item_id FROM Items WHERE item_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+                known_items.update(r['item_id'] for r in cursor.fetchall())
+        
+        # Net the changes per (player_id, item_id) so each row is written once
+        deltas = {}
+        members = {}
+        for index, (player_id, item_id, quantity) in parsed:
+            if player_id not in known_players:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Player not found'})
+                continue
+            if item_id not in known_items:
+                results.append({'index': index, 'status': 'rejected', 'error': 'Item not found'})
+                continue
+            key = (player_id, item_id)
+            deltas[key] = deltas.get(key, 0) + quantity
+            members.setdefault(key, []).append(index)
+        
+        # Lock the rows being consumed so the quantity check holds until commit
+        consumed = sorted(key for key, quantity in deltas.items() if quantity < 0)
+        held = {}
+        for chunk in chunked(consumed, app.config['BULK_INSERT_CHUNK']):
+            pairs = ', '.join(['(%s, %s)'] * len(chunk))
+            cursor.execute(f"""
+                SELECT player_id, item_id, quantity
+                FROM Player_Inventories
+                WHERE (player_id, item_id) IN ({pairs})
+                FOR UPDATE
+            """, [value for key in chunk for value in key])
+            held.update(((r['player_id'], r['item_id']), r['quantity']) for r in cursor.fetchall())
+        for key in consumed:
+            if held.get(key, 0) < -deltas[key]:
+                del deltas[key]
+                for index in members.pop(key):
+                    results.append({'index': index, 'status': 'rejected', 'error': 'Insufficient quantity'})
+        for indexes in members.values():
+            results.extend({'index': index, 'status': 'accepted'} for index in indexes)
+        
+        if deltas:
+            apply_inventory_deltas(cursor, deltas)
+        connection.commit()
+        
+        results.sort(key=lambda r: r['index'])
+        accepted = sum(1 for r in results if r['status'] == 'accepted')
+        return jsonify({
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results
+        }), 200 if accepted or not results else 400
     
     except Error as e:
+        connection.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-@app.route('/api/games/match', methods=['POST'])
+# ==================== TEAMS ENDPOINTS ====================
+
+# Team totals come from Team_Stats / Team_Game_Stats, which the database keeps
+# current as members record matches and join or leave (in buffered
+# GAME_STATS_MODE, match totals land with the next game stats flush)
+TEAM_SQL = """
+    SELECT t.team_id, t.team_name, t.creation_date,
+           COALESCE(s.member_count, 0) AS member_count,
+           COALESCE(s.total_wins, 0) AS total_wins,
+           COALESCE(s.total_losses, 0) AS total_losses,
+           COALESCE(s.total_matches, 0) AS total_matches,
+           COALESCE(s.total_playtime, 0) AS total_playtime
+    FROM Teams t
+    LEFT JOIN Team_Stats s ON s.team_id = t.team_id
+    WHERE t.team_id = %s
+"""
+
+# team_rank counts teams with more wins in the same game from idx_team_game_wins
+TEAM_GAMES_SQL = """
+    SELECT tgs.game_id, g.title, tgs.wins, tgs.losses, tgs.matches, tgs.playtime,
+           (SELECT COUNT(*) FROM Team_Game_Stats o
+            WHERE o.game_id = tgs.game_id AND o.wins > tgs.wins) + 1 AS team_rank
+    FROM Team_Game_Stats tgs
+    JOIN Games g ON g.game_id = tgs.game_id
+    WHERE tgs.team_id = %s AND tgs.matches > 0
+    ORDER BY tgs.wins DESC, tgs.game_id
+"""
+
+TEAM_MEMBERS_SQL = """
+    SELECT p.player_id, p.username,
+           COALESCE(s.total_wins, 0) AS total_wins,
+           COALESCE(s.total_matches, 0) AS total_matches,
+           COALESCE(s.total_playtime, 0) AS total_playtime
+    FROM Players p
+    LEFT JOIN Player_Stats_Summary s ON s.player_id = p.player_id
+    WHERE p.team_id = %s
+    {keyset}
+    ORDER BY p.player_id
+    LIMIT %s
+"""
+
+@app.route('/api/teams', methods=['POST'])
 @token_required
-def record_match(current_user_id):
-    data = request.get_json()
-    game_id = data.get('game_id')
-    playtime = data.get('playtime')
-    is_win = data.get('is_win')
-    score = data.get('score')
+def create_team(current_user_id):
+    data = request.get_json() or {}
+    team_name = (data.get('team_name') or '').strip()
     
-    if not all([game_id, playtime is not None, is_win is not None, score is not None]):
-        return jsonify({'error': 'Missing required fields'}), 400
+    if not team_name:
+        return jsonify({'error': 'Team name is required'}), 400
     
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        cursor = connection.cursor()
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT team_id FROM Players WHERE player_id = %s FOR UPDATE", (current_user_id,))
+        player = cursor.fetchone()
+        if player is None:
+            return jsonify({'error': 'Player not found'}), 404
+        if player['team_id'] is not None:
+            return jsonify({'error': 'Leave your current team first'}), 409
         
-        # Call stored procedure to record match (triggers will fire automatically)
-        cursor.callproc('sp_RecordMatchResult', [current_user_id, game_id, playtime, is_win, score])
+        cursor.execute("INSERT INTO Teams (team_name) VALUES (%s)", (team_name,))
+        team_id = cursor.lastrowid
+        cursor.execute("INSERT INTO Team_Stats (team_id) VALUES (%s)", (team_id,))
+        # The creator is the first member; the Players trigger brings their totals along
+        cursor.execute("UPDATE Players SET team_id = %s WHERE player_id = %s", (team_id, current_user_id))
         connection.commit()
         
-        return jsonify({'message': 'Match recorded successfully'}), 200
+        return jsonify({'message': 'Team created successfully', 'team_id': team_id, 'team_name': team_name}), 201
     
     except Error as e:
         connection.rollback()
+        if 'Duplicate entry' in str(e):
+            return jsonify({'error': 'Team name already taken'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-# ==================== CHARACTERS ENDPOINTS ====================
-
-@app.route('/api/characters', methods=['GET'])
+@app.route('/api/teams/<int:team_id>', methods=['GET'])
 @token_required
-def get_characters(current_user_id):
+def get_team(current_user_id, team_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT character_id, character_name, level, creation_date
-            FROM Characters
-            WHERE player_id = %s
-            ORDER BY level DESC
-        """, (current_user_id,))
-        characters = cursor.fetchall()
-        return jsonify(characters), 200
+        team = fetch_prepared(cursor, TEAM_SQL, (team_id,), one=True)
+        if team is None:
+            return jsonify({'error': 'Team not found'}), 404
+        team['games'] = fetch_prepared(cursor, TEAM_GAMES_SQL, (team_id,))
+        return jsonify(team), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -375,15 +3588,23 @@ def get_characters(current_user_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/characters', methods=['POST'])
+@app.route('/api/teams/<int:team_id>/members', methods=['GET'])
 @token_required
-def create_character(current_user_id):
-    data = request.get_json()
-    character_name = data.get('character_name')
-    level = data.get('level', 1)
+def get_team_members(current_user_id, team_id):
+    try:
+        limit, after = page_args(1)
+        if after is not None and not isinstance(after[0], int):
+            raise ValueError('Invalid cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if not character_name:
-        return jsonify({'error': 'Character name is required'}), 400
+    # Keyset on player_id, served by idx_players_team
+    params = [team_id]
+    keyset = ''
+    if after is not None:
+        keyset = 'AND p.player_id > %s'
+        params.append(after[0])
+    params.append(limit + 1)
     
     connection = get_db_connection()
     if not connection:
@@ -391,71 +3612,42 @@ def create_character(current_user_id):
     
     try:
         cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
-            INSERT INTO Characters (player_id, character_name, level)
-            VALUES (%s, %s, %s)
-        """, (current_user_id, character_name, level))
-        connection.commit()
-        
-        character_id = cursor.lastrowid
-        
-        return jsonify({
-            'message': 'Character created successfully',
-            'character_id': character_id,
-            'character_name': character_name,
-            'level': level
-        }), 201
+        members = fetch_prepared(cursor, TEAM_MEMBERS_SQL.format(keyset=keyset), params)
+        return paged_response(members, limit, lambda r: [r['player_id']]), 200
     
     except Error as e:
-        connection.rollback()
-        if 'Duplicate entry' in str(e):
-            return jsonify({'error': 'Character name already exists for this player'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-@app.route('/api/characters/<int:character_id>', methods=['PUT'])
+@app.route('/api/teams/<int:team_id>/join', methods=['POST'])
 @token_required
-def update_character(current_user_id, character_id):
-    data = request.get_json()
-    character_name = data.get('character_name')
-    level = data.get('level')
-    
+def join_team(current_user_id, team_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT 1 FROM Teams WHERE team_id = %s", (team_id,))
+        if cursor.fetchone() is None:
+            return jsonify({'error': 'Team not found'}), 404
         
-        # Verify character belongs to player
-        cursor.execute("SELECT * FROM Characters WHERE character_id = %s AND player_id = %s", 
-                      (character_id, current_user_id))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Character not found'}), 404
-        
-        # Build update query dynamically
-        updates = []
-        params = []
-        if character_name:
-            updates.append("character_name = %s")
-            params.append(character_name)
-        if level is not None:
-            updates.append("level = %s")
-            params.append(level)
-        
-        if not updates:
-            return jsonify({'error': 'No fields to update'}), 400
-        
-        params.extend([character_id, current_user_id])
-        query = f"UPDATE Characters SET {', '.join(updates)} WHERE character_id = %s AND player_id = %s"
+        cursor.execute("SELECT team_id FROM Players WHERE player_id = %s FOR UPDATE", (current_user_id,))
+        player = cursor.fetchone()
+        if player is None:
+            return jsonify({'error': 'Player not found'}), 404
+        current_team = player['team_id']
+        if current_team == team_id:
+            return jsonify({'message': 'Already a member of this team'}), 200
+        if current_team is not None:
+            return jsonify({'error': 'Leave your current team first'}), 409
         
-        cursor.execute(query, params)
+        cursor.execute("UPDATE Players SET team_id = %s WHERE player_id = %s", (team_id, current_user_id))
         connection.commit()
         
-        return jsonify({'message': 'Character updated successfully'}), 200
+        return jsonify({'message': 'Joined team', 'team_id': team_id}), 200
     
     except Error as e:
         connection.rollback()
@@ -464,26 +3656,21 @@ def update_character(current_user_id, character_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/characters/<int:character_id>', methods=['DELETE'])
+@app.route('/api/teams/leave', methods=['POST'])
 @token_required
-def delete_character(current_user_id, character_id):
+def leave_team(current_user_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        
-        # Verify character belongs to player
-        cursor.execute("SELECT * FROM Characters WHERE character_id = %s AND player_id = %s", 
-                      (character_id, current_user_id))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Character not found'}), 404
-        
-        cursor.execute("DELETE FROM Characters WHERE character_id = %s", (character_id,))
+        cursor.execute("UPDATE Players SET team_id = NULL WHERE player_id = %s AND team_id IS NOT NULL", (current_user_id,))
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Not a member of any team'}), 400
         connection.commit()
         
-        return jsonify({'message': 'Character deleted successfully'}), 200
+        return jsonify({'message': 'Left team'}), 200
     
     except Error as e:
         connection.rollback()
@@ -492,30 +3679,101 @@ def delete_character(current_user_id, character_id):
         cursor.close()
         connection.close()
 
-# ==================== FRIENDS ENDPOINTS ====================
+# ==================== DASHBOARD ENDPOINT ====================
 
-@app.route('/api/friends', methods=['GET'])
+def dashboard_page_size():
+    # Paged sections read one extra row to tell whether there is a next page
+    return app.config['PAGE_SIZE_DEFAULT'] + 1
+
+# Everything loadAllData needs, keyed by the name used in the combined response
+DASHBOARD_SECTIONS = {
+    'games': lambda cursor, player_id: cached_active_games(cursor),
+    'player_games': lambda cursor, player_id: fetch_player_games(cursor, player_id, dashboard_page_size()),
+    'stats': fetch_player_stats,
+    'characters': lambda cursor, player_id: fetch_characters(cursor, player_id, dashboard_page_size()),
+    'friends': lambda cursor, player_id: cached_friend_edges(cursor, player_id, 'accepted', dashboard_page_size()),
+    'friend_requests': fetch_friend_requests
+}
+
+# Sections returned one page at a time, with the same cursors as their list
+# endpoints; the client continues from next_cursors with ?after=
+DASHBOARD_PAGE_CURSORS = {
+    'player_games': lambda r: [r['playtime_hours'], r['game_id']],
+    'characters': lambda r: [r['level'], r['character_id']],
+    'friends': lambda r: [r['player_id']]
+}
+
+def dashboard_response_body(results):
+    body = {}
+    next_cursors = {}
+    for name, rows in results.items():
+        cursor_values = DASHBOARD_PAGE_CURSORS.get(name)
+        if cursor_values is not None:
+            rows, next_cursor = split_page(rows, app.config['PAGE_SIZE_DEFAULT'], cursor_values)
+            if next_cursor is not None:
+                next_cursors[name] = next_cursor
+        body[name] = rows
+    body['next_cursors'] = next_cursors
+    return body
+
+_dashboard_executor = None
+_dashboard_lock = threading.Lock()
+
+def get_dashboard_executor():
+    global _dashboard_executor
+    if _dashboard_executor is None:
+        with _dashboard_lock:
+            if _dashboard_executor is None:
+                _dashboard_executor = ThreadPoolExecutor(max_workers=app.config['DASHBOARD_WORKERS'],
+                                                         thread_name_prefix='dashboard')
+    return _dashboard_executor
+
+def _load_dashboard_section(loader, player_id):
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg='Database connection failed')
+    try:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            return loader(cursor, player_id)
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+@app.route('/api/dashboard', methods=['GET'])
 @token_required
-def get_friends(current_user_id):
+def get_dashboard(current_user_id):
+    include = request.args.get('include')
+    if include:
+        names = [n.strip() for n in include.split(',') if n.strip()]
+        unknown = [n for n in names if n not in DASHBOARD_SECTIONS]
+        if unknown:
+            return jsonify({'error': f'Unknown dashboard sections: {", ".join(unknown)}'}), 400
+    else:
+        names = list(DASHBOARD_SECTIONS)
+
+    # By default the sections fan out over pooled connections and run
+    # concurrently; DASHBOARD_WORKERS=1 runs them back to back on one connection.
+    # Each section runs in a copy of this request's context so its reads are
+    # routed, timed and logged as part of the request.
+    if app.config['DASHBOARD_WORKERS'] > 1:
+        executor = get_dashboard_executor()
+        try:
+            futures = {name: executor.submit(contextvars.copy_context().run, _load_dashboard_section,
+                                             DASHBOARD_SECTIONS[name], current_user_id)
+                       for name in names}
+            return jsonify(dashboard_response_body({name: future.result() for name, future in futures.items()})), 200
+        except Error as e:
+            return jsonify({'error': str(e)}), 500
+
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                p.player_id,
-                p.username,
-                p.email,
-                f.status
-            FROM Friends f
-            JOIN Players p ON p.player_id = IF(f.player_one_id = %s, f.player_two_id, f.player_one_id)
-            WHERE (f.player_one_id = %s OR f.player_two_id = %s)
-            AND f.status = 'accepted'
-        """, (current_user_id, current_user_id, current_user_id))
-        friends = cursor.fetchall()
-        return jsonify(friends), 200
+        return jsonify(dashboard_response_body({name: DASHBOARD_SECTIONS[name](cursor, current_user_id) for name in names})), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -523,48 +3781,46 @@ def get_friends(current_user_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/friends/requests', methods=['GET'])
+# ==================== ADMIN ENDPOINTS ====================
+
+@app.route('/api/admin/game-stats/reconcile', methods=['POST'])
 @token_required
-def get_friend_requests(current_user_id):
+def reconcile_game_stats_endpoint(current_user_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                p.player_id,
-                p.username,
-                p.email,
-                f.status
-            FROM Friends f
-            JOIN Players p 
-              ON p.player_id = 
-                 CASE 
-                   WHEN f.player_one_id = %s THEN f.player_two_id 
-                   ELSE f.player_one_id 
-                 END
-            WHERE (f.player_one_id = %s OR f.player_two_id = %s)
-              AND f.status = 'pending'
-              AND p.player_id != %s;
-        """, (current_user_id, current_user_id, current_user_id, current_user_id))
-
-        requests = cursor.fetchall()
-        return jsonify(requests), 200
-
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        # End the role check's read snapshot before the generation bump
+        connection.commit()
+        
+        # Buffered deltas in every process are dropped by generation at their next flush
+        updated = reconcile_game_stats(cursor)
+        connection.commit()
+        invalidate_games_cache()
+        
+        return jsonify({'message': 'Game stats reconciled', 'games_updated': updated}), 200
+    
     except Error as e:
+        connection.rollback()
         return jsonify({'error': str(e)}), 500
-
     finally:
         cursor.close()
         connection.close()
 
-
-@app.route('/api/friends/search', methods=['GET'])
+@app.route('/api/admin/match-history/maintain', methods=['POST'])
 @token_required
-def search_players(current_user_id):
-    search_term = request.args.get('q', '')
+def maintain_match_history_endpoint(current_user_id):
+    data = request.get_json(silent=True) or {}
+    retention = data.get('retention_months', app.config['MATCH_HISTORY_RETENTION_MONTHS'])
+    archive = data.get('archive', app.config['MATCH_HISTORY_ARCHIVE'])
+    if not isinstance(retention, int) or isinstance(retention, bool) or retention < 1:
+        return jsonify({'error': 'retention_months must be a positive integer'}), 400
+    if not isinstance(archive, bool):
+        return jsonify({'error': 'archive must be a boolean'}), 400
     
     connection = get_db_connection()
     if not connection:
@@ -572,16 +3828,11 @@ def search_players(current_user_id):
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT player_id, username, email
-            FROM Players
-            WHERE (username LIKE %s OR email LIKE %s)
-            AND player_id != %s
-            AND account_status = 'active'
-            LIMIT 20
-        """, (f'%{search_term}%', f'%{search_term}%', current_user_id))
-        players = cursor.fetchall()
-        return jsonify(players), 200
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        
+        result = maintain_match_history(cursor, retention, app.config['MATCH_HISTORY_MONTHS_AHEAD'], archive)
+        return jsonify({'message': 'Match history maintained', **result}), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -589,73 +3840,71 @@ def search_players(current_user_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/friends/request', methods=['POST'])
-@token_required
-def send_friend_request(current_user_id):
-    data = request.get_json()
-    friend_id = data.get('friend_id')
-    
-    if not friend_id:
-        return jsonify({'error': 'Friend ID is required'}), 400
-    
-    if friend_id == current_user_id:
-        return jsonify({'error': 'Cannot send friend request to yourself'}), 400
-    
+def require_admin(current_user_id):
+    # Returns an error response tuple, or None when the caller is an admin
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
         cursor = connection.cursor(dictionary=True)
-        
-        # Check if friend exists
-        cursor.execute("SELECT * FROM Players WHERE player_id = %s", (friend_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'Player not found'}), 404
-        
-        # Insert friendship (trigger will handle ordering)
-        cursor.execute("""
-            INSERT INTO Friends (player_one_id, player_two_id, status)
-            VALUES (%s, %s, 'pending')
-        """, (current_user_id, friend_id))
-        connection.commit()
-        
-        return jsonify({'message': 'Friend request sent successfully'}), 201
-    
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        return None
     except Error as e:
-        connection.rollback()
-        if 'Duplicate entry' in str(e):
-            return jsonify({'error': 'Friend request already exists'}), 409
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-@app.route('/api/friends/accept/<int:friend_id>', methods=['PUT'])
+@app.route('/api/admin/export/games', methods=['GET'])
 @token_required
-def accept_friend_request(current_user_id, friend_id):
+def export_games(current_user_id):
+    denied = require_admin(current_user_id)
+    if denied:
+        return denied
+    # Streams as a JSON array unless NDJSON is asked for
+    return stream_query("SELECT * FROM Games ORDER BY game_id", (), requested_stream_format() or 'json')
+
+@app.route('/api/admin/export/achievements', methods=['GET'])
+@token_required
+def export_player_achievements(current_user_id):
+    denied = require_admin(current_user_id)
+    if denied:
+        return denied
+    return stream_query("""
+        SELECT player_id, achievement_id, date_earned
+        FROM Player_Achievements
+        ORDER BY player_id, date_earned, achievement_id
+    """, (), requested_stream_format() or 'json')
+
+@app.route('/api/admin/players/<int:player_id>/status', methods=['PUT'])
+@token_required
+def set_player_status(current_user_id, player_id):
+    data = request.get_json()
+    status = data.get('account_status')
+    
+    if status not in ('active', 'suspended', 'banned', 'inactive'):
+        return jsonify({'error': 'account_status must be active, suspended, banned or inactive'}), 400
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
         
-        # Update friendship status
-        cursor.execute("""
-            UPDATE Friends
-            SET status = 'accepted'
-            WHERE ((player_one_id = %s AND player_two_id = %s) 
-                OR (player_one_id = %s AND player_two_id = %s))
-            AND status = 'pending'
-        """, (friend_id, current_user_id, current_user_id, friend_id))
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Friend request not found'}), 404
-        
+        cursor.execute("UPDATE Players SET account_status = %s WHERE player_id = %s", (status, player_id))
+        cursor.execute("SELECT 1 FROM Players WHERE player_id = %s", (player_id,))
+        if cursor.fetchone() is None:
+            return jsonify({'error': 'Player not found'}), 404
         connection.commit()
         
-        return jsonify({'message': 'Friend request accepted'}), 200
+        # Takes effect on the player's next request
+        account_statuses.set_status(player_id, status)
+        
+        return jsonify({'message': 'Account status updated', 'account_status': status}), 200
     
     except Error as e:
         connection.rollback()
@@ -664,28 +3913,42 @@ def accept_friend_request(current_user_id, friend_id):
         cursor.close()
         connection.close()
 
-@app.route('/api/friends/<int:friend_id>', methods=['DELETE'])
+@app.route('/api/admin/achievements/<int:achievement_id>/rule', methods=['PUT'])
 @token_required
-def remove_friend(current_user_id, friend_id):
+def set_achievement_rule(current_user_id, achievement_id):
+    data = request.get_json() or {}
+    stat = data.get('stat')
+    threshold = data.get('threshold')
+    
+    if stat not in ACHIEVEMENT_STATS:
+        return jsonify({'error': f'stat must be one of {", ".join(ACHIEVEMENT_STATS)}'}), 400
+    if not isinstance(threshold, (int, float)) or isinstance(threshold, bool) or threshold < 0:
+        return jsonify({'error': 'threshold must be a non-negative number'}), 400
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
         
+        cursor.execute("SELECT 1 FROM Achievements WHERE achievement_id = %s", (achievement_id,))
+        if cursor.fetchone() is None:
+            return jsonify({'error': 'Achievement not found'}), 404
         cursor.execute("""
-            DELETE FROM Friends
-            WHERE (player_one_id = %s AND player_two_id = %s)
-            OR (player_one_id = %s AND player_two_id = %s)
-        """, (current_user_id, friend_id, friend_id, current_user_id))
-        
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'Friendship not found'}), 404
-        
+            INSERT INTO Achievement_Rules (achievement_id, stat, threshold)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE stat = VALUES(stat), threshold = VALUES(threshold)
+        """, (achievement_id, stat, threshold))
+        # Award it to everyone who already qualifies; matches only check crossings
+        cursor.callproc('sp_EvaluateAchievementRules', [achievement_id])
         connection.commit()
+        achievement_rules_cache.invalidate()
         
-        return jsonify({'message': 'Friend removed successfully'}), 200
+        return jsonify({'message': 'Achievement rule saved', 'achievement_id': achievement_id,
+                        'stat': stat, 'threshold': threshold}), 200
     
     except Error as e:
         connection.rollback()
@@ -694,62 +3957,48 @@ def remove_friend(current_user_id, friend_id):
         cursor.close()
         connection.close()
 
-# ==================== ACHIEVEMENTS ENDPOINTS ====================
-
-@app.route('/api/achievements/player', methods=['GET'])
+@app.route('/api/admin/achievements/<int:achievement_id>/rule', methods=['DELETE'])
 @token_required
-def get_player_achievements(current_user_id):
+def delete_achievement_rule(current_user_id, achievement_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                a.achievement_id,
-                a.name,
-                a.description,
-                a.points_value,
-                g.title as game_title,
-                pa.date_earned
-            FROM Player_Achievements pa
-            JOIN Achievements a ON pa.achievement_id = a.achievement_id
-            JOIN Games g ON a.game_id = g.game_id
-            WHERE pa.player_id = %s
-            ORDER BY pa.date_earned DESC
-        """, (current_user_id,))
-        achievements = cursor.fetchall()
-        return jsonify(achievements), 200
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        
+        cursor.execute("DELETE FROM Achievement_Rules WHERE achievement_id = %s", (achievement_id,))
+        if cursor.rowcount == 0:
+            return jsonify({'error': 'Rule not found'}), 404
+        connection.commit()
+        achievement_rules_cache.invalidate()
+        
+        return jsonify({'message': 'Achievement rule removed'}), 200
     
     except Error as e:
+        connection.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         cursor.close()
         connection.close()
 
-@app.route('/api/achievements/game/<int:game_id>', methods=['GET'])
+@app.route('/api/admin/cache/games/invalidate', methods=['POST'])
 @token_required
-def get_game_achievements(current_user_id, game_id):
+def invalidate_games_cache_endpoint(current_user_id):
     connection = get_db_connection()
     if not connection:
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                a.achievement_id,
-                a.name,
-                a.description,
-                a.points_value,
-                CASE WHEN pa.player_id IS NOT NULL THEN TRUE ELSE FALSE END as earned
-            FROM Achievements a
-            LEFT JOIN Player_Achievements pa ON a.achievement_id = pa.achievement_id AND pa.player_id = %s
-            WHERE a.game_id = %s
-        """, (current_user_id, game_id))
-        achievements = cursor.fetchall()
-        return jsonify(achievements), 200
+        if not has_role(cursor, current_user_id, 'Admin'):
+            return jsonify({'error': 'Admin role required'}), 403
+        
+        # For catalog edits made outside the API
+        invalidate_games_cache()
+        return jsonify({'message': 'Games cache invalidated'}), 200
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -761,11 +4010,78 @@ def get_game_achievements(current_user_id, game_id):
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    connection = get_db_connection()
-    if connection:
-        connection.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'}), 200
-    return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    # Report pool state rather than opening a throwaway connection
+    stats = get_pool().stats()
+    body = {'pool': stats, 'replica_pools': [pool.stats() for pool in get_replica_pools()], 'game_stats_mode': app.config['GAME_STATS_MODE'],
+            'game_stats_pending': game_stats_buffer.pending(),
+            'password_hasher': password_hasher.stats(),
+            'popularity': {'last_run': popularity_job.last_run, 'last_error': popularity_job.last_error,
+                           'version': popularity_job.version}}
+    if stats['last_error'] is None:
+        return jsonify({'status': 'healthy', 'database': 'connected', **body}), 200
+    return jsonify({'status': 'unhealthy', 'database': 'disconnected', **body}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint: latency histograms plus pool and hasher gauges
+    lines = []
+    for histogram in (request_seconds, phase_seconds, statement_seconds):
+        lines.extend(histogram.render())
+    pools = [('primary', get_pool())] + [(f'replica{i}', pool) for i, pool in enumerate(get_replica_pools())]
+    lines.append('# HELP api_db_pool_connections Pooled database connections by state.')
+    lines.append('# TYPE api_db_pool_connections gauge')
+    for name, pool in pools:
+        stats = pool.stats()
+        for state in ('open', 'idle', 'in_use', 'waiting'):
+            lines.append(f'api_db_pool_connections{{pool="{name}",state="{state}"}} {stats[state]}')
+    lines.append('# HELP api_db_pool_timeouts_total Checkouts that timed out waiting for a connection.')
+    lines.append('# TYPE api_db_pool_timeouts_total counter')
+    for name, pool in pools:
+        lines.append(f'api_db_pool_timeouts_total{{pool="{name}"}} {pool.stats()["timeouts"]}')
+    lines.append('# HELP api_db_prepared_statements_total Prepared statement cache lookups by result.')
+    lines.append('# TYPE api_db_prepared_statements_total counter')
+    for name, pool in pools:
+        stats = pool.stats()
+        for result, key in (('hit', 'prepared_hits'), ('miss', 'prepared_misses')):
+            lines.append(f'api_db_prepared_statements_total{{pool="{name}",result="{result}"}} {stats[key]}')
+    hasher = password_hasher.stats()
+    lines.append('# HELP api_bcrypt_pending Password hashes queued or running.')
+    lines.append('# TYPE api_bcrypt_pending gauge')
+    lines.append(f'api_bcrypt_pending {hasher["pending"]}')
+    lines.append('# HELP api_game_stats_pending Buffered game stat deltas awaiting flush.')
+    lines.append('# TYPE api_game_stats_pending gauge')
+    lines.append(f'api_game_stats_pending {game_stats_buffer.pending()}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_background_jobs():
+    popularity_job.ensure_started()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None or request.endpoint == 'metrics':
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_seconds.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+    for phase, seconds in g.get('timings', {}).items():
+        phase_seconds.observe(seconds, route, phase)
+    return response
+
+@app.after_request
+def remember_writes(response):
+    # A successful write pins the player's reads to the primary for a short
+    # window, here and, through the header the client echoes, on every worker
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        player_id = g.get('current_user_id')
+        if player_id is not None:
+            recent_writers.mark(player_id)
+            response.headers[LAST_WRITE_HEADER] = f'{time.time():.3f}'
+    return response
 
 # ==================== ERROR HANDLERS ====================
 
@@ -778,4 +4094,9 @@ def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # SERVER_MODE=async serves the same routes from asgi.py on an event loop
+    if os.environ.get('SERVER_MODE', 'sync') == 'async':
+        import uvicorn
+        uvicorn.run('asgi:application', host='0.0.0.0', port=5000)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
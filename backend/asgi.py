@@ -0,0 +1,301 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiomysql
+import mysql.connector
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app import (
+    app as flask_app,
+    account_statuses,
+    authenticate_token,
+    games_cache,
+    games_response_body,
+    popularity_job,
+    phase_seconds,
+    record_statement,
+    request_seconds,
+    recent_writers,
+    LAST_WRITE_HEADER,
+    replica_addresses,
+    GAMES_SORTS,
+    friends_cache,
+    summarize_player_stats,
+    DASHBOARD_SECTIONS,
+    dashboard_page_size,
+    dashboard_response_body,
+    PLAYER_STATS_SQL,
+    PLAYER_GAMES_FIRST_PAGE_SQL,
+    CHARACTERS_FIRST_PAGE_SQL,
+    FRIEND_EDGES_SQL
+)
+
+# Async entry point: the hot read routes run natively on the event loop over an
+# aiomysql pool, everything else is handed to the Flask app on a pool of worker
+# threads. The keyset-paginated lists stay on the Flask side: they share
+# page_args validation, NDJSON streaming and the prepared statement cache with
+# the sync server, and they run concurrently on those threads like any other
+# delegated route.
+# Run with `uvicorn asgi:application` or `SERVER_MODE=async python app.py`.
+
+pool = None
+replica_pools = []
+replica_turn = 0
+# The request's X-Last-Write header, for the read-your-writes check in fetch
+last_write = contextvars.ContextVar('last_write', default=None)
+# Native routes skip Flask's before/after_request hooks, so serve_native
+# records their request metrics and these collect the per-phase times
+request_route = contextvars.ContextVar('request_route', default='background')
+request_timings = contextvars.ContextVar('request_timings', default=None)
+
+def record_phase(phase, seconds):
+    # Sections gathered concurrently share the dict; they all run on the loop thread
+    timings = request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+# Handlers also call into the sync app (games_response_body), which raises
+# mysql.connector errors rather than aiomysql ones
+DB_ERRORS = (aiomysql.Error, mysql.connector.Error)
+
+def json_response(data, status=200, headers=None):
+    # Flask's JSON provider already knows how to encode Decimal and datetime
+    started = time.perf_counter()
+    body = flask_app.json.dumps(data)
+    record_phase('serialize', time.perf_counter() - started)
+    return Response(body, status_code=status, media_type='application/json', headers=headers)
+
+def error_response(message, status):
+    return json_response({'error': message}, status)
+
+async def acquire(target):
+    try:
+        return await asyncio.wait_for(target.acquire(), flask_app.config['DB_POOL_TIMEOUT'])
+    except asyncio.TimeoutError:
+        raise aiomysql.Error('Timed out waiting for a database connection')
+
+async def fetch(sql, params, one=False, reader=None):
+    # reader is the player the read is for. As in the Flask app, their reads go
+    # to a replica unless they wrote recently; reads without one, like cache
+    # refills, always use the primary.
+    global replica_turn
+    started = time.perf_counter()
+    target = pool
+    connection = None
+    if reader is not None and replica_pools and not recent_writers.is_recent(reader, last_write.get()):
+        replica_turn = (replica_turn + 1) % len(replica_pools)
+        target = replica_pools[replica_turn]
+        try:
+            connection = await acquire(target)
+        except aiomysql.Error as e:
+            # Fall back to the primary rather than failing the read
+            print(f"Error connecting to MySQL replica: {e}")
+            target = pool
+    if connection is None:
+        connection = await acquire(target)
+    record_phase('db_connect', time.perf_counter() - started)
+    try:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            started = time.perf_counter()
+            await cursor.execute(sql, params)
+            executed = time.perf_counter()
+            rows = await (cursor.fetchone() if one else cursor.fetchall())
+            fetched = time.perf_counter()
+    finally:
+        target.release(connection)
+    for phase, seconds in (('execute', executed - started), ('fetch', fetched - executed)):
+        record_statement(sql, phase, seconds, route=request_route.get())
+        record_phase(f'db_{phase}', seconds)
+    return rows
+
+def authenticated(handler):
+    async def endpoint(request):
+        token = request.headers.get('Authorization')
+        if token and token.startswith('Bearer '):
+            token = token.split(' ')[1]
+        # Reloading the account status set is a blocking query; keep it off the loop
+        if account_statuses.stale():
+            await asyncio.to_thread(account_statuses.refresh_if_stale)
+        current_user_id, failure = authenticate_token(token, refresh_statuses=False)
+        if failure:
+            return error_response(*failure)
+        last_write.set(request.headers.get(LAST_WRITE_HEADER))
+        try:
+            return await handler(request, current_user_id)
+        except DB_ERRORS as e:
+            return error_response(str(e), 500)
+    return endpoint
+
+async def load_player_stats(player_id):
+    return summarize_player_stats(await fetch(PLAYER_STATS_SQL, (player_id,), one=True, reader=player_id))
+
+async def load_friend_edges(player_id, status):
+    ttl = flask_app.config['FRIENDS_CACHE_TTL']
+    edges = friends_cache.get((player_id, status)) if ttl > 0 else None
+    if edges is None:
+        epoch = friends_cache.epoch()
+        # Only a refill of the shared cache has to come from the primary
+        edges = await fetch(FRIEND_EDGES_SQL, (player_id, status, player_id, status),
+                            reader=None if ttl > 0 else player_id)
+        if ttl > 0:
+            friends_cache.set((player_id, status), edges, epoch=epoch)
+    return edges
+
+async def load_games():
+    games = games_cache.get('catalog')
+    if games is None:
+        # Cache misses are rare; let the sync loader fill the shared cache
+        await asyncio.to_thread(games_response_body, False)
+        games = games_cache.get('catalog')
+    return games
+
+ASYNC_DASHBOARD_SECTIONS = {
+    'games': lambda player_id: load_games(),
+    'player_games': lambda player_id: fetch(PLAYER_GAMES_FIRST_PAGE_SQL, (player_id, dashboard_page_size()), reader=player_id),
+    'stats': load_player_stats,
+    'characters': lambda player_id: fetch(CHARACTERS_FIRST_PAGE_SQL, (player_id, dashboard_page_size()), reader=player_id),
+    'friends': lambda player_id: load_friend_edges(player_id, 'accepted'),
+    'friend_requests': lambda player_id: load_friend_edges(player_id, 'pending')
+}
+
+@authenticated
+async def get_all_games(request, current_user_id):
+    with_counters = 'counters' in request.query_params.get('include', '').split(',')
+    sort = request.query_params.get('sort', 'title')
+    if sort not in GAMES_SORTS:
+        return error_response(f'sort must be one of {", ".join(GAMES_SORTS)}', 400)
+    body, etag = await asyncio.to_thread(games_response_body, with_counters, sort)
+    quoted = f'"{etag}"'
+    headers = {'ETag': quoted, 'Cache-Control': 'private, no-cache'}
+    if quoted in request.headers.get('If-None-Match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+@authenticated
+async def get_player_stats(request, current_user_id):
+    return json_response(await load_player_stats(current_user_id))
+
+@authenticated
+async def get_friend_requests(request, current_user_id):
+    return json_response(await load_friend_edges(current_user_id, 'pending'))
+
+@authenticated
+async def get_dashboard(request, current_user_id):
+    include = request.query_params.get('include')
+    names = [n.strip() for n in include.split(',') if n.strip()] if include else list(DASHBOARD_SECTIONS)
+    unknown = [n for n in names if n not in ASYNC_DASHBOARD_SECTIONS]
+    if unknown:
+        return error_response(f'Unknown dashboard sections: {", ".join(unknown)}', 400)
+    # Sections are independent, so they run concurrently on separate pooled connections
+    results = await asyncio.gather(*(ASYNC_DASHBOARD_SECTIONS[name](current_user_id) for name in names))
+    return json_response(dashboard_response_body(dict(zip(names, results))))
+
+def pool_stats(target):
+    return {'size': target.maxsize, 'open': target.size, 'idle': target.freesize}
+
+async def health_check(request):
+    body = {'mode': 'async', 'pool': pool_stats(pool), 'replica_pools': [pool_stats(p) for p in replica_pools]}
+    try:
+        await fetch('SELECT 1', (), one=True)
+    except DB_ERRORS as e:
+        return json_response({'status': 'unhealthy', 'database': 'disconnected', 'error': str(e), **body}, 500)
+    return json_response({'status': 'healthy', 'database': 'connected', **body})
+
+async def create_pool(host, port, minsize=1):
+    return await aiomysql.create_pool(
+        host=host,
+        port=port,
+        user=flask_app.config['DB_USER'],
+        password=flask_app.config['DB_PASSWORD'],
+        db=flask_app.config['DB_NAME'],
+        minsize=minsize,
+        maxsize=flask_app.config['DB_POOL_SIZE'],
+        pool_recycle=flask_app.config['DB_POOL_MAX_LIFETIME'],
+        autocommit=True
+    )
+
+async def startup():
+    global pool, replica_pools
+    pool = await create_pool(flask_app.config['DB_HOST'], flask_app.config['DB_PORT'])
+    # Replicas connect lazily, so one being down at startup only sends reads to the primary
+    replica_pools = [await create_pool(host, port, minsize=0) for host, port in replica_addresses()]
+    popularity_job.ensure_started()
+
+async def shutdown():
+    for target in [pool] + replica_pools:
+        target.close()
+        await target.wait_closed()
+
+native_routes = [
+    Route('/api/games', get_all_games, methods=['GET']),
+    Route('/api/player/stats', get_player_stats, methods=['GET']),
+    Route('/api/friends/requests', get_friend_requests, methods=['GET']),
+    Route('/api/dashboard', get_dashboard, methods=['GET']),
+    Route('/api/health', health_check, methods=['GET'])
+]
+NATIVE_PATHS = {route.path for route in native_routes}
+
+native_app = Starlette(
+    routes=native_routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                           allow_headers=['*'], expose_headers=['X-Next-Cursor', LAST_WRITE_HEADER])],
+    on_startup=[startup],
+    on_shutdown=[shutdown]
+)
+
+# asgiref's adapter runs every WSGI call with thread_sensitive=True, i.e. all
+# delegated requests one at a time on a single shared thread. Flask keeps no
+# per-thread state between requests, so give each one a thread from a pool.
+wsgi_executor = ThreadPoolExecutor(max_workers=flask_app.config['ASYNC_WSGI_THREADS'],
+                                   thread_name_prefix='wsgi')
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func,
+                                 thread_sensitive=False, executor=wsgi_executor)
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+wsgi_app = ThreadedWsgiToAsgi(flask_app)
+
+async def serve_native(scope, receive, send):
+    route = scope['path']
+    request_route.set(route)
+    timings = {}
+    request_timings.set(timings)
+    status = []
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        await send(message)
+
+    started = time.perf_counter()
+    try:
+        await native_app(scope, receive, send_and_record)
+    finally:
+        request_seconds.observe(time.perf_counter() - started, route, scope['method'], str(status[0] if status else 500))
+        for phase, seconds in timings.items():
+            phase_seconds.observe(seconds, route, phase)
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await native_app(scope, receive, send)
+    if scope['type'] == 'http' and scope['path'] in NATIVE_PATHS and scope['method'] in ('GET', 'HEAD', 'OPTIONS'):
+        return await serve_native(scope, receive, send)
+    # Writes and the remaining routes keep their Flask implementation
+    return await wsgi_app(scope, receive, send)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi:application', host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
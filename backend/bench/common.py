@@ -0,0 +1,121 @@
+import json
+import math
+import os
+import subprocess
+from datetime import datetime
+
+# Shared helpers for the benchmark scripts. Connection settings come from the
+# same environment variables the backend reads.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(BENCH_DIR, '..', 'finalDBMS.sql')
+SEED_FILE = os.path.join(BENCH_DIR, 'seed.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+USERNAME_PREFIX = 'bench_'
+GAME_PREFIX = 'Bench Game '
+
+def connect_args(with_database=True):
+    args = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': int(os.environ.get('DB_PORT', 3306)),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', 'your-password')
+    }
+    if with_database:
+        args['database'] = os.environ.get('DB_NAME', 'video_game_player_database')
+    return args
+
+def load_seed(path=SEED_FILE):
+    if not os.path.exists(path):
+        raise SystemExit(f'{path} not found; run seed.py first')
+    with open(path) as f:
+        return json.load(f)
+
+def parse_mix(text):
+    # "login=1,dashboard=5" -> {'login': 1.0, 'dashboard': 5.0}
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip():
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile over an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+def summarize(samples, elapsed):
+    # samples: {name: [(seconds, ok), ...]}
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        latencies = sorted(seconds for seconds, _ in values)
+        errors = sum(1 for _, ok in values if not ok)
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors,
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests': total,
+        'errors': sum(e['errors'] for e in endpoints.values()),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'endpoints': endpoints
+    }
+
+def print_report(summary):
+    print(f"{'endpoint':<24}{'reqs':>8}{'errs':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in summary['endpoints'].items():
+        print(f"{name:<24}{e['requests']:>8}{e['errors']:>6}{e['throughput_rps']:>10}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    print(f"total: {summary['requests']} requests, {summary['errors']} errors, "
+          f"{summary['throughput_rps']} req/s over {summary['elapsed_s']}s")
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(kind, label, config, summary):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    revision = git_revision()
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    name = '-'.join(part for part in (kind, label or revision, stamp) if part)
+    path = os.path.join(RESULTS_DIR, f'{name}.json')
+    with open(path, 'w') as f:
+        json.dump({'kind': kind, 'label': label, 'revision': revision, 'recorded_at': stamp,
+                   'config': config, 'summary': summary}, f, indent=2)
+    print(f'results saved to {path}')
+    return path
+
+def print_comparison(baseline_path, summary):
+    # Shows how throughput and tail latency moved against an earlier run
+    with open(baseline_path) as f:
+        baseline = json.load(f)['summary']
+    print(f'\nagainst {os.path.basename(baseline_path)}:')
+    print(f"{'endpoint':<24}{'rps':>20}{'p95 ms':>24}{'p99 ms':>24}")
+    for name, e in summary['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            print(f'{name:<24}  (not in baseline)')
+            continue
+        print(f'{name:<24}' + ''.join(
+            f"  {_change(before[key], e[key]):>{width}}"
+            for key, width in (('throughput_rps', 18), ('p95_ms', 22), ('p99_ms', 22))))
+
+def _change(before, after):
+    if not before:
+        return f'{before} -> {after}'
+    return f'{before} -> {after} ({(after - before) / before * 100:+.1f}%)'
@@ -0,0 +1,137 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import SEED_FILE, load_seed, parse_mix, print_comparison, print_report, save_results, summarize
+
+# Drives a weighted mix of API calls against a running backend seeded by
+# seed.py and reports throughput and p50/p95/p99 per scenario.
+#
+#   python load.py --concurrency 32 --duration 60 --label before-change
+#   python load.py --concurrency 32 --duration 60 --compare results/load-before-change-....json
+
+SCENARIOS = ('login', 'dashboard', 'match', 'search')
+DEFAULT_MIX = 'login=1,dashboard=6,match=3,search=2'
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def call(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header('Content-Type', 'application/json')
+        if self.token:
+            req.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                # Read the whole body so transfer time counts toward latency
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            return None, b''
+
+class Scenarios:
+    def __init__(self, seed, rng):
+        self.seed = seed
+        self.rng = rng
+
+    def username(self):
+        return f"{self.seed['username_prefix']}{self.rng.randrange(self.seed['players']):07d}"
+
+    def login(self, client):
+        status, body = client.call('POST', '/api/auth/login',
+                                   {'username': self.username(), 'password': self.seed['password']})
+        if status == 200:
+            client.token = json.loads(body)['token']
+        return status == 200
+
+    def dashboard(self, client):
+        status, _ = client.call('GET', '/api/dashboard')
+        return status == 200
+
+    def match(self, client):
+        status, _ = client.call('POST', '/api/games/match', {
+            'game_id': self.rng.choice(self.seed['game_ids']),
+            'playtime': round(self.rng.uniform(0.1, 2.0), 2),
+            'is_win': self.rng.random() < 0.5,
+            'score': self.rng.randint(0, 100000)
+        })
+        return status in (200, 201)
+
+    def search(self, client):
+        # A prefix a few digits into the username matches a realistic slice of players
+        prefix = self.username()[:len(self.seed['username_prefix']) + 4]
+        status, _ = client.call('GET', '/api/friends/search?' + urllib.parse.urlencode({'q': prefix}))
+        return status == 200
+
+def worker(index, args, seed, mix, deadline, samples, lock):
+    rng = random.Random(args.seed + index)
+    scenarios = Scenarios(seed, rng)
+    client = Client(args.base_url, args.timeout)
+    # Each worker signs in once so the mix measures steady-state traffic
+    if not scenarios.login(client):
+        print(f'worker {index}: login failed, is the backend running and seeded?')
+        return
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    local = {name: [] for name in names}
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        ok = getattr(scenarios, name)(client)
+        local[name].append((time.perf_counter() - started, ok))
+        if name == 'login' and not ok:
+            scenarios.login(client)
+    with lock:
+        for name, values in local.items():
+            samples.setdefault(name, []).extend(values)
+
+def run(args):
+    seed = load_seed(args.seed_file)
+    mix = parse_mix(args.mix)
+    unknown = [name for name in mix if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f'Unknown scenarios: {", ".join(unknown)}')
+
+    samples = {}
+    lock = threading.Lock()
+    print(f'{args.concurrency} workers for {args.duration}s against {args.base_url}, mix {args.mix}')
+    started = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(worker, i, args, seed, mix, deadline, samples, lock)
+                   for i in range(args.concurrency)]
+    # A worker that died would otherwise just leave fewer samples behind
+    for future in futures:
+        future.result()
+    summary = summarize(samples, time.perf_counter() - started)
+
+    print_report(summary)
+    config = {'base_url': args.base_url, 'concurrency': args.concurrency, 'duration': args.duration,
+              'mix': mix, 'players': seed['players'], 'games': len(seed['game_ids'])}
+    save_results('load', args.label, config, summary)
+    if args.compare:
+        print_comparison(args.compare, summary)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the API')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weighted scenarios, e.g. login=1,dashboard=6')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--seed-file', default=SEED_FILE)
+    parser.add_argument('--label', default=None, help='name for the saved results file')
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    run(parser.parse_args())
@@ -0,0 +1,106 @@
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from mysql.connector import Error
+
+from common import (SEED_FILE, connect_args, load_seed, parse_mix, print_comparison, print_report,
+                    save_results, summarize)
+
+# Calls the stored procedures directly, one connection per worker, so their
+# cost can be tracked without the HTTP layer in the way.
+#
+#   python procs.py --concurrency 8 --duration 30 --label baseline
+
+DEFAULT_MIX = 'record_match=3,profile=5,profile_by_name=1'
+
+def player_ids(connection, prefix):
+    cursor = connection.cursor()
+    cursor.execute("SELECT player_id, username FROM Players WHERE username LIKE %s", (prefix.replace('_', '\\_') + '%',))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def call(cursor, name, params):
+    cursor.callproc(name, params)
+    for result in cursor.stored_results():
+        result.fetchall()
+
+def worker(index, args, seed, players, mix, deadline, samples, lock):
+    rng = random.Random(args.seed + index)
+    connection = mysql.connector.connect(**connect_args())
+    cursor = connection.cursor()
+    procedures = {
+        'record_match': lambda player_id, username: call(cursor, 'sp_RecordMatchResult', [
+            player_id, rng.choice(seed['game_ids']), round(rng.uniform(0.1, 2.0), 2),
+            rng.random() < 0.5, rng.randint(0, 100000)]),
+        'profile': lambda player_id, username: call(cursor, 'sp_GetPlayerProfileById', [
+            player_id, 'player_info,characters,games,friends']),
+        'profile_by_name': lambda player_id, username: call(cursor, 'sp_GetPlayerProfile', [username])
+    }
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    local = {name: [] for name in names}
+    try:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            player_id, username = rng.choice(players)
+            started = time.perf_counter()
+            try:
+                procedures[name](player_id, username)
+                connection.commit()
+                ok = True
+            except Error:
+                connection.rollback()
+                ok = False
+            local[name].append((time.perf_counter() - started, ok))
+    finally:
+        cursor.close()
+        connection.close()
+    with lock:
+        for name, values in local.items():
+            samples.setdefault(name, []).extend(values)
+
+def run(args):
+    seed = load_seed(args.seed_file)
+    mix = parse_mix(args.mix)
+    unknown = [name for name in mix if name not in ('record_match', 'profile', 'profile_by_name')]
+    if unknown:
+        raise SystemExit(f'Unknown procedures: {", ".join(unknown)}')
+    connection = mysql.connector.connect(**connect_args())
+    players = player_ids(connection, seed['username_prefix'])
+    connection.close()
+
+    samples = {}
+    lock = threading.Lock()
+    print(f'{args.concurrency} connections for {args.duration}s, mix {args.mix}')
+    started = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(worker, i, args, seed, players, mix, deadline, samples, lock)
+                   for i in range(args.concurrency)]
+    # A worker that died would otherwise just leave fewer samples behind
+    for future in futures:
+        future.result()
+    summary = summarize(samples, time.perf_counter() - started)
+
+    print_report(summary)
+    config = {'concurrency': args.concurrency, 'duration': args.duration, 'mix': mix,
+              'players': len(players), 'games': len(seed['game_ids'])}
+    save_results('procs', args.label, config, summary)
+    if args.compare:
+        print_comparison(args.compare, summary)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the stored procedures directly')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weighted procedures, e.g. record_match=3,profile=5')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--seed-file', default=SEED_FILE)
+    parser.add_argument('--label', default=None, help='name for the saved results file')
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    run(parser.parse_args())
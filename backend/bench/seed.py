@@ -0,0 +1,205 @@
+import argparse
+import json
+import random
+import time
+
+import bcrypt
+import mysql.connector
+from mysql.connector import errorcode
+
+from common import GAME_PREFIX, SCHEMA_FILE, SEED_FILE, USERNAME_PREFIX, connect_args
+
+# Seeds synthetic players, games, Player_Games, Friends and achievements for the
+# load and stored procedure benchmarks. Sizes scale with --players; rerunning
+# replaces the previous bench_ rows and leaves the sample data alone.
+#
+#   python seed.py --players 10000 --reset
+
+GENRES = ('Action', 'RPG', 'Strategy', 'Shooter', 'Sports', 'Puzzle', 'Racing')
+
+def split_statements(script):
+    # finalDBMS.sql switches DELIMITER around triggers and procedures, which only
+    # the mysql client understands, so split it here
+    delimiter = ';'
+    buffer = []
+    for line in script.splitlines():
+        if line.strip().upper().startswith('DELIMITER '):
+            delimiter = line.split()[1]
+            continue
+        buffer.append(line)
+        if not line.lstrip().startswith('--') and line.rstrip().endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()[:-len(delimiter)].strip()
+            buffer = []
+            if statement:
+                yield statement
+    if '\n'.join(buffer).strip():
+        yield '\n'.join(buffer)
+
+# finalDBMS.sql also walks through its constraints with statements that are
+# meant to fail: a SELECT from the database name, a duplicate Friends pair and
+# a self-friendship rejected by its trigger. Only those errors are skipped.
+DEMO_ERRORS = {errorcode.ER_NO_SUCH_TABLE, errorcode.ER_DUP_ENTRY, errorcode.ER_SIGNAL_EXCEPTION}
+
+def load_schema(database):
+    with open(SCHEMA_FILE) as f:
+        script = f.read().replace('video_game_player_database', database)
+    connection = mysql.connector.connect(**connect_args(with_database=False))
+    cursor = connection.cursor()
+    cursor.execute(f'DROP DATABASE IF EXISTS `{database}`')
+    for statement in split_statements(script):
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as e:
+            code = [line.strip() for line in statement.splitlines() if not line.lstrip().startswith('--')]
+            if e.errno not in DEMO_ERRORS or not code[0].upper().startswith(('SELECT', 'INSERT')):
+                raise
+            print(f'Skipped expected failure ({e.msg}): {code[0]}')
+            continue
+        if cursor.with_rows:
+            cursor.fetchall()
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+def insert_rows(connection, sql, rows, batch_size):
+    # executemany folds each batch into one multi-row INSERT
+    cursor = connection.cursor()
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            connection.commit()
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        connection.commit()
+        count += len(batch)
+    cursor.close()
+    return count
+
+def fetch_ids(connection, sql, params):
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+def clear_previous(connection):
+    # Everything else hangs off Players and Games with ON DELETE CASCADE
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM Players WHERE username LIKE %s", (USERNAME_PREFIX.replace('_', '\\_') + '%',))
+    cursor.execute("DELETE FROM Games WHERE title LIKE %s", (GAME_PREFIX + '%',))
+    connection.commit()
+    cursor.close()
+
+def seed(args):
+    rng = random.Random(args.seed)
+    database = connect_args()['database']
+    if args.reset:
+        print(f'loading {SCHEMA_FILE} into {database}')
+        load_schema(database)
+
+    connection = mysql.connector.connect(**connect_args())
+    clear_previous(connection)
+    started = time.perf_counter()
+    counts = {}
+
+    counts['games'] = insert_rows(
+        connection,
+        "INSERT INTO Games (title, genre, developer_name) VALUES (%s, %s, %s)",
+        ((f'{GAME_PREFIX}{i:05d}', rng.choice(GENRES), f'Bench Studio {i % 20}') for i in range(args.games)),
+        args.batch_size)
+    game_ids = fetch_ids(connection, "SELECT game_id FROM Games WHERE title LIKE %s ORDER BY game_id",
+                         (GAME_PREFIX + '%',))
+
+    counts['achievements'] = insert_rows(
+        connection,
+        "INSERT INTO Achievements (game_id, name, description, points_value) VALUES (%s, %s, %s, %s)",
+        ((game_id, f'Bench Achievement {i}', 'Synthetic benchmark achievement', rng.choice((5, 10, 25, 50)))
+         for game_id in game_ids for i in range(args.achievements_per_game)),
+        args.batch_size)
+    achievement_ids = {}
+    cursor = connection.cursor()
+    cursor.execute("SELECT achievement_id, game_id FROM Achievements WHERE game_id IN (%s)"
+                   % ', '.join(['%s'] * len(game_ids)), game_ids)
+    for achievement_id, game_id in cursor.fetchall():
+        achievement_ids.setdefault(game_id, []).append(achievement_id)
+    cursor.close()
+
+    # Every bench player shares one password so logins can pick any account;
+    # hashing it once keeps seeding fast
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt(rounds=args.bcrypt_rounds)).decode('utf-8')
+    counts['players'] = insert_rows(
+        connection,
+        "INSERT INTO Players (username, email, password_hash) VALUES (%s, %s, %s)",
+        ((f'{USERNAME_PREFIX}{i:07d}', f'{USERNAME_PREFIX}{i:07d}@bench.local', password_hash)
+         for i in range(args.players)),
+        args.batch_size)
+    player_ids = fetch_ids(connection, "SELECT player_id FROM Players WHERE username LIKE %s ORDER BY player_id",
+                           (USERNAME_PREFIX.replace('_', '\\_') + '%',))
+
+    played = {}
+    def player_games():
+        for player_id in player_ids:
+            games = rng.sample(game_ids, min(len(game_ids), rng.randint(1, args.games_per_player)))
+            played[player_id] = games
+            for game_id in games:
+                matches = rng.randint(1, args.max_matches)
+                wins = rng.randint(0, matches)
+                yield (player_id, game_id, round(rng.uniform(0.5, 40) * matches / 10, 2), wins,
+                       matches - wins, matches, rng.randint(0, 100000))
+    counts['player_games'] = insert_rows(
+        connection,
+        "INSERT INTO Player_Games (player_id, game_id, playtime_hours, last_played_date, wins, losses, "
+        "matches_played, high_score) VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s)",
+        player_games(),
+        args.batch_size)
+
+    def friendships():
+        for player_id in player_ids:
+            for friend_id in rng.sample(player_ids, min(len(player_ids), args.friends_per_player)):
+                if friend_id != player_id:
+                    status = 'accepted' if rng.random() < 0.8 else 'pending'
+                    yield (min(player_id, friend_id), max(player_id, friend_id), status)
+    counts['friends'] = insert_rows(
+        connection,
+        "INSERT IGNORE INTO Friends (player_one_id, player_two_id, status) VALUES (%s, %s, %s)",
+        friendships(),
+        args.batch_size)
+
+    def earned():
+        for player_id, games in played.items():
+            for game_id in games:
+                candidates = achievement_ids.get(game_id, [])
+                for achievement_id in rng.sample(candidates, rng.randint(0, len(candidates))):
+                    yield (player_id, achievement_id)
+    counts['player_achievements'] = insert_rows(
+        connection,
+        "INSERT IGNORE INTO Player_Achievements (player_id, achievement_id) VALUES (%s, %s)",
+        earned(),
+        args.batch_size)
+    connection.close()
+
+    with open(SEED_FILE, 'w') as f:
+        json.dump({'database': database, 'username_prefix': USERNAME_PREFIX, 'players': args.players,
+                   'password': args.password, 'game_ids': game_ids, 'counts': counts}, f, indent=2)
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+    print(f'seeded in {time.perf_counter() - started:.1f}s; wrote {SEED_FILE}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed synthetic benchmark data')
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--games-per-player', type=int, default=5)
+    parser.add_argument('--friends-per-player', type=int, default=10)
+    parser.add_argument('--achievements-per-game', type=int, default=10)
+    parser.add_argument('--max-matches', type=int, default=200)
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='drop the database and reload finalDBMS.sql first')
+    seed(parser.parse_args())
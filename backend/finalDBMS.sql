@@ -640,4 +640,652 @@ DESCRIBE Players;
 SELECT * FROM Players;
 SELECT * FROM Games;
 
-SELECT * FROM Players WHERE username = 'AnshulB';
\ No newline at end of file
+SELECT * FROM Players WHERE username = 'AnshulB';
+
+-- Profile lookup keyed on player_id. p_fields is a comma separated list of the
+-- sections to return (player_info, characters, games, friends); result sets are
+-- emitted in that fixed order and only for the requested sections, so the whole
+-- profile comes back from a single CALL.
+DELIMITER //
+
+CREATE PROCEDURE sp_GetPlayerProfileById(
+    IN p_player_id INT,
+    IN p_fields VARCHAR(100)
+)
+BEGIN
+    IF EXISTS (SELECT 1 FROM Players WHERE player_id = p_player_id) THEN
+        IF FIND_IN_SET('player_info', p_fields) THEN
+            SELECT 
+                p.player_id,
+                p.username, 
+                p.email, 
+                p.date_created, 
+                p.last_login, 
+                p.account_status,
+                t.team_name
+            FROM Players p
+            LEFT JOIN Teams t ON p.team_id = t.team_id
+            WHERE p.player_id = p_player_id;
+        END IF;
+
+        IF FIND_IN_SET('characters', p_fields) THEN
+            SELECT 
+                character_id,
+                character_name, 
+                `level`, 
+                creation_date 
+            FROM Characters
+            WHERE player_id = p_player_id;
+        END IF;
+
+        IF FIND_IN_SET('games', p_fields) THEN
+            SELECT
+                g.game_id,
+                g.title,
+                pg.player_rank,
+                pg.playtime_hours,
+                pg.wins,
+                pg.losses,
+                pg.matches_played,
+                pg.high_score
+            FROM Player_Games pg
+            JOIN Games g ON pg.game_id = g.game_id
+            WHERE pg.player_id = p_player_id
+            ORDER BY pg.playtime_hours DESC;
+        END IF;
+
+        IF FIND_IN_SET('friends', p_fields) THEN
+            SELECT p.player_id, p.username AS friend_username, f.status
+            FROM Friends f
+            JOIN Players p ON p.player_id = f.player_two_id
+            WHERE f.player_one_id = p_player_id AND f.status = 'accepted'
+            UNION ALL
+            SELECT p.player_id, p.username AS friend_username, f.status
+            FROM Friends f
+            JOIN Players p ON p.player_id = f.player_one_id
+            WHERE f.player_two_id = p_player_id AND f.status = 'accepted';
+        END IF;
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+CALL sp_GetPlayerProfileById(1, 'player_info,characters,games,friends');
+
+
+-- Bulk match ingestion folds Games totals in itself, once per game, and sets
+-- @skip_game_stats_trigger for its session so these per-row updates are skipped.
+DROP TRIGGER IF EXISTS trg_UpdateGameStats_After_PlayerGamesUpdate;
+DROP TRIGGER IF EXISTS trg_UpdateGameStats_After_PlayerGamesInsert;
+
+DELIMITER //
+
+CREATE TRIGGER trg_UpdateGameStats_After_PlayerGamesUpdate
+AFTER UPDATE ON Player_Games
+FOR EACH ROW
+BEGIN
+    DECLARE hours_diff DECIMAL(10, 2);
+    DECLARE matches_diff BIGINT;
+
+    IF @skip_game_stats_trigger IS NULL THEN
+        SET hours_diff = NEW.playtime_hours - OLD.playtime_hours;
+        SET matches_diff = NEW.matches_played - OLD.matches_played;
+
+        UPDATE Games
+        SET
+            total_hours_played = total_hours_played + hours_diff,
+            total_matches_played = total_matches_played + matches_diff,
+            global_high_score = GREATEST(global_high_score, NEW.high_score)
+        WHERE
+            game_id = NEW.game_id;
+    END IF;
+END;
+//
+
+CREATE TRIGGER trg_UpdateGameStats_After_PlayerGamesInsert
+AFTER INSERT ON Player_Games
+FOR EACH ROW
+BEGIN
+    IF @skip_game_stats_trigger IS NULL THEN
+        UPDATE Games
+        SET
+            total_hours_played = total_hours_played + NEW.playtime_hours,
+            total_matches_played = total_matches_played + NEW.matches_played,
+            global_high_score = GREATEST(global_high_score, NEW.high_score)
+        WHERE
+            game_id = NEW.game_id;
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+
+-- In buffered mode each match transaction reads the generation with a shared
+-- lock and tags its buffered Games deltas with it. A reconcile bumps the
+-- generation (waiting for in-flight matches) before rebuilding Games, so every
+-- process drops deltas tagged with an older generation instead of adding them
+-- on top of the rebuilt totals.
+CREATE TABLE Game_Stats_Generation (
+    id TINYINT PRIMARY KEY,
+    generation INT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT INTO Game_Stats_Generation (id, generation) VALUES (1, 0);
+
+
+-- Leaderboard sync: each API process periodically re-reads the Player_Games
+-- rows changed since its last sync. Every match write stamps last_played_date.
+CREATE INDEX idx_player_games_last_played ON Player_Games(last_played_date);
+
+
+-- Player search: exact and prefix matches use idx_players_username and the
+-- email unique index; infix matches go through this ngram FULLTEXT index.
+CREATE FULLTEXT INDEX ft_players_search ON Players(username, email) WITH PARSER ngram;
+
+
+-- Friends lookups from the player_two_id side; player_one_id is covered by the primary key.
+CREATE INDEX idx_friends_player_two ON Friends(player_two_id, status);
+
+
+-- Keyset pagination indexes; each matches the ORDER BY of its list endpoint.
+CREATE INDEX idx_player_achievements_earned ON Player_Achievements(player_id, date_earned, achievement_id);
+CREATE INDEX idx_player_games_player_playtime ON Player_Games(player_id, playtime_hours, game_id);
+CREATE INDEX idx_characters_player_level ON Characters(player_id, `level`, character_id);
+
+
+-- Per-player totals, maintained by the triggers below so /api/player/stats is
+-- a primary-key lookup instead of fn_GetPlayerTotalPlaytime plus a SUM query.
+CREATE TABLE Player_Stats_Summary (
+    player_id INT PRIMARY KEY,
+    total_playtime DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    total_wins INT UNSIGNED NOT NULL DEFAULT 0,
+    total_losses INT UNSIGNED NOT NULL DEFAULT 0,
+    total_matches INT UNSIGNED NOT NULL DEFAULT 0,
+    win_rate DECIMAL(5, 2) NOT NULL DEFAULT 0.00,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (player_id) REFERENCES Players(player_id) ON DELETE CASCADE
+);
+
+DELIMITER //
+
+-- Assignments in ON DUPLICATE KEY UPDATE apply left to right, so win_rate
+-- sees the updated wins and matches.
+CREATE TRIGGER trg_UpdatePlayerSummary_After_PlayerGamesInsert
+AFTER INSERT ON Player_Games
+FOR EACH ROW
+BEGIN
+    INSERT INTO Player_Stats_Summary (player_id, total_playtime, total_wins, total_losses, total_matches, win_rate)
+    VALUES (
+        NEW.player_id,
+        NEW.playtime_hours,
+        NEW.wins,
+        NEW.losses,
+        NEW.matches_played,
+        IF(NEW.matches_played > 0, NEW.wins / NEW.matches_played * 100, 0)
+    )
+    ON DUPLICATE KEY UPDATE
+        total_playtime = total_playtime + NEW.playtime_hours,
+        total_wins = total_wins + NEW.wins,
+        total_losses = total_losses + NEW.losses,
+        total_matches = total_matches + NEW.matches_played,
+        win_rate = IF(total_matches > 0, total_wins / total_matches * 100, 0);
+END;
+//
+
+CREATE TRIGGER trg_UpdatePlayerSummary_After_PlayerGamesUpdate
+AFTER UPDATE ON Player_Games
+FOR EACH ROW
+BEGIN
+    UPDATE Player_Stats_Summary
+    SET
+        total_playtime = total_playtime + (NEW.playtime_hours - OLD.playtime_hours),
+        total_wins = total_wins + NEW.wins - OLD.wins,
+        total_losses = total_losses + NEW.losses - OLD.losses,
+        total_matches = total_matches + NEW.matches_played - OLD.matches_played,
+        win_rate = IF(total_matches > 0, total_wins / total_matches * 100, 0)
+    WHERE player_id = NEW.player_id;
+END;
+//
+
+CREATE TRIGGER trg_UpdatePlayerSummary_After_PlayerGamesDelete
+AFTER DELETE ON Player_Games
+FOR EACH ROW
+BEGIN
+    UPDATE Player_Stats_Summary
+    SET
+        total_playtime = total_playtime - OLD.playtime_hours,
+        total_wins = total_wins - OLD.wins,
+        total_losses = total_losses - OLD.losses,
+        total_matches = total_matches - OLD.matches_played,
+        win_rate = IF(total_matches > 0, total_wins / total_matches * 100, 0)
+    WHERE player_id = OLD.player_id;
+END;
+//
+
+-- Backfill / repair. Cascaded deletes from Games do not fire triggers, so run
+-- this after removing games as well as after the initial load.
+CREATE PROCEDURE sp_RebuildPlayerStatsSummary()
+BEGIN
+    DELETE FROM Player_Stats_Summary;
+
+    INSERT INTO Player_Stats_Summary (player_id, total_playtime, total_wins, total_losses, total_matches, win_rate)
+    SELECT
+        player_id,
+        SUM(playtime_hours),
+        SUM(wins),
+        SUM(losses),
+        SUM(matches_played),
+        IF(SUM(matches_played) > 0, SUM(wins) / SUM(matches_played) * 100, 0)
+    FROM Player_Games
+    GROUP BY player_id;
+END;
+//
+
+DELIMITER ;
+
+CALL sp_RebuildPlayerStatsSummary();
+
+
+-- Inventory filters: item_type, rarity and game_id are copied onto each
+-- inventory row so a filtered page is read in (player_id, filter, item_id)
+-- index order and stops at LIMIT instead of joining every owned item and sorting.
+ALTER TABLE Player_Inventories
+    ADD COLUMN game_id INT NULL,
+    ADD COLUMN item_type ENUM('Weapon', 'Armor', 'Cosmetic', 'Consumable') NULL,
+    ADD COLUMN rarity ENUM('Common', 'Uncommon', 'Rare', 'Epic', 'Legendary') NULL;
+
+UPDATE Player_Inventories pi
+JOIN Items i ON i.item_id = pi.item_id
+SET pi.game_id = i.game_id, pi.item_type = i.item_type, pi.rarity = i.rarity;
+
+CREATE INDEX idx_inventory_player_type ON Player_Inventories(player_id, item_type, item_id);
+CREATE INDEX idx_inventory_player_rarity ON Player_Inventories(player_id, rarity, item_id);
+CREATE INDEX idx_inventory_player_game ON Player_Inventories(player_id, game_id, item_id);
+
+DELIMITER //
+
+CREATE TRIGGER trg_CopyItemAttributes_Before_InventoryInsert
+BEFORE INSERT ON Player_Inventories
+FOR EACH ROW
+BEGIN
+    SELECT game_id, item_type, rarity
+    INTO NEW.game_id, NEW.item_type, NEW.rarity
+    FROM Items
+    WHERE item_id = NEW.item_id;
+END;
+//
+
+CREATE TRIGGER trg_SyncInventory_After_ItemsUpdate
+AFTER UPDATE ON Items
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.game_id <=> OLD.game_id AND NEW.item_type <=> OLD.item_type AND NEW.rarity <=> OLD.rarity) THEN
+        UPDATE Player_Inventories
+        SET game_id = NEW.game_id, item_type = NEW.item_type, rarity = NEW.rarity
+        WHERE item_id = NEW.item_id;
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+
+-- Declarative achievement conditions: the achievement is earned once the
+-- player's Player_Games value for stat in the achievement's game reaches
+-- threshold. The API evaluates them incrementally as matches are recorded.
+CREATE TABLE Achievement_Rules (
+    achievement_id INT PRIMARY KEY,
+    stat ENUM('wins', 'matches_played', 'playtime_hours', 'high_score') NOT NULL,
+    threshold DECIMAL(12, 2) NOT NULL,
+    FOREIGN KEY (achievement_id) REFERENCES Achievements(achievement_id) ON DELETE CASCADE
+);
+
+INSERT INTO Achievement_Rules (achievement_id, stat, threshold)
+SELECT achievement_id, 'wins', 1 FROM Achievements
+WHERE (game_id, name) IN ((2, 'First Win'), (9, 'Victory Royale'));
+
+DELIMITER //
+
+-- Set-based backfill for one rule (or every rule when p_achievement_id is
+-- NULL); run after adding a rule or after writing Player_Games outside the API.
+CREATE PROCEDURE sp_EvaluateAchievementRules(
+    IN p_achievement_id INT
+)
+BEGIN
+    INSERT IGNORE INTO Player_Achievements (player_id, achievement_id)
+    SELECT pg.player_id, r.achievement_id
+    FROM Achievement_Rules r
+    JOIN Achievements a ON a.achievement_id = r.achievement_id
+    JOIN Player_Games pg ON pg.game_id = a.game_id
+    WHERE (p_achievement_id IS NULL OR r.achievement_id = p_achievement_id)
+      AND CASE r.stat
+            WHEN 'wins' THEN pg.wins
+            WHEN 'matches_played' THEN pg.matches_played
+            WHEN 'playtime_hours' THEN pg.playtime_hours
+            WHEN 'high_score' THEN pg.high_score
+          END >= r.threshold;
+END;
+//
+
+DELIMITER ;
+
+CALL sp_EvaluateAchievementRules(NULL);
+
+
+-- One row per recorded match, append-only. Range-partitioned by month so old
+-- months are dropped or archived as whole partitions; partitioned InnoDB tables
+-- cannot carry foreign keys, and the partition column has to be part of the
+-- primary key. Monthly partitions are split off p_future by the
+-- maintain-match-history job (flask maintain-match-history, or
+-- POST /api/admin/match-history/maintain). Run it once right after loading this
+-- file: its first split copies every row already in p_future, later ones copy none.
+CREATE TABLE Match_History (
+    match_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    player_id INT NOT NULL,
+    game_id INT NOT NULL,
+    played_at DATETIME NOT NULL,
+    playtime_hours DECIMAL(10, 2) NOT NULL,
+    is_win BOOLEAN NOT NULL,
+    score INT UNSIGNED NOT NULL,
+    PRIMARY KEY (match_id, played_at),
+    KEY idx_match_history_player (player_id, played_at)
+)
+PARTITION BY RANGE COLUMNS (played_at) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+DROP PROCEDURE IF EXISTS sp_RecordMatchResult;
+
+DELIMITER //
+
+CREATE PROCEDURE sp_RecordMatchResult(
+    IN p_player_id INT,
+    IN p_game_id INT,
+    IN p_playtime_added DECIMAL(10, 2),
+    IN p_is_win BOOLEAN,
+    IN p_score INT
+)
+BEGIN
+    INSERT INTO Player_Games (
+        player_id, 
+        game_id, 
+        playtime_hours, 
+        last_played_date, 
+        wins, 
+        losses, 
+        matches_played, 
+        high_score
+    )
+    VALUES (
+        p_player_id, 
+        p_game_id, 
+        p_playtime_added, 
+        NOW(), 
+        IF(p_is_win, 1, 0), 
+        IF(p_is_win, 0, 1), 
+        1, 
+        p_score
+    )
+    ON DUPLICATE KEY UPDATE
+        playtime_hours = playtime_hours + VALUES(playtime_hours),
+        last_played_date = VALUES(last_played_date),
+        wins = wins + VALUES(wins),
+        losses = losses + VALUES(losses),
+        matches_played = matches_played + VALUES(matches_played),
+        high_score = GREATEST(high_score, VALUES(high_score));
+
+    INSERT INTO Match_History (player_id, game_id, played_at, playtime_hours, is_win, score)
+    VALUES (p_player_id, p_game_id, NOW(), p_playtime_added, p_is_win, p_score);
+END;
+//
+
+DELIMITER ;
+
+
+-- /api/games?sort=popular reads active games in popularity order from this
+-- index; popularity_score is recomputed from recent Match_History by the API.
+CREATE INDEX idx_games_popularity ON Games(is_active, popularity_score, game_id);
+
+-- Periodic jobs shared by every API process. A process claims a due run with
+-- FOR UPDATE SKIP LOCKED, so each run happens once; version only moves when a
+-- run changed data, and every process polls it to drop its cached results.
+CREATE TABLE Scheduled_Jobs (
+    job_name VARCHAR(50) PRIMARY KEY,
+    last_run_at DATETIME(6) NULL,
+    version INT UNSIGNED NOT NULL DEFAULT 0
+);
+
+INSERT INTO Scheduled_Jobs (job_name) VALUES ('popularity');
+
+
+-- Team aggregates, kept current by triggers: Player_Games changes are added to
+-- the player's team, and joining or leaving a team moves the member's totals.
+-- Team pages then read a handful of rows instead of grouping every member's
+-- Player_Games. Columns are signed because a departing member is subtracted.
+CREATE TABLE Team_Stats (
+    team_id INT PRIMARY KEY,
+    member_count INT NOT NULL DEFAULT 0,
+    total_wins BIGINT NOT NULL DEFAULT 0,
+    total_losses BIGINT NOT NULL DEFAULT 0,
+    total_matches BIGINT NOT NULL DEFAULT 0,
+    total_playtime DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    FOREIGN KEY (team_id) REFERENCES Teams(team_id) ON DELETE CASCADE
+);
+
+-- Per-game team totals; idx_team_game_wins ranks teams within a game.
+CREATE TABLE Team_Game_Stats (
+    team_id INT NOT NULL,
+    game_id INT NOT NULL,
+    wins BIGINT NOT NULL DEFAULT 0,
+    losses BIGINT NOT NULL DEFAULT 0,
+    matches BIGINT NOT NULL DEFAULT 0,
+    playtime DECIMAL(14, 2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (team_id, game_id),
+    KEY idx_team_game_wins (game_id, wins),
+    FOREIGN KEY (team_id) REFERENCES Teams(team_id) ON DELETE CASCADE,
+    FOREIGN KEY (game_id) REFERENCES Games(game_id) ON DELETE CASCADE
+);
+
+-- In buffered GAME_STATS_MODE the API sets @skip_team_stats_trigger around
+-- match writes and folds the per-team deltas in with the buffered Games deltas,
+-- so match transactions don't queue on a team's Team_Stats row.
+DELIMITER //
+
+-- Adds (p_sign = 1) or removes (p_sign = -1) one member's Player_Games totals.
+CREATE PROCEDURE sp_ApplyMemberToTeam(
+    IN p_player_id INT,
+    IN p_team_id INT,
+    IN p_sign INT
+)
+BEGIN
+    INSERT INTO Team_Stats (team_id, member_count, total_wins, total_losses, total_matches, total_playtime)
+    SELECT
+        p_team_id,
+        p_sign,
+        COALESCE(SUM(wins), 0) * p_sign,
+        COALESCE(SUM(losses), 0) * p_sign,
+        COALESCE(SUM(matches_played), 0) * p_sign,
+        COALESCE(SUM(playtime_hours), 0) * p_sign
+    FROM Player_Games
+    WHERE player_id = p_player_id
+    ON DUPLICATE KEY UPDATE
+        member_count = member_count + VALUES(member_count),
+        total_wins = total_wins + VALUES(total_wins),
+        total_losses = total_losses + VALUES(total_losses),
+        total_matches = total_matches + VALUES(total_matches),
+        total_playtime = total_playtime + VALUES(total_playtime);
+
+    INSERT INTO Team_Game_Stats (team_id, game_id, wins, losses, matches, playtime)
+    SELECT
+        p_team_id,
+        game_id,
+        CAST(wins AS SIGNED) * p_sign,
+        CAST(losses AS SIGNED) * p_sign,
+        CAST(matches_played AS SIGNED) * p_sign,
+        playtime_hours * p_sign
+    FROM Player_Games
+    WHERE player_id = p_player_id
+    ON DUPLICATE KEY UPDATE
+        wins = wins + VALUES(wins),
+        losses = losses + VALUES(losses),
+        matches = matches + VALUES(matches),
+        playtime = playtime + VALUES(playtime);
+END;
+//
+
+CREATE TRIGGER trg_UpdateTeamStats_After_PlayerGamesInsert
+AFTER INSERT ON Player_Games
+FOR EACH ROW
+BEGIN
+    DECLARE v_team_id INT;
+
+    IF @skip_team_stats_trigger IS NULL THEN
+        SELECT team_id INTO v_team_id FROM Players WHERE player_id = NEW.player_id;
+
+        IF v_team_id IS NOT NULL THEN
+            UPDATE Team_Stats
+            SET
+                total_wins = total_wins + NEW.wins,
+                total_losses = total_losses + NEW.losses,
+                total_matches = total_matches + NEW.matches_played,
+                total_playtime = total_playtime + NEW.playtime_hours
+            WHERE team_id = v_team_id;
+
+            INSERT INTO Team_Game_Stats (team_id, game_id, wins, losses, matches, playtime)
+            VALUES (v_team_id, NEW.game_id, NEW.wins, NEW.losses, NEW.matches_played, NEW.playtime_hours)
+            ON DUPLICATE KEY UPDATE
+                wins = wins + VALUES(wins),
+                losses = losses + VALUES(losses),
+                matches = matches + VALUES(matches),
+                playtime = playtime + VALUES(playtime);
+        END IF;
+    END IF;
+END;
+//
+
+CREATE TRIGGER trg_UpdateTeamStats_After_PlayerGamesUpdate
+AFTER UPDATE ON Player_Games
+FOR EACH ROW
+BEGIN
+    DECLARE v_team_id INT;
+
+    IF @skip_team_stats_trigger IS NULL THEN
+        SELECT team_id INTO v_team_id FROM Players WHERE player_id = NEW.player_id;
+
+        IF v_team_id IS NOT NULL THEN
+            UPDATE Team_Stats
+            SET
+                total_wins = total_wins + NEW.wins - OLD.wins,
+                total_losses = total_losses + NEW.losses - OLD.losses,
+                total_matches = total_matches + NEW.matches_played - OLD.matches_played,
+                total_playtime = total_playtime + (NEW.playtime_hours - OLD.playtime_hours)
+            WHERE team_id = v_team_id;
+
+            UPDATE Team_Game_Stats
+            SET
+                wins = wins + NEW.wins - OLD.wins,
+                losses = losses + NEW.losses - OLD.losses,
+                matches = matches + NEW.matches_played - OLD.matches_played,
+                playtime = playtime + (NEW.playtime_hours - OLD.playtime_hours)
+            WHERE team_id = v_team_id AND game_id = NEW.game_id;
+        END IF;
+    END IF;
+END;
+//
+
+CREATE TRIGGER trg_UpdateTeamStats_After_PlayerGamesDelete
+AFTER DELETE ON Player_Games
+FOR EACH ROW
+BEGIN
+    DECLARE v_team_id INT;
+    SELECT team_id INTO v_team_id FROM Players WHERE player_id = OLD.player_id;
+
+    IF v_team_id IS NOT NULL THEN
+        UPDATE Team_Stats
+        SET
+            total_wins = total_wins - OLD.wins,
+            total_losses = total_losses - OLD.losses,
+            total_matches = total_matches - OLD.matches_played,
+            total_playtime = total_playtime - OLD.playtime_hours
+        WHERE team_id = v_team_id;
+
+        UPDATE Team_Game_Stats
+        SET
+            wins = wins - OLD.wins,
+            losses = losses - OLD.losses,
+            matches = matches - OLD.matches_played,
+            playtime = playtime - OLD.playtime_hours
+        WHERE team_id = v_team_id AND game_id = OLD.game_id;
+    END IF;
+END;
+//
+
+CREATE TRIGGER trg_MoveTeamStats_After_PlayersUpdate
+AFTER UPDATE ON Players
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.team_id <=> NEW.team_id) THEN
+        IF OLD.team_id IS NOT NULL THEN
+            CALL sp_ApplyMemberToTeam(NEW.player_id, OLD.team_id, -1);
+        END IF;
+        IF NEW.team_id IS NOT NULL THEN
+            CALL sp_ApplyMemberToTeam(NEW.player_id, NEW.team_id, 1);
+        END IF;
+    END IF;
+END;
+//
+
+-- Runs before the cascade removes the member's Player_Games rows
+CREATE TRIGGER trg_RemoveTeamStats_Before_PlayersDelete
+BEFORE DELETE ON Players
+FOR EACH ROW
+BEGIN
+    IF OLD.team_id IS NOT NULL THEN
+        CALL sp_ApplyMemberToTeam(OLD.player_id, OLD.team_id, -1);
+    END IF;
+END;
+//
+
+-- Backfill / repair, like sp_RebuildPlayerStatsSummary.
+CREATE PROCEDURE sp_RebuildTeamStats()
+BEGIN
+    DELETE FROM Team_Game_Stats;
+    DELETE FROM Team_Stats;
+
+    INSERT INTO Team_Stats (team_id, member_count, total_wins, total_losses, total_matches, total_playtime)
+    SELECT
+        t.team_id,
+        COUNT(DISTINCT p.player_id),
+        COALESCE(SUM(pg.wins), 0),
+        COALESCE(SUM(pg.losses), 0),
+        COALESCE(SUM(pg.matches_played), 0),
+        COALESCE(SUM(pg.playtime_hours), 0)
+    FROM Teams t
+    LEFT JOIN Players p ON p.team_id = t.team_id
+    LEFT JOIN Player_Games pg ON pg.player_id = p.player_id
+    GROUP BY t.team_id;
+
+    INSERT INTO Team_Game_Stats (team_id, game_id, wins, losses, matches, playtime)
+    SELECT p.team_id, pg.game_id, SUM(pg.wins), SUM(pg.losses), SUM(pg.matches_played), SUM(pg.playtime_hours)
+    FROM Players p
+    JOIN Player_Games pg ON pg.player_id = p.player_id
+    WHERE p.team_id IS NOT NULL
+    GROUP BY p.team_id, pg.game_id;
+END;
+//
+
+DELIMITER ;
+
+CALL sp_RebuildTeamStats();
+
+
+-- Tokens revoked by logout, by SHA-256 digest. Every API process reloads the
+-- unexpired rows along with account statuses, so a logout holds on all workers
+-- and across restarts. Logout prunes rows whose token has expired anyway.
+CREATE TABLE Revoked_Tokens (
+    token_digest BINARY(32) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_revoked_tokens_expires (expires_at)
+);
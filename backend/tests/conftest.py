@@ -0,0 +1,6 @@
+import os
+import sys
+
+# app.py lives one level up and is imported as a top-level module, the way
+# `python app.py` and `uvicorn asgi:application` load it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,26 @@
+import threading
+
+import app as backend
+
+def test_crossed_rules():
+    index = {(2, 'wins'): ([1.0, 10.0, 50.0], [7, 8, 9])}
+    assert backend.crossed_rules(index, 2, 'wins', 0, 10) == [7, 8]
+    assert backend.crossed_rules(index, 2, 'wins', 10, 11) == []
+    assert backend.crossed_rules(index, 2, 'wins', 10, 10) == []
+    assert backend.crossed_rules(index, 3, 'wins', 0, 100) == []
+
+def test_reload_backfills_rules_changed_elsewhere(monkeypatch):
+    evaluated = []
+    done = threading.Event()
+    def evaluate(achievement_ids):
+        evaluated.append(sorted(achievement_ids))
+        done.set()
+    monkeypatch.setattr(backend, 'evaluate_achievement_rules', evaluate)
+    monkeypatch.setattr(backend, '_loaded_rules', None)
+    # The first load has nothing to compare against
+    backend.rules_reloaded({7: (2, 'wins', 1.0)})
+    backend.rules_reloaded({7: (2, 'wins', 1.0)})
+    assert evaluated == []
+    backend.rules_reloaded({7: (2, 'wins', 1.0), 8: (2, 'wins', 10.0)})
+    assert done.wait(5)
+    assert evaluated == [[8]]
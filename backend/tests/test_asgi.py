@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import asgi
+
+def http_scope(path, method='POST'):
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+            'headers': [], 'http_version': '1.1', 'root_path': ''}
+
+async def call(path, method='POST'):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.application(http_scope(path, method), receive, send)
+    return sent[0]['status']
+
+def test_delegated_requests_run_concurrently(monkeypatch):
+    # Each request waits for the other to be in flight too, so serving them
+    # one at a time breaks the barrier instead of returning
+    both_running = threading.Barrier(2, timeout=2)
+
+    def slow_app(environ, start_response):
+        both_running.wait()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    monkeypatch.setattr(asgi, 'wsgi_app', asgi.ThreadedWsgiToAsgi(slow_app))
+
+    async def both():
+        return await asyncio.gather(call('/api/auth/login'), call('/api/games/match'))
+
+    assert asyncio.run(both()) == [200, 200]
+
+class FakePool:
+    maxsize, size, freesize = 10, 1, 1
+
+def test_native_routes_record_request_metrics(monkeypatch):
+    async def select_one(sql, params, one=False, reader=None):
+        asgi.record_phase('db_execute', 0.002)
+        return {'1': 1}
+
+    monkeypatch.setattr(asgi, 'pool', FakePool())
+    monkeypatch.setattr(asgi, 'fetch', select_one)
+    before = asgi.request_seconds._series.get(('/api/health', 'GET', '200'), [None, 0.0, 0])[2]
+    assert asyncio.run(call('/api/health', 'GET')) == 200
+    assert asgi.request_seconds._series[('/api/health', 'GET', '200')][2] == before + 1
+    phases = {labels[1] for labels in asgi.phase_seconds._series if labels[0] == '/api/health'}
+    assert {'db_execute', 'serialize'} <= phases
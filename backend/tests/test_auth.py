@@ -0,0 +1,125 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from mysql.connector import Error, errorcode
+
+import app as backend
+
+def make_token(player_id):
+    return jwt.encode({'player_id': player_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                      backend.app.config['SECRET_KEY'], algorithm='HS256')
+
+def no_database(primary=False):
+    raise AssertionError('unexpected database access')
+
+def test_authenticate_without_status_refresh(monkeypatch):
+    # The async app refreshes statuses on a worker thread first, so this path must not query
+    monkeypatch.setattr(backend, 'get_db_connection', no_database)
+    statuses = backend.AccountStatusSet(60)
+    monkeypatch.setattr(backend, 'account_statuses', statuses)
+    assert statuses.stale()
+    assert backend.authenticate_token(make_token(41), refresh_statuses=False) == (41, None)
+    statuses.set_status(41, 'banned')
+    assert backend.authenticate_token(make_token(41), refresh_statuses=False) == (None, ('Account is banned', 403))
+
+class Cursor:
+    # Players' non-active statuses and Revoked_Tokens as another process left them
+    def __init__(self, revoked):
+        self.revoked = revoked
+        self.rows = []
+
+    def execute(self, sql):
+        if 'Revoked_Tokens' in sql:
+            self.rows = [{'token_digest': bytearray(d), 'expires_at': e} for d, e in self.revoked.items()]
+        else:
+            self.rows = [{'player_id': 7, 'account_status': 'suspended'}]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+def database(revoked):
+    class Connection:
+        def __init__(self, primary=False):
+            assert primary
+
+        def cursor(self, dictionary=False):
+            return Cursor(revoked)
+
+        def close(self):
+            pass
+    return Connection
+
+def test_refresh_loads_statuses(monkeypatch):
+    monkeypatch.setattr(backend, 'get_db_connection', database({}))
+    statuses = backend.AccountStatusSet(60)
+    statuses.refresh_if_stale()
+    assert not statuses.stale()
+    assert statuses.status(7) == 'suspended'
+    monkeypatch.setattr(backend, 'get_db_connection', no_database)
+    assert statuses.status(8) is None
+
+def test_refresh_loads_revocations_from_other_processes(monkeypatch):
+    other_logout = backend.token_digest(make_token(5))
+    own_logout = backend.token_digest(make_token(6))
+    monkeypatch.setattr(backend, 'get_db_connection', database({other_logout: time.time() + 3600}))
+    statuses = backend.AccountStatusSet(60)
+    # Revoked here while the reload was reading: the reload must not drop it
+    statuses.revoke(own_logout, time.time() + 3600)
+    statuses.refresh_if_stale()
+    assert statuses.is_revoked(other_logout) and statuses.is_revoked(own_logout)
+
+class SignupCursor:
+    def __init__(self, existing, duplicate_insert=False):
+        self.existing = existing
+        self.duplicate_insert = duplicate_insert
+        self.result = None
+        self.lastrowid = 12
+
+    def execute(self, sql, params=()):
+        if sql.startswith('SELECT'):
+            self.result = {'1': 1} if params[0] in self.existing else None
+        elif self.duplicate_insert:
+            raise Error(msg='Duplicate entry', errno=errorcode.ER_DUP_ENTRY)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+def signup_database(cursor):
+    class Connection:
+        def __init__(self, primary=False):
+            pass
+
+        def cursor(self, dictionary=False):
+            return cursor
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+    return Connection
+
+def signup(monkeypatch, cursor):
+    hashed = []
+    monkeypatch.setattr(backend, 'get_db_connection', signup_database(cursor))
+    monkeypatch.setattr(backend.password_hasher, 'hash', lambda password: hashed.append(password) or 'hash')
+    body = {'username': 'taken', 'email': 'taken@example.com', 'password': 'hunter22'}
+    with backend.app.test_request_context('/api/auth/signup', method='POST', json=body):
+        response, status = backend.signup()
+    return status, hashed
+
+def test_duplicate_signup_skips_bcrypt(monkeypatch):
+    assert signup(monkeypatch, SignupCursor({'taken'})) == (409, [])
+
+def test_signup_race_on_unique_key_is_a_conflict(monkeypatch):
+    assert signup(monkeypatch, SignupCursor(set(), duplicate_insert=True)) == (409, ['hunter22'])
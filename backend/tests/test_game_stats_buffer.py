@@ -0,0 +1,64 @@
+import app as backend
+
+class FakeConnection:
+    def cursor(self, dictionary=False):
+        return self
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_match_team_deltas_skip_players_without_a_team():
+    aggregates = {(1, 7): [2.5, 1, 0, 1, 900], (2, 7): [1.0, 0, 2, 2, 100], (3, 7): [4.0, 3, 0, 3, 50]}
+    assert backend.match_team_deltas(aggregates, {1: 10, 2: 10}) == {(10, 7): [1, 2, 3, 3.5]}
+
+def test_flush_drops_deltas_from_before_a_reconcile(monkeypatch):
+    applied = {}
+    monkeypatch.setattr(backend, 'get_db_connection', FakeConnection)
+    monkeypatch.setattr(backend, 'game_stats_generation', lambda cursor: 4)
+    monkeypatch.setattr(backend, 'update_game_totals', lambda cursor, per_game: applied.update(games=per_game))
+    monkeypatch.setattr(backend, 'update_team_totals', lambda cursor, per_team: applied.update(teams=per_team))
+    buffer = backend.GameStatsBuffer()
+    monkeypatch.setattr(buffer, '_ensure_flusher', lambda: None)
+    # Generation 3 deltas are already counted in the totals the reconcile rebuilt
+    buffer.add(3, 7, 5.0, 1, 900)
+    buffer.add_team(3, 10, 7, 1, 0, 1, 5.0)
+    buffer.add(4, 7, 1.5, 1, 100)
+    buffer.add(4, 7, 2.0, 1, 300)
+    buffer.add_team(4, 10, 7, 0, 1, 1, 1.5)
+    buffer.add_team(4, 10, 7, 1, 0, 1, 2.0)
+    assert buffer.pending() == 4
+    assert buffer.flush() == 2
+    assert applied == {'games': {7: [3.5, 2, 300]}, 'teams': {(10, 7): [1, 1, 2, 3.5]}}
+    assert buffer.pending() == 0
+
+def test_failed_flush_keeps_deltas(monkeypatch):
+    monkeypatch.setattr(backend, 'get_db_connection', lambda: None)
+    buffer = backend.GameStatsBuffer()
+    monkeypatch.setattr(buffer, '_ensure_flusher', lambda: None)
+    buffer.add(1, 7, 1.0, 1, 10)
+    buffer.add_team(1, 10, 7, 1, 0, 1, 1.0)
+    assert buffer.flush() == 0
+    assert buffer.drain() == ({(1, 7): [1.0, 1, 10]}, {(1, 10, 7): [1, 0, 1, 1.0]})
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+
+def test_player_games_rows_are_written_in_key_order(monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'GAME_STATS_MODE', 'trigger')
+    monkeypatch.setitem(backend.app.config, 'BULK_INSERT_CHUNK', 2)
+    cursor = RecordingCursor()
+    aggregates = {(2, 1): [1.0, 1, 0, 1, 10], (1, 9): [1.0, 0, 1, 1, 5], (1, 3): [2.0, 1, 0, 1, 7]}
+    backend.apply_match_aggregates(cursor, aggregates)
+    keys = [tuple(params[i:i + 2]) for sql, params in cursor.statements
+            if 'INTO Player_Games' in sql for i in range(0, len(params), 7)]
+    assert keys == [(1, 3), (1, 9), (2, 1)]
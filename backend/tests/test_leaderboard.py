@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from app import IndexableSkipList, Leaderboard, LeaderboardRegistry, app
+
+def test_skip_list_matches_sorted_list():
+    rng = random.Random(7)
+    skip = IndexableSkipList()
+    expected = []
+    for _ in range(2000):
+        key = rng.randrange(500)
+        if key in expected and rng.random() < 0.5:
+            skip.remove(key)
+            expected.remove(key)
+        elif key not in expected:
+            skip.insert(key, f'v{key}')
+            expected.append(key)
+            expected.sort()
+    assert len(skip) == len(expected)
+    for position, key in enumerate(expected):
+        assert skip.rank(key) == position
+    assert skip.slice(0, len(expected)) == [f'v{key}' for key in expected]
+    assert skip.slice(10, 5) == [f'v{key}' for key in expected[10:15]]
+
+def test_skip_list_slice_bounds():
+    skip = IndexableSkipList()
+    for key in range(5):
+        skip.insert(key, key)
+    assert skip.slice(3, 10) == [3, 4]
+    assert skip.slice(5, 1) == []
+    assert skip.slice(0, 0) == []
+
+def test_skip_list_missing_keys():
+    skip = IndexableSkipList()
+    skip.insert(1, 'a')
+    with pytest.raises(KeyError):
+        skip.rank(2)
+    with pytest.raises(KeyError):
+        skip.remove(2)
+
+def entry(player_id, wins, high_score=0, playtime_hours=0.0):
+    return {'player_id': player_id, 'username': f'p{player_id}', 'wins': wins,
+            'high_score': high_score, 'playtime_hours': playtime_hours}
+
+def test_leaderboard_upsert_moves_player():
+    board = Leaderboard('wins')
+    for player_id, wins in ((1, 5), (2, 9), (3, 7)):
+        board.upsert(entry(player_id, wins))
+    board.upsert(entry(1, 10))
+    total, entries = board.page(0, 10)
+    assert total == 3
+    assert [(e['rank'], e['player_id']) for e in entries] == [(1, 1), (2, 2), (3, 3)]
+
+def test_leaderboard_ties_break_on_player_id():
+    board = Leaderboard('high_score')
+    board.upsert(entry(4, 1, high_score=100))
+    board.upsert(entry(2, 1, high_score=100))
+    _, entries = board.page(0, 2)
+    assert [e['player_id'] for e in entries] == [2, 4]
+
+def test_leaderboard_around():
+    board = Leaderboard('wins')
+    for player_id in range(1, 11):
+        board.upsert(entry(player_id, player_id))
+    total, rank, neighbours = board.around(5, 2)
+    assert (total, rank) == (10, 6)
+    assert [e['player_id'] for e in neighbours] == [7, 6, 5, 4, 3]
+    assert board.around(99, 2) == (10, None, [])
+
+class FakeCursor:
+    # Answers the registry's queries from an in-memory Player_Games whose
+    # last_played_date is a plain counter standing in for NOW()
+    def __init__(self, rows):
+        self.rows = rows
+        self.now = 100
+        self.result = []
+        self.scans = []
+
+    def execute(self, sql, params=()):
+        if 'FROM Games' in sql:
+            self.result = [{'1': 1}] if params[0] in {row['game_id'] for row in self.rows} else []
+        elif 'NOW()' in sql:
+            self.result = [{'sync_from': self.now - params[0]}]
+        elif 'pg.game_id = %s' in sql:
+            self.scans.append(('game', params[0]))
+            self.result = [row for row in self.rows if row['game_id'] == params[0]]
+        elif 'last_played_date >= %s' in sql:
+            self.scans.append(('changed since', params[0]))
+            self.result = [row for row in self.rows if row['last_played_date'] >= params[0]]
+        else:
+            pairs = set(zip(params[::2], params[1::2]))
+            self.result = [row for row in self.rows if (row['player_id'], row['game_id']) in pairs]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+def row(player_id, game_id, wins, last_played_date=0):
+    return {'player_id': player_id, 'game_id': game_id, 'username': f'p{player_id}',
+            'wins': wins, 'high_score': 0, 'playtime_hours': 0, 'last_played_date': last_played_date}
+
+def test_registry_refresh_accepts_string_game_ids():
+    cursor = FakeCursor([row(1, 7, 3), row(2, 7, 5)])
+    registry = LeaderboardRegistry()
+    board = registry.get(cursor, 7, 'wins')
+    cursor.rows[0]['wins'] = 9
+    registry.refresh(cursor, [(1, '7')])
+    assert [e['player_id'] for e in board.page(0, 2)[1]] == [1, 2]
+
+def test_registry_builds_every_metric_from_one_scan():
+    cursor = FakeCursor([row(1, 7, 3)])
+    registry = LeaderboardRegistry()
+    boards = [registry.get(cursor, 7, metric) for metric in ('wins', 'high_score', 'playtime')]
+    assert len({id(board) for board in boards}) == 3
+    assert cursor.scans == [('game', 7)]
+
+def test_registry_syncs_only_changed_rows(monkeypatch):
+    cursor = FakeCursor([row(1, 7, 3), row(3, 8, 1)])
+    registry = LeaderboardRegistry()
+    board = registry.get(cursor, 7, 'wins')
+    monkeypatch.setitem(app.config, 'LEADERBOARD_RESYNC_INTERVAL', 0.001)
+    # A match recorded by another process only shows up after the sync
+    cursor.now = 200
+    cursor.rows.append(row(2, 7, 5, last_played_date=150))
+    registry._synced_at -= 1
+    assert registry.get(cursor, 7, 'wins') is board
+    assert board.page(0, 10)[0] == 2
+    # The sync re-read rows changed since the build (less the overlap), not the game
+    overlap = LeaderboardRegistry.SYNC_OVERLAP
+    assert cursor.scans == [('game', 7), ('changed since', 100 - overlap)]
+    registry._synced_at -= 1
+    registry.get(cursor, 7, 'wins')
+    assert cursor.scans[-1] == ('changed since', 200 - overlap)
+
+def test_registry_unknown_game():
+    assert LeaderboardRegistry().get(FakeCursor([]), 7, 'wins') is None
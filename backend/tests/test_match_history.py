@@ -0,0 +1,67 @@
+from datetime import date
+
+import pytest
+from mysql.connector import Error
+
+import app as backend
+
+class FakeCursor:
+    # Match_History with one expired month, p202001, and what an earlier run
+    # left of its archive table
+    def __init__(self, archive_partitioned=False, archive_rows=False, partition_rows=True):
+        self.archive_partitioned = archive_partitioned
+        self.archive_rows = archive_rows
+        self.partition_rows = partition_rows
+        self.statements = []
+        self.result = None
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        self.statements.append(sql)
+        if 'PARTITION_NAME AS name' in sql:
+            self.result = [{'name': 'p202001'}, {'name': f'p{date.today():%Y%m}'}, {'name': 'p_future'}]
+        elif 'COUNT(*) AS partitions' in sql:
+            self.result = [{'partitions': 2 if self.archive_partitioned else 0}]
+        elif 'PARTITION (p202001)' in sql:
+            self.result = [{'has_rows': self.partition_rows}]
+        elif 'EXISTS' in sql:
+            self.result = [{'has_rows': self.archive_rows}]
+        elif 'EXCHANGE PARTITION' in sql:
+            self.archive_rows, self.partition_rows = self.partition_rows, self.archive_rows
+        elif 'REMOVE PARTITIONING' in sql:
+            self.archive_partitioned = False
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+def maintain(cursor):
+    return backend.maintain_match_history(cursor, retention_months=1, months_ahead=0, archive=True)
+
+def ddl(cursor):
+    return [s for s in cursor.statements if s.startswith(('CREATE', 'ALTER'))]
+
+def test_archives_expired_month():
+    cursor = FakeCursor(archive_partitioned=True)
+    assert maintain(cursor)['archived'] == ['p202001']
+    assert ddl(cursor) == [
+        'CREATE TABLE IF NOT EXISTS Match_History_Archive_202001 LIKE Match_History',
+        'ALTER TABLE Match_History_Archive_202001 REMOVE PARTITIONING',
+        'ALTER TABLE Match_History EXCHANGE PARTITION p202001 WITH TABLE Match_History_Archive_202001',
+        'ALTER TABLE Match_History DROP PARTITION p202001'
+    ]
+
+def test_rerun_after_exchange_only_drops_the_partition():
+    cursor = FakeCursor(archive_rows=True, partition_rows=False)
+    maintain(cursor)
+    assert not any('EXCHANGE' in s or 'REMOVE PARTITIONING' in s for s in cursor.statements)
+    assert ddl(cursor)[-1] == 'ALTER TABLE Match_History DROP PARTITION p202001'
+    assert cursor.archive_rows
+
+def test_refuses_to_mix_archive_and_live_rows():
+    cursor = FakeCursor(archive_rows=True, partition_rows=True)
+    with pytest.raises(Error):
+        maintain(cursor)
+    assert not any('DROP PARTITION' in s for s in cursor.statements)
@@ -0,0 +1,55 @@
+import logging
+
+import app as backend
+from app import Histogram, app, record_statement, statement_label
+
+def test_statement_label_collapses_whitespace():
+    assert statement_label("""
+        SELECT player_id
+        FROM   Players
+        WHERE  username = %s
+    """) == 'SELECT player_id FROM Players WHERE username = %s'
+
+def test_statement_label_collapses_in_lists():
+    short = statement_label('SELECT game_id FROM Games WHERE game_id IN (%s, %s)')
+    long = statement_label('SELECT game_id FROM Games WHERE game_id IN (%s, %s, %s, %s, %s)')
+    assert short == long == 'SELECT game_id FROM Games WHERE game_id IN (%s, ...)'
+
+def test_statement_label_collapses_multi_row_values():
+    one = statement_label('INSERT INTO Match_History VALUES (%s, %s, %s), (%s, %s, %s)')
+    many = statement_label('INSERT INTO Match_History VALUES ' + ', '.join(['(%s, %s, %s)'] * 50))
+    assert one == many == 'INSERT INTO Match_History VALUES (%s, ...), ...'
+
+def test_statement_label_keeps_single_placeholders():
+    assert statement_label('SELECT 1 FROM t WHERE a = %s AND b = %s') == 'SELECT 1 FROM t WHERE a = %s AND b = %s'
+
+def test_statement_label_is_truncated():
+    assert len(statement_label('SELECT ' + ', '.join(f'column_{i}' for i in range(100)) + ' FROM t')) == 160
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', 'Test.', ('route',), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(seconds, '/api/x')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/api/x",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/api/x",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{route="/api/x",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{route="/api/x"} 4' in lines
+
+def test_slow_statements_are_logged(monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'SLOW_QUERY_MS', 100)
+    with caplog.at_level(logging.WARNING, logger='app.slow_query'):
+        record_statement('SELECT 1 FROM Players', 'execute', 0.05, route='/api/fast')
+        record_statement('SELECT 2 FROM Players', 'execute', 0.25, route='/api/slow')
+    [record] = caplog.records
+    assert record.route == '/api/slow' and record.statement == 'SELECT 2 FROM Players'
+    assert record.duration_ms == 250
+
+def test_metrics_export_prepared_statement_cache(monkeypatch):
+    monkeypatch.setitem(app.config, 'POPULARITY_POLL_INTERVAL', 0)
+    pool = backend.get_pool()
+    pool.count_prepared(hit=True)
+    hits = pool.stats()['prepared_hits']
+    body = app.test_client().get('/api/metrics').get_data(as_text=True)
+    assert f'api_db_prepared_statements_total{{pool="primary",result="hit"}} {hits}' in body
+    assert 'api_db_prepared_statements_total{pool="primary",result="miss"}' in body
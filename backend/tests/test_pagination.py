@@ -0,0 +1,66 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import app as backend
+from app import app, dashboard_response_body, decode_cursor, encode_cursor, page_args, split_page
+
+def test_cursor_round_trip():
+    values = [12, 'ShadowDragon']
+    token = encode_cursor(values)
+    assert token.isascii() and '/' not in token and '+' not in token
+    assert decode_cursor(token) == values
+
+def test_cursor_encodes_sort_keys_as_strings():
+    # DECIMAL and DATETIME sort keys go back into SQL as strings, which MySQL compares correctly
+    token = encode_cursor([Decimal('12.50'), datetime(2024, 5, 1, 12, 30)])
+    assert decode_cursor(token) == ['12.50', '2024-05-01 12:30:00']
+
+@pytest.mark.parametrize('token', ['not base64!', encode_cursor({'a': 1}).rstrip('='), 'bm90IGpzb24='])
+def test_invalid_cursors(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+def test_cursor_must_be_a_list():
+    import base64
+    token = base64.urlsafe_b64encode(b'{"a": 1}').decode('ascii')
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+def test_page_args_defaults_and_clamps():
+    with app.test_request_context('/?limit=100000'):
+        assert page_args(1) == (app.config['PAGE_SIZE_MAX'], None)
+    with app.test_request_context('/?limit=0'):
+        assert page_args(1) == (1, None)
+    with app.test_request_context('/'):
+        assert page_args(1) == (app.config['PAGE_SIZE_DEFAULT'], None)
+
+def test_page_args_checks_cursor_length():
+    token = encode_cursor([1, 2])
+    with app.test_request_context(f'/?after={token}'):
+        assert page_args(2) == (app.config['PAGE_SIZE_DEFAULT'], [1, 2])
+        with pytest.raises(ValueError):
+            page_args(1)
+
+def test_split_page():
+    rows = [{'id': i} for i in range(4)]
+    assert split_page(rows[:3], 3, lambda r: [r['id']]) == (rows[:3], None)
+    page, token = split_page(rows, 3, lambda r: [r['id']])
+    assert page == rows[:3] and decode_cursor(token) == [2]
+
+def test_dashboard_pages_list_sections(monkeypatch):
+    monkeypatch.setitem(app.config, 'PAGE_SIZE_DEFAULT', 2)
+    friends = [{'player_id': i} for i in (3, 5, 9)]
+    body = dashboard_response_body({'friends': friends, 'friend_requests': friends, 'characters': []})
+    assert body['friends'] == friends[:2]
+    assert body['friend_requests'] == friends
+    assert body['characters'] == []
+    assert {name: decode_cursor(token) for name, token in body['next_cursors'].items()} == {'friends': [5]}
+
+@pytest.mark.parametrize('after', [['7'], [[7]], [None]])
+def test_friends_rejects_non_integer_cursor(monkeypatch, after):
+    monkeypatch.setattr(backend, 'get_db_connection', lambda primary=False: pytest.fail('queried with a bad cursor'))
+    with app.test_request_context(f'/api/friends?after={encode_cursor(after)}'):
+        response, status = backend.get_friends.__wrapped__(1)
+        assert status == 400 and response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,117 @@
+from mysql.connector import Error
+
+import app as backend
+from app import POPULARITY_SIGNALS, POPULARITY_WINDOWS
+
+def test_weights_sum_to_one():
+    # Scores top out at 100 only if every window and signal share adds up
+    assert abs(sum(weight for _, weight in POPULARITY_WINDOWS) - 1) < 1e-9
+    assert abs(sum(share for _, share in POPULARITY_SIGNALS) - 1) < 1e-9
+
+class JobRow:
+    # The shared 'popularity' row in Scheduled_Jobs. due is False while the
+    # last run is recent or another process holds the row locked.
+    def __init__(self, due=True, version=0, changed_games=0, fail=False):
+        self.due = due
+        self.version = version
+        self.changed_games = changed_games
+        self.fail = fail
+        self.runs = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+class FakeJobCursor:
+    def __init__(self, job):
+        self.job = job
+        self.rowcount = 0
+        self.result = None
+
+    def execute(self, sql, params=()):
+        if 'SKIP LOCKED' in sql:
+            self.result = {'job_name': 'popularity'} if self.job.due else None
+        elif 'FOR UPDATE' in sql:
+            self.result = {'job_name': 'popularity'}
+        elif sql.lstrip().startswith('UPDATE Games'):
+            if self.job.fail:
+                raise Error(msg='Lock wait timeout exceeded')
+            self.job.runs += 1
+            self.rowcount = self.job.changed_games
+        elif sql.lstrip().startswith('UPDATE Scheduled_Jobs'):
+            self.job.version += params[0]
+            self.job.due = False
+        else:
+            self.result = {'version': self.job.version}
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+class FakeJobConnection:
+    def __init__(self, job):
+        self.job = job
+
+    def cursor(self, dictionary=False):
+        return FakeJobCursor(self.job)
+
+    def commit(self):
+        self.job.commits += 1
+
+    def rollback(self):
+        self.job.rollbacks += 1
+
+    def close(self):
+        pass
+
+def setup(monkeypatch, job):
+    invalidations = []
+    monkeypatch.setattr(backend, 'get_db_connection', lambda primary=False: FakeJobConnection(job))
+    monkeypatch.setattr(backend, 'invalidate_games_cache', lambda: invalidations.append(job.version))
+    return invalidations
+
+def test_process_that_cannot_claim_the_row_skips_the_run(monkeypatch):
+    job = JobRow(due=False, version=3)
+    invalidations = setup(monkeypatch, job)
+    process = backend.PopularityJob()
+    assert process.run_once() is None
+    assert job.runs == 0 and job.version == 3 and process.last_run is None
+    # It still adopts the current version, dropping whatever it had cached
+    assert process.version == 3 and invalidations == [3]
+
+def test_claimed_run_bumps_the_version_only_when_scores_changed(monkeypatch):
+    job = JobRow(version=4)
+    invalidations = setup(monkeypatch, job)
+    process = backend.PopularityJob()
+    process.version = 4
+    assert process.run_once() == 0
+    assert job.runs == 1 and job.version == 4 and invalidations == []
+    job.due, job.changed_games = True, 7
+    assert process.run_once() == 7
+    assert job.runs == 2 and job.version == 5 and invalidations == [5]
+    # Not due again until the interval passes
+    assert process.run_once() is None and job.runs == 2
+
+def test_every_process_invalidates_after_another_ran(monkeypatch):
+    job = JobRow(changed_games=2)
+    invalidations = setup(monkeypatch, job)
+    runner, other = backend.PopularityJob(), backend.PopularityJob()
+    runner.version = other.version = 0
+    assert runner.run_once() == 2
+    assert other.run_once() is None
+    assert job.runs == 1 and invalidations == [1, 1]
+
+def test_forced_run_ignores_the_schedule(monkeypatch):
+    job = JobRow(due=False, changed_games=1)
+    setup(monkeypatch, job)
+    assert backend.PopularityJob().run_once(force=True) == 1
+    assert job.runs == 1
+
+def test_failed_run_rolls_back_and_keeps_the_cache(monkeypatch):
+    job = JobRow(fail=True)
+    invalidations = setup(monkeypatch, job)
+    process = backend.PopularityJob()
+    process.version = 0
+    assert process.run_once() is None
+    assert job.rollbacks == 1 and job.commits == 0
+    assert 'Lock wait timeout' in process.last_error and invalidations == []
@@ -0,0 +1,72 @@
+import pytest
+from mysql.connector import Error
+
+import app as backend
+
+class FakePreparedCursor:
+    # Mirrors the connector: it re-prepares unless handed the very string object it last prepared
+    def __init__(self, raw):
+        self.raw = raw
+        self._executed = None
+        self.column_names = ('value',)
+        self.closed = False
+
+    def execute(self, operation, params=None):
+        if operation is not self._executed:
+            self._executed = operation
+            self.raw.prepares += 1
+        if params and params[0] == 'fail':
+            self._executed = None
+            raise Error(msg='statement failed')
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        self.closed = True
+
+class FakeRawConnection:
+    def __init__(self):
+        self.prepares = 0
+        self.cursors = []
+
+    def cursor(self, prepared=False, **kwargs):
+        cursor = FakePreparedCursor(self)
+        if prepared:
+            self.cursors.append(cursor)
+        return cursor
+
+@pytest.fixture
+def connection():
+    pool = backend.ConnectionPool(1, 1, 0, 0, prepared_cache_size=2)
+    return pool, backend.PooledConnection(pool, backend._PoolEntry(FakeRawConnection()))
+
+def page_sql(limit):
+    # Built per call, like the keyset page queries: equal text, a new object each time
+    return 'SELECT value FROM t {limit}'.format(limit=limit)
+
+def test_equal_sql_reuses_the_prepared_statement(connection):
+    pool, pooled = connection
+    cursor = pooled.cursor()
+    for _ in range(3):
+        assert backend.fetch_prepared(cursor, page_sql('LIMIT %s'), (5,)) == [{'value': 1}]
+    assert pooled._entry.raw.prepares == 1
+    stats = pool.stats()
+    assert (stats['prepared_hits'], stats['prepared_misses']) == (2, 1)
+
+def test_failed_execute_is_not_counted_as_reuse(connection):
+    pool, pooled = connection
+    cursor = pooled.cursor()
+    with pytest.raises(Error):
+        backend.fetch_prepared(cursor, page_sql('LIMIT %s'), ('fail',))
+    assert pooled._entry.raw.cursors[0].closed
+    backend.fetch_prepared(cursor, page_sql('LIMIT %s'), (5,))
+    assert pool.stats()['prepared_misses'] == 2
+
+def test_least_recently_used_statement_is_closed(connection):
+    pool, pooled = connection
+    cursor = pooled.cursor()
+    for sql in ('SELECT 1', 'SELECT 2', 'SELECT 1', 'SELECT 3'):
+        backend.fetch_prepared(cursor, sql, ())
+    assert list(pooled._entry.statements) == ['SELECT 1', 'SELECT 3']
+    assert pooled._entry.raw.cursors[1].closed
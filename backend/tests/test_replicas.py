@@ -0,0 +1,77 @@
+import time
+
+import app as backend
+
+class FakeCursor:
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        pass
+
+class FakePooled:
+    def __init__(self, replica):
+        self.replica = replica
+
+    def cursor(self, dictionary=False):
+        return FakeCursor('primary')
+
+    def close(self):
+        pass
+
+def replica_cursor(replica):
+    cursor = FakeCursor('request')
+    cursor.pooled_connection = FakePooled(replica)
+    return cursor
+
+def test_cache_refills_leave_replicas(monkeypatch):
+    requested = []
+    monkeypatch.setattr(backend, 'get_db_connection', lambda primary=False: requested.append(primary) or FakePooled(False))
+    loader = lambda cursor, player_id: (cursor.name, player_id)
+    assert backend.on_primary(replica_cursor(True), loader, 4) == ('primary', 4)
+    assert backend.on_primary(None, loader, 4) == ('primary', 4)
+    assert requested == [True, True]
+    # A cursor already on the primary is reused
+    assert backend.on_primary(replica_cursor(False), loader, 4) == ('request', 4)
+    assert len(requested) == 2
+
+def test_replica_addresses(monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'DB_REPLICAS', 'db-a:3307, db-b ,')
+    assert backend.replica_addresses() == [('db-a', 3307), ('db-b', 3306)]
+
+class FakePool:
+    def __init__(self, replica, opened):
+        self.replica = replica
+        self.opened = opened
+
+    def acquire(self):
+        self.opened.append(self.replica)
+        return FakePooled(self.replica)
+
+def test_dashboard_sections_read_from_replicas(monkeypatch):
+    opened = []
+    monkeypatch.setattr(backend, 'get_pool', lambda: FakePool(False, opened))
+    monkeypatch.setattr(backend, 'get_replica_pools', lambda: [FakePool(True, opened)])
+    monkeypatch.setitem(backend.app.config, 'DASHBOARD_WORKERS', 4)
+    loader = lambda cursor, player_id: []
+    monkeypatch.setattr(backend, 'DASHBOARD_SECTIONS', {'stats': loader, 'characters': loader})
+    with backend.app.test_request_context('/api/dashboard'):
+        backend.g.current_user_id = 7
+        assert backend.get_dashboard.__wrapped__(7)[1] == 200
+        # Both section threads saw the GET request and timed their connects into it
+        assert opened == [True, True]
+        assert 'db_connect' in backend.g.timings
+
+def test_last_write_header_pins_reads_on_any_worker(monkeypatch):
+    monkeypatch.setitem(backend.app.config, 'READ_YOUR_WRITES_WINDOW', 5)
+    for last_write, replica in ((time.time() - 1, False), (time.time() - 60, True),
+                                (time.time() + 3600, True), ('soon', True)):
+        with backend.app.test_request_context('/api/games/player', headers={'X-Last-Write': str(last_write)}):
+            backend.g.current_user_id = 99
+            assert backend._use_replica() is replica
+
+def test_writes_return_last_write_header():
+    with backend.app.test_request_context('/api/characters', method='POST'):
+        backend.g.current_user_id = 98
+        response = backend.remember_writes(backend.app.response_class('{}', status=201))
+        assert backend.wrote_within_window(response.headers['X-Last-Write'])
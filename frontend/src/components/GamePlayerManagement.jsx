@@ -3,6 +3,10 @@ import { User, Users, Gamepad2, Trophy, Package, UserPlus, LogOut, Home, BarChar
 
 const API_URL = 'http://localhost:5000/api';
 
+// Time of this client's last successful write, as given by the API. Sending it
+// back keeps our reads on the primary database until replicas have caught up.
+let lastWrite = null;
+
 const GamePlayerManagement = () => {
   const [currentUser, setCurrentUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
@@ -59,7 +63,7 @@ const GamePlayerManagement = () => {
     setTimeout(() => setMessage({ type: '', text: '' }), 5000);
   };
 
-  const apiCall = async (endpoint, method = 'GET', body = null) => {
+  const apiRequest = async (endpoint, method = 'GET', body = null) => {
     const headers = {
       'Content-Type': 'application/json',
     };
@@ -68,6 +72,10 @@ const GamePlayerManagement = () => {
       headers['Authorization'] = `Bearer ${token}`;
     }
 
+    if (lastWrite) {
+      headers['X-Last-Write'] = lastWrite;
+    }
+
     const options = {
       method,
       headers,
@@ -85,22 +93,50 @@ const GamePlayerManagement = () => {
         throw new Error(data.error || 'Something went wrong');
       }
 
-      return data;
+      lastWrite = response.headers.get('X-Last-Write') || lastWrite;
+
+      return { data, nextCursor: response.headers.get('X-Next-Cursor') };
     } catch (error) {
       throw error;
     }
   };
 
+  const apiCall = async (endpoint, method = 'GET', body = null) => {
+    const { data } = await apiRequest(endpoint, method, body);
+    return data;
+  };
+
+  // Paged list endpoints return one page and an X-Next-Cursor header while
+  // there is more; follow it until the list is complete
+  const apiCallAllPages = async (endpoint, rows = [], cursor = null) => {
+    let after = cursor;
+    let all = rows;
+    do {
+      const separator = endpoint.includes('?') ? '&' : '?';
+      const page = await apiRequest(after ? `${endpoint}${separator}after=${encodeURIComponent(after)}` : endpoint);
+      all = all.concat(page.data);
+      after = page.nextCursor;
+    } while (after);
+    return all;
+  };
+
   const loadAllData = async () => {
     try {
-      await Promise.all([
-        loadGames(),
-        loadPlayerGames(),
-        loadPlayerStats(),
-        loadCharacters(),
-        loadFriends(),
-        loadFriendRequests(),
+      // One batched request instead of six separate round trips; long lists
+      // come back as a first page plus a cursor to continue from
+      const data = await apiCall('/dashboard');
+      const cursors = data.next_cursors || {};
+      const [playerGamesList, charactersList, friendsList] = await Promise.all([
+        cursors.player_games ? apiCallAllPages('/games/player', data.player_games, cursors.player_games) : data.player_games,
+        cursors.characters ? apiCallAllPages('/characters', data.characters, cursors.characters) : data.characters,
+        cursors.friends ? apiCallAllPages('/friends', data.friends, cursors.friends) : data.friends,
       ]);
+      setGames(data.games);
+      setPlayerGames(playerGamesList);
+      setPlayerStats(data.stats);
+      setCharacters(charactersList);
+      setFriends(friendsList);
+      setFriendRequests(data.friend_requests);
     } catch (error) {
       console.error('Error loading data:', error);
     }
@@ -117,7 +153,7 @@ const GamePlayerManagement = () => {
 
   const loadPlayerGames = async () => {
     try {
-      const data = await apiCall('/games/player');
+      const data = await apiCallAllPages('/games/player');
       setPlayerGames(data);
     } catch (error) {
       console.error('Error loading player games:', error);
@@ -135,7 +171,7 @@ const GamePlayerManagement = () => {
 
   const loadCharacters = async () => {
     try {
-      const data = await apiCall('/characters');
+      const data = await apiCallAllPages('/characters');
       setCharacters(data);
     } catch (error) {
       console.error('Error loading characters:', error);
@@ -144,7 +180,7 @@ const GamePlayerManagement = () => {
 
   const loadFriends = async () => {
     try {
-      const data = await apiCall('/friends');
+      const data = await apiCallAllPages('/friends');
       setFriends(data);
     } catch (error) {
       console.error('Error loading friends:', error);